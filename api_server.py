@@ -1,17 +1,34 @@
-from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 import psycopg2
+import psycopg2.extensions
 from psycopg2.extras import RealDictCursor
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 from logging.handlers import RotatingFileHandler
 import pandas as pd
-import json
-from typing import Any, Dict, List, Mapping, Optional, Tuple
-from datetime import datetime, timedelta
-from fastapi.responses import JSONResponse
+import numpy as np
+import itertools
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import uvicorn
-from config import ensure_log_dir, get_db_config
+from config import ensure_log_dir
+import database
+from vessel_store import LatestVesselStore
+from clustering import MAX_CLUSTER_ZOOM, ClusterTileCache, cell_size_deg, tiles_for_bbox
+from live_updates import LiveUpdateBroadcaster
+from tracks import reduce_track
+from response_cache import SnapshotCache, serialized_response
+from archiver import archive_cutoff, read_archive
+from columnar_export import ENCODERS, EXPORT_SELECT, MEDIA_TYPES, VesselBatchBuilder, iter_record_batches
+from geofence import GEOFENCE_PATH, GeofenceIndex
+from prediction_evaluator import summarize_buckets
+from vessel_metadata import VesselMetadataCache
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, TimedConnection, track_db_time
 
 # Create logs directory if it doesn't exist
 LOG_DIR = ensure_log_dir()
@@ -28,9 +45,6 @@ logging.basicConfig(
 logger = logging.getLogger("navicast.api")
 
 # Constants
-# Default database configuration
-DB_CONFIG = get_db_config()
-
 # Map AIS navigation status codes to human-readable descriptions
 NAV_STATUS_MAP = {
     0: "Under way using engine",
@@ -89,12 +103,80 @@ BOUNDS = {
     "lon_max": 30.0
 }
 
+# Seconds between incremental refreshes of the in-memory latest-position store
+VESSEL_STORE_REFRESH_SECONDS = 2
+
+# Seconds between incremental refreshes of the vessel metadata cache (static data changes rarely)
+VESSEL_METADATA_REFRESH_SECONDS = 30
+
+# Upper bound on tiles aggregated per cluster request (bbox too large for the zoom otherwise)
+MAX_CLUSTER_TILES = 256
+
+# Coalescing window for pushed updates, and keep-alive period for idle streams
+LIVE_UPDATE_INTERVAL_SECONDS = VESSEL_STORE_REFRESH_SECONDS
+LIVE_KEEPALIVE_SECONDS = 15.0
+
+# Track history defaults and limits
+# Shorter than the database retention, so default requests never read the archive
+DEFAULT_TRACK_HOURS = 12
+DEFAULT_TRACK_TOLERANCE_M = 25.0
+MAX_BULK_TRACKS = 100
+TRACK_FIELDS = ["timestamp", "latitude", "longitude", "sog", "cog"]
+
+# Download limits; columnar exports are fetched and encoded in batches of this many rows
+DOWNLOAD_LIMIT = 10000
+EXPORT_BATCH_ROWS = 2000
+
 app = FastAPI(
     title="NAVICAST API",
     description="API for the NAVICAST vessel tracking and prediction system",
     version="1.0.0"
 )
 
+# Per-route request metrics
+REQUEST_SECONDS = REGISTRY.histogram("navicast_api_request_seconds", "API request latency", ["route", "method", "status"])
+REQUEST_DB_SECONDS = REGISTRY.histogram("navicast_api_db_seconds", "Database time per API request", ["route"])
+REQUESTS_IN_PROGRESS = REGISTRY.gauge("navicast_api_requests_in_progress", "API requests currently being handled")
+
+
+class MetricsMiddleware:
+    """Times every HTTP request and the database work done while handling it.
+
+    Routes are labelled by their path template (``/vessels/{vessel_id}``) so
+    label cardinality stays bounded. For streaming responses the latency covers
+    the whole stream.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        with track_db_time() as db_time:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                elapsed = time.perf_counter() - start
+                REQUESTS_IN_PROGRESS.dec()
+                route = getattr(scope.get("route"), "path", "other")
+                REQUEST_SECONDS.labels(route, scope["method"], status[0]).observe(elapsed)
+                REQUEST_DB_SECONDS.labels(route).observe(db_time[0])
+
+
+app.add_middleware(MetricsMiddleware)
+
 # Enable CORS for the frontend
 app.add_middleware(
     CORSMiddleware,
@@ -112,11 +194,56 @@ try:
 except Exception as e:
     logger.warning(f"Could not load MMSI country mappings: {e}")
 
+# Latest position per vessel, spatially indexed for bounding-box queries
+vessel_store = LatestVesselStore()
+_vessel_store_refresh_lock = threading.Lock()
+
+
+def _build_ship_type_lookup() -> Tuple[np.ndarray, List[str]]:
+    """Map every AIS ship type code (0-99) to a vessel type label index.
+
+    Exact code first, then its tens category.
+    The final label is "Unknown" so known types win ties when clustering.
+    """
+    labels = sorted(set(SHIP_TYPE_MAP.values()) - {"Unknown"}) + ["Unknown"]
+    lookup = np.full(100, len(labels) - 1, dtype=np.int64)
+    for code in range(100):
+        label = SHIP_TYPE_MAP.get(code, SHIP_TYPE_MAP.get((code // 10) * 10))
+        if label is not None:
+            lookup[code] = labels.index(label)
+    return lookup, labels
+
+
+# Static data and MID country per MMSI, so row formatting is a dictionary lookup
+_ship_type_lookup, _ship_type_labels = _build_ship_type_lookup()
+vessel_metadata = VesselMetadataCache(
+    [_ship_type_labels[index] for index in _ship_type_lookup], mmsi_country_map
+)
+_vessel_metadata_refresh_lock = threading.Lock()
+
+# /vessels bodies serialized once per store and metadata version, keyed by query parameters
+vessel_responses = SnapshotCache()
+
+# Per-tile cluster aggregates, invalidated incrementally as the store changes
+cluster_cache = ClusterTileCache(_ship_type_lookup, _ship_type_labels)
+
+# Vectorized enrichment for Arrow/Parquet downloads
+export_batch_builder = VesselBatchBuilder(
+    _ship_type_lookup, _ship_type_labels, NAV_STATUS_MAP, mmsi_country_map, BOUNDS, vessel_metadata
+)
+
+# Geofence zone outlines, served to the map alongside the ingest-time enter/exit events
+geofence_index: Optional[GeofenceIndex] = None
+try:
+    if GEOFENCE_PATH.exists():
+        geofence_index = GeofenceIndex.from_geojson(GEOFENCE_PATH)
+except Exception as e:
+    logger.warning(f"Could not load geofences: {e}")
+
 def get_db_connection():
     """Creates and returns a database connection"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG, cursor_factory=RealDictCursor)
-        return conn
+        return database.connect(cursor_factory=RealDictCursor, connection_factory=TimedConnection)
     except Exception as e:
         logger.error(f"Database connection error: {e}")
         raise HTTPException(
@@ -127,11 +254,7 @@ def get_db_connection():
 def get_country_from_mmsi(mmsi: int) -> Optional[str]:
     """Maps MMSI to country based on Maritime Identification Digits (MID)"""
     if mmsi and isinstance(mmsi, int):
-        try:
-            mmsi_prefix = str(mmsi)[:3]
-            return mmsi_country_map.get(int(mmsi_prefix))
-        except (ValueError, TypeError):
-            pass
+        return vessel_metadata.country(mmsi)
     return None
 
 def is_valid_prediction(lat: float, lon: float) -> bool:
@@ -142,30 +265,6 @@ def is_valid_prediction(lat: float, lon: float) -> bool:
     return (BOUNDS["lat_min"] <= lat <= BOUNDS["lat_max"] and 
             BOUNDS["lon_min"] <= lon <= BOUNDS["lon_max"])
 
-def get_vessel_type(raw_json: Dict) -> tuple:
-    """Extracts and maps vessel type from AIS data"""
-    vessel_type = "Unknown"
-    vessel_type_code = None
-    
-    if not raw_json or not isinstance(raw_json, dict):
-        return vessel_type, vessel_type_code
-        
-    props = raw_json.get('properties', {})
-    vessel_type_code = props.get('shipType')
-    
-    if vessel_type_code is not None:
-        # First try exact match
-        if vessel_type_code in SHIP_TYPE_MAP:
-            vessel_type = SHIP_TYPE_MAP[vessel_type_code]
-        else:
-            # Try category match (first digit * 10)
-            tens = (vessel_type_code // 10) * 10
-            if tens in SHIP_TYPE_MAP:
-                vessel_type = SHIP_TYPE_MAP[tens]
-    
-    return vessel_type, vessel_type_code
-
-
 def _parse_iso_datetime(value: Optional[str], field_name: str) -> Optional[datetime]:
     """Parse ISO formatted datetime string."""
     if value is None:
@@ -198,92 +297,318 @@ def _resolve_time_bounds(
     return start_time, end_time
 
 
+def _parse_bbox(value: Optional[str]) -> Optional[Tuple[float, float, float, float]]:
+    """Parse a 'lon_min,lat_min,lon_max,lat_max' bounding box."""
+    if value is None:
+        return None
+    try:
+        lon_min, lat_min, lon_max, lat_max = (float(part) for part in value.split(","))
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid bbox format. Use lon_min,lat_min,lon_max,lat_max"
+        ) from exc
+
+    if not (-180 <= lon_min <= lon_max <= 180 and -90 <= lat_min <= lat_max <= 90):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid bbox: expected lon_min <= lon_max within [-180, 180] and lat_min <= lat_max within [-90, 90]"
+        )
+    return lon_min, lat_min, lon_max, lat_max
+
+
+def _refresh_vessel_store() -> None:
+    """Incrementally refresh the latest-position store if it has gone stale."""
+    if not vessel_store.is_stale(VESSEL_STORE_REFRESH_SECONDS):
+        return
+    # Another request is already refreshing; serve from the current snapshot
+    if not _vessel_store_refresh_lock.acquire(blocking=False):
+        return
+
+    conn = None
+    try:
+        conn = get_db_connection()
+        vessel_store.refresh(conn)
+    except Exception as e:
+        logger.warning(f"Could not refresh vessel store: {e}")
+    finally:
+        if conn:
+            database.release(conn)
+        _vessel_store_refresh_lock.release()
+
+
+def _refresh_vessel_metadata() -> None:
+    """Pick up vessel metadata upserted since the last refresh, at most every few seconds."""
+    if not vessel_metadata.is_stale(VESSEL_METADATA_REFRESH_SECONDS):
+        return
+    if not _vessel_metadata_refresh_lock.acquire(blocking=False):
+        return
+
+    conn = None
+    try:
+        conn = get_db_connection()
+        vessel_metadata.refresh(conn)
+    except Exception as e:
+        logger.warning(f"Could not refresh vessel metadata: {e}")
+    finally:
+        if conn:
+            database.release(conn)
+        _vessel_metadata_refresh_lock.release()
+
+
+# Shared push channel; one store refresh per interval serves every connected client
+live_updates = LiveUpdateBroadcaster(
+    vessel_store, _refresh_vessel_store, interval_seconds=LIVE_UPDATE_INTERVAL_SECONDS
+)
+
+
+@app.on_event("startup")
+async def _start_live_updates() -> None:
+    app.state.live_updates_task = asyncio.create_task(live_updates.run())
+
+
+@app.on_event("shutdown")
+async def _stop_live_updates() -> None:
+    task = getattr(app.state, "live_updates_task", None)
+    if task:
+        task.cancel()
+
+
+def _latest_vessels_query(
+    mmsi: Optional[int],
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    limit: int,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    vessel_ids: Optional[List[int]] = None,
+    columns: str = "*"
+) -> Tuple[str, List[Any]]:
+    """Build the latest-position-per-vessel query and its parameters.
+
+    ``bbox`` filters on each vessel's latest position in the time range.
+    ``vessel_ids`` optionally narrows the scan to known candidates first.
+    ``columns`` selects from the ``latest_vessel_data`` CTE.
+    """
+    query = """
+    WITH latest_vessel_data AS (
+        SELECT DISTINCT ON (v.vessel_id) 
+            v.vessel_id,
+            v.latitude AS current_latitude,
+            v.longitude AS current_longitude,
+            v.timestamp AS current_timestamp,
+            (v.raw_json -> 'properties' ->> 'sog')::float AS sog,
+            (v.raw_json -> 'properties' ->> 'cog')::float AS cog,
+            (v.raw_json -> 'properties' ->> 'posAcc')::boolean AS pos_acc,
+            (v.raw_json -> 'properties' ->> 'heading')::float AS heading,
+            (v.raw_json -> 'properties' ->> 'navStat')::int AS nav_stat,
+            p.predicted_latitude,
+            p.predicted_longitude,
+            p.prediction_for_timestamp,
+            p.prediction_made_at
+        FROM 
+            raw_ais_data v
+        LEFT JOIN 
+            predictions p ON v.vessel_id = p.vessel_id
+        WHERE 1=1
+    """
+
+    params: List[Any] = []
+    if mmsi:
+        query += " AND v.vessel_id = %s"
+        params.append(mmsi)
+
+    if vessel_ids is not None:
+        query += " AND v.vessel_id = ANY(%s)"
+        params.append(vessel_ids)
+
+    if start_time:
+        query += " AND v.timestamp >= %s"
+        params.append(start_time)
+
+    if end_time:
+        query += " AND v.timestamp <= %s"
+        params.append(end_time)
+
+    query += f"""
+        ORDER BY v.vessel_id, v.timestamp DESC
+    )
+    SELECT {columns} FROM latest_vessel_data
+    """
+
+    if bbox:
+        lon_min, lat_min, lon_max, lat_max = bbox
+        query += """
+    WHERE current_latitude BETWEEN %s AND %s
+      AND current_longitude BETWEEN %s AND %s
+    """
+        params.extend([lat_min, lat_max, lon_min, lon_max])
+
+    query += " LIMIT %s"
+    params.append(limit)
+    return query, params
+
+
 def _fetch_latest_vessels(
     mmsi: Optional[int],
     start_time: Optional[datetime],
     end_time: Optional[datetime],
-    limit: int
+    limit: int,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    vessel_ids: Optional[List[int]] = None
 ) -> List[Dict[str, Any]]:
     """Execute vessel query and return raw database rows."""
     conn = None
     try:
         conn = get_db_connection()
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            query = """
-            WITH latest_vessel_data AS (
-                SELECT DISTINCT ON (v.vessel_id) 
-                    v.vessel_id,
-                    v.latitude AS current_latitude,
-                    v.longitude AS current_longitude,
-                    v.timestamp AS current_timestamp,
-                    (v.raw_json -> 'properties' ->> 'sog')::float AS sog,
-                    (v.raw_json -> 'properties' ->> 'cog')::float AS cog,
-                    (v.raw_json -> 'properties' ->> 'posAcc')::boolean AS pos_acc,
-                    (v.raw_json -> 'properties' ->> 'heading')::float AS heading,
-                    (v.raw_json -> 'properties' ->> 'navStat')::int AS nav_stat,
-                    v.raw_json,
-                    p.predicted_latitude,
-                    p.predicted_longitude,
-                    p.prediction_for_timestamp,
-                    p.prediction_made_at
-                FROM 
-                    raw_ais_data v
-                LEFT JOIN 
-                    predictions p ON v.vessel_id = p.vessel_id
-                WHERE 1=1
-            """
-
-            params: List[Any] = []
-            if mmsi:
-                query += " AND v.vessel_id = %s"
-                params.append(mmsi)
-
-            if start_time:
-                query += " AND v.timestamp >= %s"
-                params.append(start_time)
+            query, params = _latest_vessels_query(
+                mmsi, start_time, end_time, limit, bbox=bbox, vessel_ids=vessel_ids
+            )
+            cur.execute(query, params)
+            return cur.fetchall()
+    finally:
+        if conn:
+            database.release(conn)
 
-            if end_time:
-                query += " AND v.timestamp <= %s"
-                params.append(end_time)
 
-            query += """
-                ORDER BY v.vessel_id, v.timestamp DESC
+def _stream_columnar_export(
+    encoder: Callable[[Iterable[Any]], Iterator[bytes]],
+    mmsi: Optional[int],
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    limit: int
+) -> Iterator[bytes]:
+    """Stream the latest-vessel query as Arrow record batches straight from a server-side cursor."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor(name="navicast_export", cursor_factory=psycopg2.extensions.cursor) as cur:
+            query, params = _latest_vessels_query(
+                mmsi, start_time, end_time, limit, columns=EXPORT_SELECT
             )
-            SELECT * FROM latest_vessel_data
-            LIMIT %s
-            """
-
-            params.append(limit)
             cur.execute(query, params)
+            batches = iter_record_batches(lambda: cur.fetchmany(EXPORT_BATCH_ROWS), export_batch_builder)
+            yield from encoder(batches)
+    finally:
+        if conn:
+            database.release(conn)
+
+
+def _resolve_track_bounds(
+    from_time: Optional[str],
+    to_time: Optional[str]
+) -> Tuple[datetime, datetime]:
+    """Time range for track requests; defaults to the last DEFAULT_TRACK_HOURS hours."""
+    if from_time is None and to_time is None:
+        end_time = datetime.now()
+        return end_time - timedelta(hours=DEFAULT_TRACK_HOURS), end_time
+    return _resolve_time_bounds(from_time, to_time)
+
+
+def _fetch_archived_track_rows(
+    vessel_ids: List[int],
+    start_time: datetime,
+    end_time: datetime
+) -> List[Tuple[Any, ...]]:
+    """Fetch reports that have already moved from the database to the archive."""
+    table = read_archive(
+        start_time, end_time, vessel_ids,
+        columns=["vessel_id", "timestamp", "latitude", "longitude", "sog", "cog"]
+    )
+    return list(zip(*(table.column(name).to_pylist() for name in table.column_names)))
+
+
+def _fetch_track_rows(
+    vessel_ids: List[int],
+    start_time: datetime,
+    end_time: datetime
+) -> List[Tuple[Any, ...]]:
+    """Fetch reports for the given vessels, ordered along the (vessel_id, timestamp) key.
+
+    Ranges starting before ``archive_cutoff()``, the oldest instant guaranteed
+    to still be in the database, are completed from the archive.
+    """
+    rows = _fetch_database_track_rows(vessel_ids, start_time, end_time)
+    if start_time.astimezone(timezone.utc) >= archive_cutoff():
+        return rows
+
+    try:
+        archived = _fetch_archived_track_rows(vessel_ids, start_time, end_time)
+    except Exception as e:
+        logger.warning(f"Could not read archived tracks: {e}")
+        return rows
+
+    # Rows awaiting the next archive run can exist in both tiers
+    merged = {(row[0], row[1]): row for row in archived}
+    merged.update({(row[0], row[1]): row for row in rows})
+    return [merged[key] for key in sorted(merged)]
+
+
+def _fetch_database_track_rows(
+    vessel_ids: List[int],
+    start_time: datetime,
+    end_time: datetime
+) -> List[Tuple[Any, ...]]:
+    """Fetch reports still held in raw_ais_data."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+            cur.execute(
+                """
+                SELECT
+                    vessel_id,
+                    timestamp,
+                    latitude,
+                    longitude,
+                    (raw_json -> 'properties' ->> 'sog')::float AS sog,
+                    (raw_json -> 'properties' ->> 'cog')::float AS cog
+                FROM raw_ais_data
+                WHERE vessel_id = ANY(%s)
+                  AND timestamp BETWEEN %s AND %s
+                ORDER BY vessel_id, timestamp
+                """,
+                (vessel_ids, start_time, end_time)
+            )
             return cur.fetchall()
     finally:
         if conn:
-            conn.close()
+            database.release(conn)
 
 
-def _load_raw_data(raw_json: Any) -> Dict[str, Any]:
-    """Safely deserialize raw JSON payload if needed."""
-    if isinstance(raw_json, dict):
-        return raw_json
-    if isinstance(raw_json, str):
-        try:
-            return json.loads(raw_json)
-        except json.JSONDecodeError:
-            return {}
-    return {}
+def _format_track(
+    vessel_id: int,
+    rows: List[Tuple[Any, ...]],
+    bucket_seconds: int,
+    tolerance_m: float
+) -> Dict[str, Any]:
+    """Downsample and simplify one vessel's reports into a compact track."""
+    timestamps = np.array([row[1].timestamp() for row in rows])
+    lat = np.array([row[2] for row in rows], dtype=float)
+    lon = np.array([row[3] for row in rows], dtype=float)
+    kept = reduce_track(timestamps, lat, lon, bucket_seconds, tolerance_m)
+
+    return {
+        "vessel_id": vessel_id,
+        "original_points": len(rows),
+        "fields": TRACK_FIELDS,
+        "points": [
+            [rows[i][1].isoformat(), rows[i][2], rows[i][3], rows[i][4], rows[i][5]]
+            for i in kept.tolist()
+        ]
+    }
 
 
 def _format_vessel_row(row: Mapping[str, Any]) -> Dict[str, Any]:
     """Convert database row into API response structure."""
-    raw_data = _load_raw_data(row.get('raw_json'))
-    vessel_type, vessel_type_code = get_vessel_type(raw_data)
-    vessel_country = get_country_from_mmsi(row.get('vessel_id'))
+    info = vessel_metadata.get(row.get('vessel_id'))
 
     nav_stat = row.get('nav_stat')
     vessel_status = NAV_STATUS_MAP.get(nav_stat, "Unknown") if nav_stat is not None else "Unknown"
 
     vessel_data = {
         "vessel_id": row.get('vessel_id'),
+        "name": info.name,
         "current_latitude": row.get('current_latitude'),
         "current_longitude": row.get('current_longitude'),
         "current_timestamp": row.get('current_timestamp').isoformat() if row.get('current_timestamp') else None,
@@ -293,9 +618,15 @@ def _format_vessel_row(row: Mapping[str, Any]) -> Dict[str, Any]:
         "pos_acc": bool(row.get('pos_acc')) if row.get('pos_acc') is not None else False,
         "nav_stat": nav_stat,
         "vessel_status": vessel_status,
-        "vessel_type": vessel_type,
-        "vessel_type_code": vessel_type_code,
-        "country": vessel_country
+        "vessel_type": info.vessel_type,
+        "vessel_type_code": info.ship_type,
+        "country": info.country,
+        "call_sign": info.call_sign,
+        "imo": info.imo,
+        "destination": info.destination,
+        "draught": info.draught,
+        "length": info.length,
+        "width": info.width
     }
 
     pred_lat = row.get('predicted_latitude')
@@ -318,41 +649,243 @@ def _format_vessel_row(row: Mapping[str, Any]) -> Dict[str, Any]:
 
     return vessel_data
 
-@app.get("/vessels", response_model=List[Dict[str, Any]])
+def _query_vessels(
+    mmsi: Optional[int],
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    limit: int,
+    bounds: Optional[Tuple[float, float, float, float]]
+) -> List[Dict[str, Any]]:
+    """Fetch and format the latest vessel rows for a /vessels request."""
+    # Resolve the viewport from the spatial index when it reflects the requested window
+    vessel_ids = None
+    if bounds and vessel_store.covers(end_time):
+        vessel_ids = vessel_store.query_bbox(*bounds).tolist()
+        if not vessel_ids:
+            return []
+
+    rows = _fetch_latest_vessels(
+        mmsi, start_time, end_time, limit, bbox=bounds, vessel_ids=vessel_ids
+    )
+    vessels = [_format_vessel_row(row) for row in rows]
+
+    logger.info(
+        "API request: returned %d vessels (filters: mmsi=%s, time range: %s to %s, bbox=%s)",
+        len(vessels),
+        mmsi,
+        start_time,
+        end_time,
+        bounds
+    )
+    return vessels
+
+@app.get("/vessels")
 def get_vessels(
+    request: Request,
     mmsi: Optional[int] = Query(None, description="Filter by vessel MMSI"),
     from_time: Optional[str] = Query(None, description="Filter by time range (start time, ISO format)"),
     to_time: Optional[str] = Query(None, description="Filter by time range (end time, ISO format)"),
-    limit: Optional[int] = Query(100, description="Maximum number of vessels to return")
+    limit: Optional[int] = Query(100, description="Maximum number of vessels to return"),
+    bbox: Optional[str] = Query(None, description="Viewport bounding box: lon_min,lat_min,lon_max,lat_max")
 ):
     """
-    Get vessel data with optional filtering by MMSI and time range.
-    
+    Get vessel data with optional filtering by MMSI, time range and viewport.
+
     - **mmsi**: Filter results to a specific vessel by MMSI
     - **from_time**: Start of time range in ISO format (e.g., "2023-04-01T12:00:00")
     - **to_time**: End of time range in ISO format (e.g., "2023-04-01T14:00:00")
     - **limit**: Maximum number of vessels to return
+    - **bbox**: Only vessels whose latest position lies in this box (e.g., "24.5,59.9,25.3,60.3")
+
+    Responses are serialized once per store refresh and carry an ETag;
+    send it back in `If-None-Match` to get a 304 when nothing changed.
     """
-    
+
     try:
         start_time, end_time = _resolve_time_bounds(from_time, to_time)
+        bounds = _parse_bbox(bbox)
         sanitized_limit = max(1, limit if limit is not None else 100)
-        rows = _fetch_latest_vessels(mmsi, start_time, end_time, sanitized_limit)
-        vessels = [_format_vessel_row(row) for row in rows]
 
-        logger.info(
-            "API request: returned %d vessels (filters: mmsi=%s, time range: %s to %s)",
-            len(vessels),
-            mmsi,
-            start_time,
-            end_time
+        _refresh_vessel_store()
+        _refresh_vessel_metadata()
+        # The default window slides with the clock, so its entries expire every refresh interval
+        window = None if from_time or to_time else int(end_time.timestamp() // VESSEL_STORE_REFRESH_SECONDS)
+        cache_key = (mmsi, from_time, to_time, sanitized_limit, bounds, window)
+        serialized = vessel_responses.get_or_build(
+            cache_key,
+            (vessel_store.version, vessel_metadata.version),
+            lambda: _query_vessels(mmsi, start_time, end_time, sanitized_limit, bounds)
         )
-        return vessels
+        return serialized_response(request, serialized)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving vessel data: {e}")
         raise HTTPException(status_code=500, detail=f"Error retrieving vessel data: {str(e)}")
 
+@app.get("/vessels/clusters")
+def get_vessel_clusters(
+    bbox: str = Query(..., description="Viewport bounding box: lon_min,lat_min,lon_max,lat_max"),
+    zoom: int = Query(..., ge=0, le=MAX_CLUSTER_ZOOM, description="Map zoom level")
+):
+    """
+    Get latest vessel positions aggregated into grid clusters for a map viewport.
+
+    - **bbox**: Viewport bounding box (e.g., "10,53,30,66")
+    - **zoom**: Map zoom level; cells shrink as the zoom increases
+
+    Each cluster reports its vessel count, centroid, dominant vessel type and mean speed.
+    """
+    bounds = _parse_bbox(bbox)
+    tiles = tiles_for_bbox(zoom, *bounds)
+    if len(tiles) > MAX_CLUSTER_TILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"bbox spans {len(tiles)} tiles at zoom {zoom}; use a smaller bbox or lower zoom"
+        )
+
+    try:
+        _refresh_vessel_store()
+        cluster_cache.sync(vessel_store)
+
+        lon_min, lat_min, lon_max, lat_max = bounds
+        clusters = [
+            cluster
+            for tile in tiles
+            for cluster in cluster_cache.get(vessel_store, tile)
+            if lat_min <= cluster["latitude"] <= lat_max and lon_min <= cluster["longitude"] <= lon_max
+        ]
+
+        logger.info(f"API request: returned {len(clusters)} clusters from {len(tiles)} tiles (zoom={zoom}, bbox={bounds})")
+        return {
+            "zoom": zoom,
+            "cell_size_deg": cell_size_deg(zoom),
+            "vessel_count": sum(cluster["count"] for cluster in clusters),
+            "clusters": clusters
+        }
+
+    except Exception as e:
+        logger.error(f"Error computing vessel clusters: {e}")
+        raise HTTPException(status_code=500, detail=f"Error computing vessel clusters: {str(e)}")
+
+@app.get("/vessels/stream")
+async def stream_vessels(
+    request: Request,
+    bbox: Optional[str] = Query(None, description="Only push vessels in this box: lon_min,lat_min,lon_max,lat_max")
+):
+    """
+    Server-Sent Events stream of vessel positions and predictions.
+
+    - **bbox**: Optional viewport filter (e.g., "24.5,59.9,25.3,60.3")
+
+    The first `snapshot` event carries every matching vessel. Subsequent `delta`
+    events carry only changed positions, new predictions and removed vessels,
+    as compact arrays whose field order is given in the snapshot.
+    """
+    bounds = _parse_bbox(bbox)
+    await asyncio.to_thread(_refresh_vessel_store)
+    subscriber = await live_updates.subscribe(bounds)
+    logger.info(f"Live stream opened (bbox={bounds}, subscribers={len(live_updates)})")
+
+    async def event_stream():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(subscriber.queue.get(), timeout=LIVE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            live_updates.unsubscribe(subscriber)
+            logger.info(f"Live stream closed (subscribers={len(live_updates)})")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/vessels/tracks")
+def get_vessel_tracks(
+    mmsi: List[int] = Query(..., description="Vessel MMSIs (repeat the parameter for each vessel)"),
+    from_time: Optional[str] = Query(None, description="Start of track (ISO format)"),
+    to_time: Optional[str] = Query(None, description="End of track (ISO format)"),
+    tolerance_m: float = Query(DEFAULT_TRACK_TOLERANCE_M, ge=0, description="Simplification tolerance in metres (0 disables)"),
+    bucket_seconds: int = Query(0, ge=0, description="Keep at most one report per bucket (0 disables)")
+):
+    """
+    Get simplified tracks for several vessels in one call.
+
+    - **mmsi**: Vessels to fetch, e.g. `?mmsi=230123000&mmsi=230456000`
+    - **from_time** / **to_time**: Time range in ISO format (default: last 12 hours)
+    - **tolerance_m**: Maximum deviation of the simplified line from the reported positions
+    - **bucket_seconds**: Optional time bucketing applied before simplification
+    """
+    vessel_ids = sorted(set(mmsi))
+    if len(vessel_ids) > MAX_BULK_TRACKS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_TRACKS} vessels per request")
+    start_time, end_time = _resolve_track_bounds(from_time, to_time)
+
+    try:
+        rows = _fetch_track_rows(vessel_ids, start_time, end_time)
+        tracks = [
+            _format_track(vessel_id, list(vessel_rows), bucket_seconds, tolerance_m)
+            for vessel_id, vessel_rows in itertools.groupby(rows, key=lambda row: row[0])
+        ]
+        logger.info(
+            f"API request: returned {len(tracks)} tracks, "
+            f"{sum(len(t['points']) for t in tracks)} of {len(rows)} points (tolerance={tolerance_m}m)"
+        )
+        return {
+            "from_time": start_time.isoformat(),
+            "to_time": end_time.isoformat(),
+            "tracks": tracks
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving vessel tracks: {e}")
+        raise HTTPException(status_code=500, detail=f"Error retrieving vessel tracks: {str(e)}")
+
+@app.get("/vessels/{vessel_id}/track")
+def get_vessel_track(
+    vessel_id: int,
+    from_time: Optional[str] = Query(None, description="Start of track (ISO format)"),
+    to_time: Optional[str] = Query(None, description="End of track (ISO format)"),
+    tolerance_m: float = Query(DEFAULT_TRACK_TOLERANCE_M, ge=0, description="Simplification tolerance in metres (0 disables)"),
+    bucket_seconds: int = Query(0, ge=0, description="Keep at most one report per bucket (0 disables)")
+):
+    """
+    Get where a vessel has been, simplified to the requested tolerance.
+
+    - **from_time** / **to_time**: Time range in ISO format (default: last 12 hours)
+    - **tolerance_m**: Maximum deviation of the simplified line from the reported positions
+    - **bucket_seconds**: Optional time bucketing applied before simplification
+    """
+    start_time, end_time = _resolve_track_bounds(from_time, to_time)
+
+    try:
+        rows = _fetch_track_rows([vessel_id], start_time, end_time)
+        if not rows:
+            raise HTTPException(status_code=404, detail=f"No track data for vessel {vessel_id} in the requested range")
+
+        track = _format_track(vessel_id, rows, bucket_seconds, tolerance_m)
+        track.update({"from_time": start_time.isoformat(), "to_time": end_time.isoformat()})
+        logger.info(f"API request: track for vessel {vessel_id}, {len(track['points'])} of {len(rows)} points")
+        return track
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving track for vessel {vessel_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error retrieving vessel track: {str(e)}")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus metrics for the API process"""
+    return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/health")
 def health_check():
     """API health check endpoint"""
@@ -362,79 +895,251 @@ def health_check():
         "version": app.version
     }
 
-@app.get("/vessels/{vessel_id}", response_model=Dict[str, Any])
-def get_vessel(vessel_id: int):
-    """Get detailed information about a specific vessel"""
+@app.get("/encounters")
+def get_encounters(
+    mmsi: Optional[int] = Query(None, description="Only encounters involving this vessel"),
+    bbox: Optional[str] = Query(None, description="Bounding box lon_min,lat_min,lon_max,lat_max (either vessel inside)"),
+    max_cpa_m: Optional[float] = Query(None, gt=0, description="Only encounters passing closer than this (metres)"),
+    max_tcpa_minutes: Optional[float] = Query(None, gt=0, description="Only encounters within this many minutes"),
+    limit: int = Query(500, ge=1, le=5000, description="Maximum number of encounters to return")
+):
+    """
+    Get converging vessel pairs from the latest prediction cycle, soonest first.
+
+    - **mmsi**: Restrict to encounters involving one vessel
+    - **bbox**: Restrict to encounters where either vessel is inside the box
+    - **max_cpa_m**: Tighter closest-point-of-approach threshold than the service default
+    - **max_tcpa_minutes**: Only encounters whose closest approach is within this many minutes
+    - **limit**: Maximum number of encounters to return
+    """
+    bounds = _parse_bbox(bbox)
     conn = None
     cur = None
     try:
         conn = get_db_connection()
         cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Query to get vessel details
-        query = """
-        SELECT 
-            a.vessel_id, 
-            a.latitude AS current_latitude, 
-            a.longitude AS current_longitude, 
-            a.timestamp AS current_timestamp,
-            COALESCE((a.raw_json -> 'properties' ->> 'sog')::float, 0.0) AS sog,
-            COALESCE((a.raw_json -> 'properties' ->> 'cog')::float, 0.0) AS cog,
-            COALESCE((a.raw_json -> 'properties' ->> 'posAcc')::boolean, false) AS pos_acc,
-            COALESCE((a.raw_json -> 'properties' ->> 'heading')::float, null) AS heading,
-            COALESCE((a.raw_json -> 'properties' ->> 'navStat')::int, null) AS nav_stat,
-            a.raw_json,
-            p.predicted_latitude, 
-            p.predicted_longitude, 
-            p.prediction_for_timestamp, 
-            p.prediction_made_at
-        FROM raw_ais_data a
-        LEFT JOIN predictions p ON a.vessel_id = p.vessel_id
-        WHERE a.vessel_id = %s
-        ORDER BY a.timestamp DESC
-        LIMIT 1
-        """
-        cur.execute(query, (vessel_id,))
-        vessel = cur.fetchone()
-        
-        if not vessel:
-            raise HTTPException(status_code=404, detail=f"Vessel with ID {vessel_id} not found")
 
-        return _format_vessel_row(vessel)
-        
+        conditions = ["cpa_timestamp >= NOW()"]
+        params: List[Any] = []
+        if mmsi is not None:
+            conditions.append("(vessel_id_1 = %s OR vessel_id_2 = %s)")
+            params.extend([mmsi, mmsi])
+        if bounds is not None:
+            lon_min, lat_min, lon_max, lat_max = bounds
+            conditions.append(
+                "((longitude_1 BETWEEN %s AND %s AND latitude_1 BETWEEN %s AND %s)"
+                " OR (longitude_2 BETWEEN %s AND %s AND latitude_2 BETWEEN %s AND %s))"
+            )
+            params.extend([lon_min, lon_max, lat_min, lat_max] * 2)
+        if max_cpa_m is not None:
+            conditions.append("cpa_m <= %s")
+            params.append(max_cpa_m)
+        if max_tcpa_minutes is not None:
+            conditions.append("cpa_timestamp <= NOW() + %s * INTERVAL '1 minute'")
+            params.append(max_tcpa_minutes)
+
+        cur.execute(f"""
+            SELECT *
+            FROM encounters
+            WHERE {" AND ".join(conditions)}
+            ORDER BY cpa_timestamp
+            LIMIT %s
+        """, params + [limit])
+        rows = cur.fetchall()
+
+        encounters = [
+            {
+                "vessel_ids": [row["vessel_id_1"], row["vessel_id_2"]],
+                "positions": [
+                    {"latitude": row["latitude_1"], "longitude": row["longitude_1"]},
+                    {"latitude": row["latitude_2"], "longitude": row["longitude_2"]},
+                ],
+                "distance_m": round(row["distance_m"], 1),
+                "cpa_m": round(row["cpa_m"], 1),
+                "tcpa_minutes": round(row["tcpa_seconds"] / 60.0, 2),
+                "cpa_timestamp": row["cpa_timestamp"].isoformat(),
+                "computed_at": row["computed_at"].isoformat(),
+            }
+            for row in rows
+        ]
+        logger.info(f"API request: returned {len(encounters)} close encounters")
+        return encounters
+
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in get_vessel: {e}")
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        logger.error(f"Error retrieving encounters: {e}")
+        raise HTTPException(status_code=500, detail=f"Error retrieving encounters: {str(e)}")
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            database.release(conn)
+
+@app.get("/predictions/accuracy")
+def get_prediction_accuracy(
+    hours: int = Query(24, ge=1, le=24 * 30, description="Rolling window in hours"),
+    model: Optional[str] = Query(None, description="Only this predictor (model, kalman or dead_reckoning)"),
+    hourly: bool = Query(False, description="Also return one summary per hour")
+):
+    """
+    Get the error of past predictions against the vessels' actual positions.
+
+    - **hours**: Summarize predictions whose target time falls in the last this many hours
+    - **model**: Restrict to one predictor
+    - **hourly**: Include a per-hour breakdown alongside the window summary
+    """
+    end_time = datetime.now(timezone.utc)
+    start_time = end_time - timedelta(hours=hours)
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+
+        conditions = ["bucket_start >= %s"]
+        params: List[Any] = [start_time.replace(minute=0, second=0, microsecond=0)]
+        if model is not None:
+            conditions.append("model = %s")
+            params.append(model)
+
+        cur.execute(f"""
+            SELECT bucket_start, model, horizon_seconds, predictions, matched,
+                   sum_error_m, sum_sq_error_m, max_error_m, error_histogram
+            FROM prediction_accuracy
+            WHERE {" AND ".join(conditions)}
+            ORDER BY bucket_start
+        """, params)
+        rows = cur.fetchall()
+
+        result = {
+            "from": start_time.isoformat(),
+            "to": end_time.isoformat(),
+            "models": summarize_buckets(rows),
+        }
+        if hourly:
+            result["hourly"] = [
+                {"bucket_start": bucket_start.isoformat(), **summary}
+                for bucket_start, bucket_rows in itertools.groupby(rows, key=lambda row: row["bucket_start"])
+                for summary in summarize_buckets(bucket_rows)
+            ]
+        logger.info(f"API request: returned prediction accuracy from {len(rows)} hourly buckets")
+        return result
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving prediction accuracy: {e}")
+        raise HTTPException(status_code=500, detail=f"Error retrieving prediction accuracy: {str(e)}")
     finally:
         if cur:
             cur.close()
         if conn:
-            conn.close()
+            database.release(conn)
+
+@app.get("/geofences")
+def get_geofences():
+    """Get the configured geofence zones as a GeoJSON FeatureCollection"""
+    if geofence_index is None:
+        return {"type": "FeatureCollection", "features": []}
+    return geofence_index.to_geojson()
+
+@app.get("/geofences/events")
+def get_geofence_events(
+    mmsi: Optional[int] = Query(None, description="Filter by vessel MMSI"),
+    zone_id: Optional[str] = Query(None, description="Filter by zone id"),
+    event_type: Optional[str] = Query(None, description="enter or exit"),
+    from_time: Optional[str] = Query(None, description="Start time (ISO format)"),
+    to_time: Optional[str] = Query(None, description="End time (ISO format)"),
+    limit: int = Query(500, ge=1, le=5000, description="Maximum number of events to return")
+):
+    """
+    Get vessels entering or leaving geofence zones, newest first.
+
+    - **mmsi** / **zone_id** / **event_type**: Optional filters
+    - **from_time** / **to_time**: Time range in ISO format (default: last hour)
+    - **limit**: Maximum number of events to return
+    """
+    if event_type is not None and event_type not in ("enter", "exit"):
+        raise HTTPException(status_code=400, detail="event_type must be 'enter' or 'exit'")
+    start_time, end_time = _resolve_time_bounds(from_time, to_time)
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+
+        conditions = ["event_time BETWEEN %s AND %s"]
+        params: List[Any] = [start_time, end_time]
+        for column, value in (("vessel_id", mmsi), ("zone_id", zone_id), ("event_type", event_type)):
+            if value is not None:
+                conditions.append(f"{column} = %s")
+                params.append(value)
+
+        cur.execute(f"""
+            SELECT vessel_id, zone_id, zone_name, event_type, event_time, latitude, longitude
+            FROM geofence_events
+            WHERE {" AND ".join(conditions)}
+            ORDER BY event_time DESC, id DESC
+            LIMIT %s
+        """, params + [limit])
+        events = [
+            {**row, "event_time": row["event_time"].isoformat()}
+            for row in cur.fetchall()
+        ]
+        logger.info(f"API request: returned {len(events)} geofence events")
+        return events
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving geofence events: {e}")
+        raise HTTPException(status_code=500, detail=f"Error retrieving geofence events: {str(e)}")
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            database.release(conn)
 
 @app.get("/vessels/download")
 def download_vessels(
     mmsi: Optional[int] = Query(None, description="Filter by vessel MMSI"),
     from_time: Optional[str] = Query(None, description="Filter by time range (start time, ISO format)"),
     to_time: Optional[str] = Query(None, description="Filter by time range (end time, ISO format)"),
-    format: str = Query("json", description="Output format (json or csv)")
+    format: str = Query("json", description="Output format (json, csv, parquet or arrow)")
 ):
     """
-    Download vessel data in JSON or CSV format with optional filtering.
+    Download vessel data in JSON, CSV, Parquet or Arrow format with optional filtering.
     
     - **mmsi**: Filter results to a specific vessel by MMSI
     - **from_time**: Start of time range in ISO format
     - **to_time**: End of time range in ISO format
-    - **format**: Output format ('json' or 'csv')
+    - **format**: Output format ('json', 'csv', 'parquet' or 'arrow')
+
+    Parquet and Arrow (IPC stream) exports are built column-wise from the
+    database cursor and streamed batch by batch; load them with
+    `pandas.read_parquet` or `pyarrow.ipc.open_stream`.
     """
     
-    if format not in ["json", "csv"]:
-        raise HTTPException(status_code=400, detail="Format must be 'json' or 'csv'")
+    if format not in ["json", "csv", *ENCODERS]:
+        raise HTTPException(status_code=400, detail="Format must be 'json', 'csv', 'parquet' or 'arrow'")
     
     # Reuse get_vessels but with higher limit for downloads
     start_time, end_time = _resolve_time_bounds(from_time, to_time)
-    rows = _fetch_latest_vessels(mmsi, start_time, end_time, limit=10000)
+    _refresh_vessel_metadata()
+
+    if format in ENCODERS:
+        filename = f"vessel_{mmsi}_data.{format}" if mmsi else f"vessel_data.{format}"
+        headers = {
+            "Content-Disposition": f"attachment; filename={filename}"
+        }
+        return StreamingResponse(
+            _stream_columnar_export(ENCODERS[format], mmsi, start_time, end_time, DOWNLOAD_LIMIT),
+            media_type=MEDIA_TYPES[format],
+            headers=headers
+        )
+
+    rows = _fetch_latest_vessels(mmsi, start_time, end_time, limit=DOWNLOAD_LIMIT)
     vessels = [_format_vessel_row(row) for row in rows]
     
     if format == "csv":
@@ -465,6 +1170,57 @@ def download_vessels(
         }
         return JSONResponse(content=vessels, headers=headers)
 
+@app.get("/vessels/{vessel_id}", response_model=Dict[str, Any])
+def get_vessel(vessel_id: int):
+    """Get detailed information about a specific vessel"""
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        
+        # Query to get vessel details
+        query = """
+        SELECT 
+            a.vessel_id, 
+            a.latitude AS current_latitude, 
+            a.longitude AS current_longitude, 
+            a.timestamp AS current_timestamp,
+            COALESCE((a.raw_json -> 'properties' ->> 'sog')::float, 0.0) AS sog,
+            COALESCE((a.raw_json -> 'properties' ->> 'cog')::float, 0.0) AS cog,
+            COALESCE((a.raw_json -> 'properties' ->> 'posAcc')::boolean, false) AS pos_acc,
+            COALESCE((a.raw_json -> 'properties' ->> 'heading')::float, null) AS heading,
+            COALESCE((a.raw_json -> 'properties' ->> 'navStat')::int, null) AS nav_stat,
+            p.predicted_latitude, 
+            p.predicted_longitude, 
+            p.prediction_for_timestamp, 
+            p.prediction_made_at
+        FROM raw_ais_data a
+        LEFT JOIN predictions p ON a.vessel_id = p.vessel_id
+        WHERE a.vessel_id = %s
+        ORDER BY a.timestamp DESC
+        LIMIT 1
+        """
+        cur.execute(query, (vessel_id,))
+        vessel = cur.fetchone()
+        
+        if not vessel:
+            raise HTTPException(status_code=404, detail=f"Vessel with ID {vessel_id} not found")
+
+        _refresh_vessel_metadata()
+        return _format_vessel_row(vessel)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in get_vessel: {e}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            database.release(conn)
+
 if __name__ == "__main__":
     # Mount static files for the web interface
     app.mount("/", StaticFiles(directory="static", html=True), name="static")
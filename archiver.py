@@ -0,0 +1,298 @@
+"""Columnar archive tier for AIS reports that age out of the database.
+
+Expired rows from ``raw_ais_data`` are written to Parquet files partitioned by
+UTC day (``<archive>/date=YYYY-MM-DD/part-*.parquet``) and sorted by
+``(vessel_id, timestamp)`` before they are deleted. Only whole days are
+archived, once the entire day is older than ``HOT_RETENTION``, so a partition is
+normally a single file whose row groups cover narrow vessel_id ranges; only
+reports arriving after their day was archived add another part. Readers use
+row group statistics to skip data outside the requested time range and MMSIs.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import psycopg2.extensions
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+logger = logging.getLogger("navicast.archive")
+
+ARCHIVE_DIR = Path(os.getenv("NAVICAST_ARCHIVE_DIR", "archive"))
+
+# Reports younger than this stay in Postgres only
+HOT_RETENTION = timedelta(hours=24)
+
+ROW_GROUP_SIZE = 65536
+FETCH_SIZE = 50000
+
+ARCHIVE_SCHEMA = pa.schema([
+    ("vessel_id", pa.int32()),
+    ("timestamp", pa.timestamp("us", tz="UTC")),
+    ("latitude", pa.float64()),
+    ("longitude", pa.float64()),
+    ("sog", pa.float32()),
+    ("cog", pa.float32()),
+    ("heading", pa.float32()),
+    ("nav_stat", pa.int16()),
+    ("raw_json", pa.string()),
+])
+
+EXPIRED_DAYS_QUERY = """
+SELECT DISTINCT (timestamp AT TIME ZONE 'UTC')::date AS day
+FROM raw_ais_data
+WHERE timestamp < %s
+ORDER BY day
+"""
+
+EXPIRED_ROWS_QUERY = """
+SELECT
+    vessel_id,
+    timestamp,
+    latitude,
+    longitude,
+    (raw_json -> 'properties' ->> 'sog')::float AS sog,
+    (raw_json -> 'properties' ->> 'cog')::float AS cog,
+    (raw_json -> 'properties' ->> 'heading')::float AS heading,
+    (raw_json -> 'properties' ->> 'navStat')::int AS nav_stat,
+    raw_json::text AS raw_json
+FROM raw_ais_data
+WHERE timestamp >= %s AND timestamp < %s
+ORDER BY vessel_id, timestamp
+"""
+
+
+def _utc(value: datetime) -> datetime:
+    """Normalize to an aware UTC datetime (naive values are treated as local time)."""
+    return value.astimezone(timezone.utc)
+
+
+def _to_micros(value: datetime) -> int:
+    return int(_utc(value).timestamp() * 1_000_000)
+
+
+def _partition_dir(archive_dir: Path, day: date) -> Path:
+    return archive_dir / f"date={day.isoformat()}"
+
+
+def _record_batches(cur, fetch_size: int) -> Iterator[pa.RecordBatch]:
+    """Build record batches column-wise from cursor chunks."""
+    while True:
+        rows = cur.fetchmany(fetch_size)
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, ARCHIVE_SCHEMA)],
+            schema=ARCHIVE_SCHEMA,
+        )
+
+
+def archive_cutoff(now: Optional[datetime] = None) -> datetime:
+    """Start of the UTC day holding ``now - HOT_RETENTION``.
+
+    Reports before this may already be archived; reports from it on are always
+    still in ``raw_ais_data``.
+    """
+    expired = _utc(now or datetime.now(timezone.utc)) - HOT_RETENTION
+    return datetime(expired.year, expired.month, expired.day, tzinfo=timezone.utc)
+
+
+def _write_day(conn, archive_dir: Path, day: date, cutoff: datetime) -> Optional[Path]:
+    """Write one day's expired rows to a new part file; returns its path if any rows were written."""
+    day_start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    day_end = min(day_start + timedelta(days=1), cutoff)
+
+    partition = _partition_dir(archive_dir, day)
+    partition.mkdir(parents=True, exist_ok=True)
+    path = partition / f"part-{int(time.time() * 1000)}.parquet"
+    tmp_path = path.with_suffix(".parquet.tmp")
+
+    written = 0
+    try:
+        with conn.cursor(name=f"navicast_archive_{day:%Y%m%d}") as cur:
+            cur.itersize = FETCH_SIZE
+            cur.execute(EXPIRED_ROWS_QUERY, (day_start, day_end))
+            with pq.ParquetWriter(tmp_path, ARCHIVE_SCHEMA, compression="zstd") as writer:
+                for batch in _record_batches(cur, FETCH_SIZE):
+                    writer.write_batch(batch, row_group_size=ROW_GROUP_SIZE)
+                    written += batch.num_rows
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    if not written:
+        tmp_path.unlink(missing_ok=True)
+        return None
+    os.replace(tmp_path, path)
+    logger.info(f"Archived {written} reports for {day.isoformat()} to {path}")
+    return path
+
+
+def archive_expired(
+    conn,
+    cutoff: Optional[datetime] = None,
+    archive_dir: Path = ARCHIVE_DIR,
+) -> int:
+    """Archive reports older than ``cutoff`` (default: ``archive_cutoff()``) to Parquet, then delete them.
+
+    ``conn`` must be a fresh connection with no open transaction: the whole run
+    uses a single REPEATABLE READ snapshot, so rows committed while archiving are
+    neither written nor deleted and are picked up by the next run. If anything
+    fails, the written files are removed and nothing is deleted.
+    Returns the number of rows archived.
+    """
+    cutoff = _utc(cutoff) if cutoff else archive_cutoff()
+    conn.set_session(isolation_level=psycopg2.extensions.ISOLATION_LEVEL_REPEATABLE_READ)
+
+    written: List[Path] = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute(EXPIRED_DAYS_QUERY, (cutoff,))
+            days = [row[0] for row in cur.fetchall()]
+
+        for day in days:
+            path = _write_day(conn, archive_dir, day, cutoff)
+            if path is not None:
+                written.append(path)
+
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM raw_ais_data WHERE timestamp < %s", (cutoff,))
+            deleted = cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        for path in written:
+            path.unlink(missing_ok=True)
+        raise
+
+    logger.info(f"Archived and deleted {deleted} reports older than {cutoff.isoformat()}")
+    return deleted
+
+
+def archive_files(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    archive_dir: Path = ARCHIVE_DIR,
+) -> List[Path]:
+    """List part files whose day partition overlaps ``[start, end]``."""
+    if not archive_dir.exists():
+        return []
+    first_day = _utc(start).date() if start else None
+    last_day = _utc(end).date() if end else None
+
+    files = []
+    for partition in sorted(archive_dir.glob("date=*")):
+        try:
+            day = date.fromisoformat(partition.name.split("=", 1)[1])
+        except ValueError:
+            continue
+        if (first_day and day < first_day) or (last_day and day > last_day):
+            continue
+        files.extend(sorted(partition.glob("part-*.parquet")))
+    return files
+
+
+def _row_groups_to_read(
+    parquet_file: pq.ParquetFile,
+    start_us: Optional[int],
+    end_us: Optional[int],
+    mmsi: Optional[np.ndarray],
+) -> List[int]:
+    """Select row groups whose min/max statistics can contain matching rows."""
+    metadata = parquet_file.metadata
+    names = parquet_file.schema_arrow.names
+    ts_col = names.index("timestamp")
+    vessel_col = names.index("vessel_id")
+
+    selected = []
+    for i in range(metadata.num_row_groups):
+        group = metadata.row_group(i)
+        ts_stats = group.column(ts_col).statistics
+        if ts_stats is not None and ts_stats.has_min_max:
+            if start_us is not None and ts_stats.max_raw < start_us:
+                continue
+            if end_us is not None and ts_stats.min_raw > end_us:
+                continue
+        vessel_stats = group.column(vessel_col).statistics
+        if mmsi is not None and vessel_stats is not None and vessel_stats.has_min_max:
+            first = np.searchsorted(mmsi, vessel_stats.min_raw, side="left")
+            if first == len(mmsi) or mmsi[first] > vessel_stats.max_raw:
+                continue
+        selected.append(i)
+    return selected
+
+
+def read_archive(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    mmsi: Optional[Iterable[int]] = None,
+    columns: Optional[Sequence[str]] = None,
+    archive_dir: Path = ARCHIVE_DIR,
+) -> pa.Table:
+    """Read archived reports in ``[start, end]``, optionally for specific MMSIs.
+
+    Day partitions outside the range are never opened, and row groups are
+    skipped using their timestamp and vessel_id statistics. Files are
+    memory-mapped so only the selected column chunks are paged in.
+    """
+    start_us = _to_micros(start) if start else None
+    end_us = _to_micros(end) if end else None
+    mmsi_array = np.unique(np.fromiter(mmsi, dtype=np.int64)) if mmsi is not None else None
+    read_columns = list(columns) if columns else ARCHIVE_SCHEMA.names
+    filter_columns = [c for c in ("vessel_id", "timestamp") if c not in read_columns]
+
+    tables = []
+    for path in archive_files(start, end, archive_dir):
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        row_groups = _row_groups_to_read(parquet_file, start_us, end_us, mmsi_array)
+        if not row_groups:
+            continue
+        table = parquet_file.read_row_groups(row_groups, columns=read_columns + filter_columns)
+
+        mask = None
+        timestamps = table["timestamp"]
+        if start_us is not None:
+            mask = pc.greater_equal(timestamps, pa.scalar(start_us, type=timestamps.type))
+        if end_us is not None:
+            upper = pc.less_equal(timestamps, pa.scalar(end_us, type=timestamps.type))
+            mask = upper if mask is None else pc.and_(mask, upper)
+        if mmsi_array is not None:
+            wanted = pc.is_in(table["vessel_id"], value_set=pa.array(mmsi_array, type=pa.int32()))
+            mask = wanted if mask is None else pc.and_(mask, wanted)
+        if mask is not None:
+            table = table.filter(mask)
+        tables.append(table.select(read_columns))
+
+    if not tables:
+        return ARCHIVE_SCHEMA.empty_table().select(read_columns)
+    return pa.concat_tables(tables)
+
+
+def read_archive_frame(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    mmsi: Optional[Iterable[int]] = None,
+    parse_raw_json: bool = False,
+    archive_dir: Path = ARCHIVE_DIR,
+) -> pd.DataFrame:
+    """Archived reports as a DataFrame shaped like a ``raw_ais_data`` query.
+
+    With ``parse_raw_json`` the ``raw_json`` column holds dicts, matching what
+    psycopg2 returns for the JSONB column, so training code can mix both sources.
+    """
+    columns = ["vessel_id", "latitude", "longitude", "timestamp", "raw_json"]
+    frame = read_archive(start, end, mmsi, columns=columns, archive_dir=archive_dir).to_pandas()
+    if parse_raw_json and not frame.empty:
+        frame["raw_json"] = frame["raw_json"].map(json.loads)
+    return frame
@@ -0,0 +1,102 @@
+"""Benchmark the close-encounter engine on a synthetic Baltic fleet.
+
+Checks the grid-pruned result against the all-pairs reference on a small
+fleet, then times fleets of increasing size:
+
+    python benchmarks/bench_encounters.py --sizes 1000 5000 10000 20000
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from encounters import brute_force_encounters, candidate_pairs, find_close_encounters  # noqa: E402
+
+# Traffic is concentrated around a few hubs rather than spread uniformly
+HUBS = np.array([
+    (60.15, 24.95),  # Helsinki
+    (59.44, 24.75),  # Tallinn
+    (59.33, 18.07),  # Stockholm
+    (54.35, 18.65),  # Gdansk
+    (55.68, 12.57),  # Copenhagen
+    (60.45, 22.25),  # Turku
+])
+
+
+def synthetic_fleet(n: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    clustered = rng.random(n) < 0.6
+    hub = HUBS[rng.integers(len(HUBS), size=n)]
+    lat = np.where(clustered, hub[:, 0] + rng.normal(0, 0.15, n), rng.uniform(54, 65, n))
+    lon = np.where(clustered, hub[:, 1] + rng.normal(0, 0.3, n), rng.uniform(10, 29, n))
+    moored = rng.random(n) < 0.3
+    sog = np.where(moored, rng.uniform(0, 0.3, n), rng.gamma(4.0, 3.0, n).clip(0, 35))
+    return {
+        "vessel_id": np.arange(230000000, 230000000 + n),
+        "lat": lat,
+        "lon": lon,
+        "sog": sog,
+        "cog": rng.uniform(0, 360, n),
+    }
+
+
+def _pairs(result: dict) -> set:
+    return set(zip(
+        np.minimum(result["vessel_id_1"], result["vessel_id_2"]).tolist(),
+        np.maximum(result["vessel_id_1"], result["vessel_id_2"]).tolist(),
+    ))
+
+
+def check_against_brute_force(n: int) -> int:
+    fleet = synthetic_fleet(n, seed=1)
+    fast = _pairs(find_close_encounters(**fleet))
+    exact = _pairs(brute_force_encounters(**fleet))
+    if fast != exact:
+        raise SystemExit(f"Mismatch: {len(exact - fast)} missed, {len(fast - exact)} spurious")
+    return len(exact)
+
+
+def time_fleet(n: int, repeats: int) -> dict:
+    fleet = synthetic_fleet(n)
+    find_close_encounters(**fleet)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = find_close_encounters(**fleet)
+        timings.append(time.perf_counter() - start)
+    candidates = len(candidate_pairs(
+        fleet["lat"], fleet["lon"], fleet["sog"], fleet["cog"], 926.0, 1800.0
+    ))
+    return {
+        "vessels": n,
+        "all_pairs": n * (n - 1) // 2,
+        "candidate_pairs": candidates,
+        "encounters": len(result["cpa_m"]),
+        "median_s": float(np.median(timings)),
+        "max_s": float(np.max(timings)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 10000, 20000])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--check-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    matched = check_against_brute_force(args.check_size)
+    results = {
+        "check": {"vessels": args.check_size, "encounters": matched, "matches_brute_force": True},
+        "runs": [time_fleet(n, args.repeats) for n in args.sizes],
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
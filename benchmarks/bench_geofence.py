@@ -0,0 +1,197 @@
+"""Measure the ingest overhead of geofence evaluation.
+
+By default times ``GeofenceMonitor.evaluate`` per ingest batch and compares
+it with the in-process work ``store_raw_data_batch`` already does per batch
+(validation and JSON encoding), which excludes database round trips and so
+overstates the relative cost. With ``--db`` the real ingest path is timed
+against the configured database with geofences off and on, alternating which
+runs first, and the median and range over the repetitions are reported. It is
+timed for vessels sailing the shipping lanes and for the worst case, vessels
+hopping in and out of zones with a transition in almost every batch. The
+synthetic MMSIs are deleted afterwards.
+
+    python benchmarks/bench_geofence.py --reports 50000
+    python benchmarks/bench_geofence.py --db --reports 2000
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from geofence import GEOFENCE_PATH, GeofenceIndex, GeofenceMonitor  # noqa: E402
+from synthetic_ais import MMSI_BASE, SyntheticFleet  # noqa: E402
+
+
+def synthetic_reports(n: int, vessels: int, index: GeofenceIndex, seed: int = 0) -> list:
+    """Reports for ``vessels`` ships, half of them loitering around zone centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = np.array([(g.centroid.y, g.centroid.x) for g in index.geometries])
+    near_zone = rng.random(n) < 0.5
+    anchor = centroids[rng.integers(len(centroids), size=n)]
+    lat = np.where(near_zone, anchor[:, 0] + rng.normal(0, 0.03, n), rng.uniform(54, 65, n))
+    lon = np.where(near_zone, anchor[:, 1] + rng.normal(0, 0.06, n), rng.uniform(10, 29, n))
+    vessel_ids = MMSI_BASE + rng.integers(vessels, size=n)
+    start = datetime.now() - timedelta(hours=1)
+    return [
+        {
+            "mmsi": str(vessel_ids[k]),
+            "lat": float(lat[k]),
+            "lon": float(lon[k]),
+            "time": int((start + timedelta(seconds=k)).timestamp()),
+            "properties": {"sog": 8.5, "cog": 91.0, "heading": 90, "posAcc": True, "navStat": 0},
+        }
+        for k in range(n)
+    ]
+
+
+def lane_reports(n: int, vessels: int, seed: int = 0) -> list:
+    """The first ``n`` reports of a ``SyntheticFleet``, whose vessels sail continuous tracks.
+
+    Unlike ``synthetic_reports`` few of these cross a zone edge, as on the live feed.
+    """
+    fleet = SyntheticFleet(vessels, seed=seed, duplicate_rate=0.0, late_rate=0.0)
+    columns = fleet.reports(12.0 * n / vessels + 180.0, start=float(int(time.time() - 3600)))
+    return [
+        {
+            "mmsi": str(columns["mmsi"][k]),
+            "lat": float(columns["lat"][k]),
+            "lon": float(columns["lon"][k]),
+            "time": int(columns["time"][k]),
+            "properties": {"sog": float(columns["sog"][k]), "cog": float(columns["cog"][k]),
+                           "heading": int(columns["heading"][k]), "posAcc": True,
+                           "navStat": int(columns["nav_stat"][k])},
+        }
+        for k in range(min(n, len(columns["mmsi"])))
+    ]
+
+
+def batches(reports: list, size: int):
+    for offset in range(0, len(reports), size):
+        yield reports[offset:offset + size]
+
+
+def time_evaluate(index: GeofenceIndex, reports: list, batch_size: int) -> dict:
+    monitor = GeofenceMonitor(index)
+    events = 0
+    start = time.perf_counter()
+    for batch in batches(reports, batch_size):
+        update = monitor.evaluate(
+            [int(r["mmsi"]) for r in batch],
+            [r["lat"] for r in batch],
+            [r["lon"] for r in batch],
+            [datetime.fromtimestamp(r["time"]) for r in batch],
+        )
+        monitor.apply(update)
+        events += len(update.events)
+    elapsed = time.perf_counter() - start
+
+    # The CPU-side work already done per record at ingest
+    start = time.perf_counter()
+    for batch in batches(reports, batch_size):
+        for r in batch:
+            datetime.fromtimestamp(r["time"])
+            json.dumps(r)
+    baseline = time.perf_counter() - start
+
+    return {
+        "batch_size": batch_size,
+        "reports": len(reports),
+        "events": events,
+        "geofence_us_per_report": 1e6 * elapsed / len(reports),
+        "ingest_cpu_us_per_report": 1e6 * baseline / len(reports),
+        "overhead_vs_ingest_cpu_pct": 100.0 * elapsed / baseline,
+    }
+
+
+def time_database_ingest(index: GeofenceIndex, reports: list, repeats: int) -> dict:
+    """Time the ingest path with geofences off and on, alternating which runs first.
+
+    Later runs insert into a larger table, and the first run of all pays for cold
+    caches, so each repetition swaps the order and the median is reported.
+    """
+    import database
+    import mqtt_client
+
+    span = reports[-1]["time"] - reports[0]["time"] + 1
+
+    def run(monitor, shift):
+        mqtt_client.geofence_monitor = monitor
+        start = time.perf_counter()
+        for batch in batches(reports, mqtt_client.BATCH_SIZE):
+            # Fresh timestamps per run so every report is inserted
+            mqtt_client.store_raw_data_batch([dict(r, time=r["time"] + shift) for r in batch])
+        return len(reports) / (time.perf_counter() - start)
+
+    rates = {"without": [], "with": []}
+    drops = []
+    runs = 0
+    monitor = GeofenceMonitor(index)
+    events = sum(len(monitor.evaluate(
+        [int(r["mmsi"]) for r in batch], [r["lat"] for r in batch], [r["lon"] for r in batch],
+        [datetime.fromtimestamp(r["time"]) for r in batch],
+    ).events) for batch in batches(reports, mqtt_client.BATCH_SIZE))
+    try:
+        for repeat in range(repeats):
+            order = ("without", "with") if repeat % 2 == 0 else ("with", "without")
+            rate = {}
+            for mode in order:
+                runs += 1
+                rate[mode] = run(GeofenceMonitor(index) if mode == "with" else None, runs * span)
+                rates[mode].append(rate[mode])
+            drops.append(100.0 * (1 - rate["with"] / rate["without"]))
+    finally:
+        mqtt_client.geofence_monitor = None
+        conn = database.connect()
+        with conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM raw_ais_data WHERE vessel_id >= %s", (MMSI_BASE,))
+            cur.execute("DELETE FROM geofence_events WHERE vessel_id >= %s", (MMSI_BASE,))
+        database.release(conn)
+
+    def spread(values):
+        return {"median": float(np.median(values)), "min": float(np.min(values)), "max": float(np.max(values))}
+
+    return {
+        "reports": len(reports),
+        "events_per_run": events,
+        "repeats": repeats,
+        "reports_per_s_without": spread(rates["without"]),
+        "reports_per_s_with": spread(rates["with"]),
+        "throughput_drop_pct": spread(drops),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--geofences", type=Path, default=GEOFENCE_PATH)
+    parser.add_argument("--reports", type=int, default=50000)
+    parser.add_argument("--vessels", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--db", action="store_true", help="Also time the real ingest path against the database")
+    parser.add_argument("--repeats", type=int, default=6, help="Paired database runs, alternating which goes first")
+    args = parser.parse_args()
+
+    index = GeofenceIndex.from_geojson(args.geofences)
+    reports = synthetic_reports(args.reports, args.vessels, index)
+    results = {
+        "zones": len(index),
+        "evaluate": [time_evaluate(index, reports, size) for size in args.batch_sizes],
+    }
+    if args.db:
+        results["database_ingest"] = {
+            "lanes": time_database_ingest(index, lane_reports(args.reports, args.vessels), args.repeats),
+            "loitering": time_database_ingest(index, reports, args.repeats),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
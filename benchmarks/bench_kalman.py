@@ -0,0 +1,223 @@
+"""Compare the Kalman tracker with dead reckoning and the RandomForest path.
+
+Accuracy: a synthetic fleet reports for ``--history`` seconds, with GPS noise
+added to the positions (SOG/COG already carry the generator's noise). Each
+vessel's last report is then projected 30 minutes ahead by dead reckoning
+(``calculate_position_prediction``) and by the tracker, and compared with
+the vessel's true position at its first report 30 minutes later.
+
+Cost: one prediction cycle's worth of work for the whole fleet. For the
+tracker that is folding in the cycle's reports and predicting every vessel.
+For the model it is the per-vessel DataFrame and ``predict`` call that
+``make_predictions`` makes, plus a single batched ``predict`` for reference.
+The model is loaded from NAVICAST_MODEL_PATH, or a stand-in RandomForest with
+the notebook's hyperparameters is trained on synthetic data.
+
+    python benchmarks/bench_kalman.py --vessels 500 2000 5000
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from synthetic_ais import SyntheticFleet  # noqa: E402
+
+from kalman_tracker import METERS_PER_DEG_LAT, KalmanTracker  # noqa: E402
+from prediction_service import (  # noqa: E402
+    CYCLE_INTERVAL_SECONDS,
+    MODEL_PATH,
+    PREDICTION_INTERVAL,
+    calculate_position_prediction,
+)
+
+START = 1.7e9
+FEATURES = ["latitude", "longitude", "sog", "cog", "heading", "time_diff"]
+
+
+def noisy_reports(fleet: SyntheticFleet, duration_s: float, gps_sigma_m: float, seed: int) -> dict:
+    """Generator reports plus measured positions with GPS noise and SOG/COG at AIS resolution."""
+    columns = fleet.reports(duration_s, start=START)
+    rng = np.random.default_rng(seed)
+    n = len(columns["time"])
+    cos_lat = np.cos(np.radians(columns["lat"]))
+    columns["measured_lat"] = columns["lat"] + rng.normal(0, gps_sigma_m, n) / METERS_PER_DEG_LAT
+    columns["measured_lon"] = columns["lon"] + rng.normal(0, gps_sigma_m, n) / (METERS_PER_DEG_LAT * cos_lat)
+    columns["sog"] = np.round(columns["sog"], 1)
+    columns["cog"] = np.round(columns["cog"], 1)
+    return columns
+
+
+def evaluation_pairs(columns: dict, history_s: float):
+    """Per vessel: index of its last report in the history and of its first report a horizon later."""
+    in_history = columns["time"] < START + history_s
+    origin = {}
+    for i, vessel in zip(np.flatnonzero(in_history).tolist(), columns["vessel"][in_history].tolist()):
+        origin[vessel] = i
+    target = {}
+    for i in np.flatnonzero(~in_history).tolist():
+        vessel = int(columns["vessel"][i])
+        if vessel in origin and vessel not in target \
+                and columns["time"][i] >= columns["time"][origin[vessel]] + PREDICTION_INTERVAL:
+            target[vessel] = i
+    vessels = np.array(sorted(target))
+    return in_history, vessels, np.array([origin[v] for v in vessels]), np.array([target[v] for v in vessels])
+
+
+def error_m(lat, lon, true_lat, true_lon) -> np.ndarray:
+    return np.hypot(
+        (lat - true_lat) * METERS_PER_DEG_LAT,
+        (lon - true_lon) * METERS_PER_DEG_LAT * np.cos(np.radians(true_lat)),
+    )
+
+
+def summary(errors: np.ndarray) -> dict:
+    return {
+        "median_m": float(np.median(errors)),
+        "p90_m": float(np.percentile(errors, 90)),
+        "mean_m": float(errors.mean()),
+    }
+
+
+def accuracy(fleet: SyntheticFleet, history_s: float, gps_sigma_m: float) -> dict:
+    columns = noisy_reports(fleet, history_s + PREDICTION_INTERVAL + 300, gps_sigma_m, seed=fleet.seed)
+    in_history, vessels, origin, target = evaluation_pairs(columns, history_s)
+
+    tracker = KalmanTracker()
+    tracker.update(
+        columns["mmsi"][in_history], columns["time"][in_history], columns["measured_lat"][in_history],
+        columns["measured_lon"][in_history], columns["sog"][in_history], columns["cog"][in_history],
+    )
+
+    lat0, lon0 = columns["measured_lat"][origin], columns["measured_lon"][origin]
+    horizon = columns["time"][target] - columns["time"][origin]
+    deltas = np.array([
+        calculate_position_prediction(lat, lon, sog, cog, dt)
+        for lat, lon, sog, cog, dt in zip(lat0, lon0, columns["sog"][origin], columns["cog"][origin], horizon)
+    ])
+    true_lat, true_lon = columns["lat"][target], columns["lon"][target]
+    dead_reckoning = error_m(lat0 + deltas[:, 0], lon0 + deltas[:, 1], true_lat, true_lon)
+    tracked = error_m(*tracker.predict(columns["mmsi"][target], columns["time"][target]), true_lat, true_lon)
+
+    moving = ~fleet.moored[vessels]
+    return {
+        "evaluated": len(vessels),
+        "dead_reckoning": {
+            **summary(dead_reckoning),
+            "moving": summary(dead_reckoning[moving]),
+            "moored": summary(dead_reckoning[~moving]),
+        },
+        "kalman": {**summary(tracked), "moving": summary(tracked[moving]), "moored": summary(tracked[~moving])},
+    }
+
+
+def load_or_train_model(fleet: SyntheticFleet):
+    if MODEL_PATH.exists():
+        import joblib
+        return joblib.load(MODEL_PATH), str(MODEL_PATH)
+
+    from sklearn.ensemble import RandomForestRegressor
+
+    # Learn 30-minute displacements from synthetic reports, as the notebook does from the archive
+    columns = noisy_reports(fleet, 3 * PREDICTION_INTERVAL, 10.0, seed=fleet.seed + 1)
+    _, _, origin, target = evaluation_pairs(columns, 2 * PREDICTION_INTERVAL)
+    features = pd.DataFrame({
+        "latitude": columns["measured_lat"][origin],
+        "longitude": columns["measured_lon"][origin],
+        "sog": columns["sog"][origin],
+        "cog": columns["cog"][origin],
+        "heading": columns["heading"][origin].astype(float),
+        "time_diff": columns["time"][target] - columns["time"][origin],
+    })
+    labels = np.column_stack([
+        columns["lat"][target] - columns["measured_lat"][origin],
+        columns["lon"][target] - columns["measured_lon"][origin],
+    ])
+    model = RandomForestRegressor(n_estimators=100, random_state=19, n_jobs=-1, max_depth=15, min_samples_leaf=5)
+    model.fit(features, labels)
+    return model, "synthetic RandomForestRegressor"
+
+
+def cycle_cost(fleet: SyntheticFleet, model, repeats: int) -> dict:
+    columns = noisy_reports(fleet, 2 * CYCLE_INTERVAL_SECONDS, 10.0, seed=fleet.seed + 2)
+    first_cycle = columns["time"] < START + CYCLE_INTERVAL_SECONDS
+    cycle = ~first_cycle
+    latest = {}
+    for i, vessel in enumerate(columns["vessel"].tolist()):
+        latest[vessel] = i
+    rows = np.array(list(latest.values()))
+    targets = columns["time"][rows] + PREDICTION_INTERVAL
+
+    def report_args(mask):
+        return (columns["mmsi"][mask], columns["time"][mask], columns["measured_lat"][mask],
+                columns["measured_lon"][mask], columns["sog"][mask], columns["cog"][mask])
+
+    tracker_seconds = []
+    for _ in range(repeats):
+        tracker = KalmanTracker()
+        tracker.update(*report_args(first_cycle))
+        start = time.perf_counter()
+        tracker.update(*report_args(cycle))
+        tracker.predict(columns["mmsi"][rows], targets)
+        tracker_seconds.append(time.perf_counter() - start)
+
+    features = pd.DataFrame({
+        "latitude": columns["measured_lat"][rows],
+        "longitude": columns["measured_lon"][rows],
+        "sog": columns["sog"][rows],
+        "cog": columns["cog"][rows],
+        "heading": columns["heading"][rows].astype(float),
+        "time_diff": float(PREDICTION_INTERVAL),
+    })[FEATURES]
+
+    # As make_predictions does it: one DataFrame and one predict call per vessel
+    start = time.perf_counter()
+    for record in features.to_dict("records"):
+        model.predict(pd.DataFrame({name: [value] for name, value in record.items()}))
+    per_vessel = time.perf_counter() - start
+
+    batched_seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(features)
+        batched_seconds.append(time.perf_counter() - start)
+
+    return {
+        "vessels": len(rows),
+        "cycle_reports": int(cycle.sum()),
+        "kalman_s": float(np.median(tracker_seconds)),
+        "model_per_vessel_s": per_vessel,
+        "model_batched_s": float(np.median(batched_seconds)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vessels", type=int, nargs="+", default=[500, 2000])
+    parser.add_argument("--history", type=float, default=600.0, help="Seconds of reports before the prediction")
+    parser.add_argument("--gps-sigma", type=float, default=10.0, help="Position noise added to reports (m)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--skip-cost", action="store_true", help="Only measure accuracy")
+    args = parser.parse_args()
+
+    results = {"accuracy": [], "cycle_cost": []}
+    model = None
+    for n in args.vessels:
+        fleet = SyntheticFleet(n, seed=args.seed)
+        results["accuracy"].append({"vessels": n, **accuracy(fleet, args.history, args.gps_sigma)})
+        if not args.skip_cost:
+            if model is None:
+                model, results["model"] = load_or_train_model(SyntheticFleet(2000, seed=args.seed + 1))
+            results["cycle_cost"].append(cycle_cost(fleet, model, args.repeats))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""End-to-end NAVICAST benchmark on synthetic AIS traffic against a local Postgres.
+
+For each fleet size the suite runs three stages in one process:
+
+1. ingest: delivers synthetic vessels-v2 metadata and location messages
+   (duplicates and late reports included) through ``mqtt_client.on_message``,
+   which batches them into ``store_raw_data_batch``
+2. prediction: runs ``prediction_service.make_predictions`` cycles
+3. api: requests the main routes in-process through Starlette's TestClient,
+   so handler, middleware and database time are measured without the network
+
+It records throughput, p50/p99 latency and process memory, and writes the
+results as JSON. Pass an earlier results file as ``--baseline`` to print the
+relative change of every metric.
+
+Rows for the synthetic MMSIs (990000000 and up) are removed before and after
+each scale. Prediction cycles also process any real vessels in the database,
+so point NAVICAST_DB_NAME at a dedicated benchmark database.
+
+    python benchmarks/bench_pipeline.py --vessels 500 2000 --output results.json
+    python benchmarks/bench_pipeline.py --vessels 2000 --baseline results.json
+"""
+
+import argparse
+import json
+import logging
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from synthetic_ais import MMSI_BASE, SyntheticFleet  # noqa: E402
+
+import database  # noqa: E402
+import mqtt_client  # noqa: E402
+import prediction_service  # noqa: E402
+import api_server  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+SYNTHETIC_TABLES = ("raw_ais_data", "predictions", "prediction_history", "geofence_events", "vessel_metadata")
+SCALE_MMSI_STRIDE = 1000000
+
+
+def latency_stats(seconds) -> dict:
+    values = np.asarray(seconds, dtype=float) * 1000.0
+    if not len(values):
+        return {}
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "mean_ms": float(values.mean()),
+    }
+
+
+def memory() -> dict:
+    """Current and peak resident set size of this process."""
+    rss_kb = 0
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                rss_kb = int(line.split()[1])
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_kb = peak / 1024 if sys.platform == "darwin" else peak
+    return {"rss_mb": rss_kb / 1024, "peak_rss_mb": peak_kb / 1024}
+
+
+def cleanup() -> None:
+    conn = None
+    try:
+        conn = database.connect()
+        with conn, conn.cursor() as cur:
+            for table in SYNTHETIC_TABLES:
+                cur.execute(f"DELETE FROM {table} WHERE vessel_id >= %s", (MMSI_BASE,))
+            cur.execute(
+                "DELETE FROM encounters WHERE vessel_id_1 >= %s OR vessel_id_2 >= %s", (MMSI_BASE, MMSI_BASE)
+            )
+    finally:
+        if conn:
+            database.release(conn)
+
+
+def bench_ingest(fleet: SyntheticFleet, duration_s: float) -> dict:
+    messages = fleet.metadata_messages() + fleet.location_messages(duration_s)
+
+    batch_seconds = []
+    store_batch = mqtt_client.store_raw_data_batch
+
+    def timed_store_batch(batch_data):
+        start = time.perf_counter()
+        store_batch(batch_data)
+        batch_seconds.append(time.perf_counter() - start)
+
+    inserted_before = mqtt_client.RECORDS_INSERTED.labels().value
+    call_seconds = np.empty(len(messages))
+    mqtt_client.store_raw_data_batch = timed_store_batch
+    try:
+        start = time.perf_counter()
+        for i, message in enumerate(messages):
+            call_start = time.perf_counter()
+            mqtt_client.on_message(None, None, message)
+            call_seconds[i] = time.perf_counter() - call_start
+        mqtt_client.flush_batches()
+        elapsed = time.perf_counter() - start
+    finally:
+        mqtt_client.store_raw_data_batch = store_batch
+
+    return {
+        "messages": len(messages),
+        "records_inserted": int(mqtt_client.RECORDS_INSERTED.labels().value - inserted_before),
+        "seconds": elapsed,
+        "messages_per_s": len(messages) / elapsed,
+        "on_message": latency_stats(call_seconds),
+        "batch": {"batches": len(batch_seconds), **latency_stats(batch_seconds)},
+    }
+
+
+def bench_prediction(cycles: int) -> dict:
+    created = prediction_service.PREDICTIONS.labels(outcome="created")
+    created_before = created.value
+    cycle_seconds = []
+    for _ in range(cycles):
+        start = time.perf_counter()
+        prediction_service.make_predictions()
+        cycle_seconds.append(time.perf_counter() - start)
+
+    vessels = int(prediction_service.VESSELS_PER_CYCLE.labels().value)
+    median = float(np.median(cycle_seconds))
+    return {
+        "cycles": cycles,
+        "vessels": vessels,
+        "predictions_per_cycle": (created.value - created_before) / cycles,
+        "vessels_per_s": vessels / median if median else None,
+        "cycle": latency_stats(cycle_seconds),
+    }
+
+
+def api_routes(fleet: SyntheticFleet) -> dict:
+    sample = fleet.mmsi[::max(1, fleet.vessels // 50)].tolist()
+    return {
+        "/vessels": lambda i: "/vessels?limit=100",
+        "/vessels?bbox": lambda i: "/vessels?limit=1000&bbox=24,59.5,26,60.5",
+        "/vessels/clusters": lambda i: "/vessels/clusters?bbox=10,54,30,66&zoom=6",
+        "/vessels/{vessel_id}": lambda i: f"/vessels/{sample[i % len(sample)]}",
+        "/vessels/{vessel_id}/track": lambda i: f"/vessels/{sample[i % len(sample)]}/track",
+        "/encounters": lambda i: "/encounters?limit=100",
+        "/vessels/download": lambda i: "/vessels/download?format=csv",
+    }
+
+
+def bench_api(fleet: SyntheticFleet, requests: int) -> dict:
+    results = {}
+    with TestClient(api_server.app) as client:
+        for route, url_for in api_routes(fleet).items():
+            seconds = []
+            errors = 0
+            start = time.perf_counter()
+            for i in range(requests):
+                request_start = time.perf_counter()
+                response = client.get(url_for(i))
+                seconds.append(time.perf_counter() - request_start)
+                errors += response.status_code >= 400
+            elapsed = time.perf_counter() - start
+            results[route] = {
+                "requests": requests,
+                "errors": errors,
+                "requests_per_s": requests / elapsed,
+                # The first request pays for cold caches and the store load
+                "first_ms": seconds[0] * 1000.0,
+                **latency_stats(seconds[1:]),
+            }
+    return results
+
+
+def run_scale(index: int, vessels: int, args) -> dict:
+    logging.getLogger("navicast.bench").warning(f"Benchmarking {vessels} vessels")
+    cleanup()
+    # A fresh MMSI range per scale, so the API's in-memory state from earlier scales does not overlap
+    fleet = SyntheticFleet(vessels, seed=args.seed, mmsi_base=MMSI_BASE + index * SCALE_MMSI_STRIDE)
+    try:
+        result = {"vessels": vessels}
+        result["ingest"] = bench_ingest(fleet, args.duration)
+        result["memory_after_ingest"] = memory()
+        result["prediction"] = bench_prediction(args.prediction_cycles)
+        result["memory_after_prediction"] = memory()
+        result["api"] = bench_api(fleet, args.requests)
+        result["memory_after_api"] = memory()
+        return result
+    finally:
+        if not args.keep:
+            cleanup()
+
+
+def _flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten(item, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, float(value)
+
+
+def compare(current: dict, baseline: dict) -> None:
+    """Print the relative change of every metric for scales present in both runs."""
+    previous = {result["vessels"]: dict(_flatten(result)) for result in baseline["results"]}
+    for result in current["results"]:
+        before = previous.get(result["vessels"])
+        if before is None:
+            continue
+        print(f"\n{result['vessels']} vessels (vs {baseline.get('label') or baseline.get('git_commit')})", file=sys.stderr)
+        for metric, value in _flatten(result):
+            old = before.get(metric)
+            if old and metric != "vessels":
+                print(f"  {metric:60s} {old:12.2f} -> {value:12.2f} ({100.0 * (value - old) / old:+.1f}%)",
+                      file=sys.stderr)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vessels", type=int, nargs="+", default=[500, 2000], help="Fleet sizes, at most 1000000 each")
+    parser.add_argument("--duration", type=float, default=600.0, help="Seconds of simulated traffic per scale")
+    parser.add_argument("--prediction-cycles", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=50, help="Requests per API route")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-geofences", action="store_true", help="Ingest without geofence evaluation")
+    parser.add_argument("--keep", action="store_true", help="Leave the synthetic rows in the database")
+    parser.add_argument("--log-level", default="WARNING", help="Service log level during the run")
+    parser.add_argument("--label", help="Name for this run in comparisons")
+    parser.add_argument("--output", type=Path, help="Write results here as well as to stdout")
+    parser.add_argument("--baseline", type=Path, help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    # Per-message INFO logging would otherwise dominate the ingest numbers
+    logging.getLogger().setLevel(args.log_level)
+    prediction_service.model = prediction_service.load_model()
+    if not args.no_geofences:
+        mqtt_client.init_geofences()
+
+    results = {
+        "suite": "navicast-pipeline",
+        "label": args.label,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "duration_s": args.duration,
+            "prediction_cycles": args.prediction_cycles,
+            "requests": args.requests,
+            "seed": args.seed,
+            "geofences": mqtt_client.geofence_monitor is not None,
+            "model": prediction_service.model is not None,
+        },
+        "results": [run_scale(index, vessels, args) for index, vessels in enumerate(args.vessels)],
+    }
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text + "\n")
+    if args.baseline:
+        compare(results, json.loads(args.baseline.read_text()))
+
+
+if __name__ == "__main__":
+    main()
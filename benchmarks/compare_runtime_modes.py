@@ -0,0 +1,144 @@
+"""Compare the three-process deployment with the unified runtime.
+
+Each mode is started against the configured database and the live
+Digitraffic feed, then measured for:
+
+- startup: seconds from launch until the API answers ``/health``
+- memory: total RSS and PSS of the service processes after the run (Linux ``/proc``)
+- latency: seconds from a report's AIS timestamp until ``/vessels`` first
+  returns it, sampled by polling. Broker delay is included and is the same in
+  both modes; reports already present at the first poll are not counted.
+
+Stop any running NAVICAST services first; both modes use port 8000.
+
+    python benchmarks/compare_runtime_modes.py --duration 120
+"""
+
+import argparse
+import json
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+API_URL = "http://localhost:8000"
+
+MODES = {
+    "processes": ["mqtt_client.py", "prediction_service.py", "api_server.py"],
+    "unified": ["navicast_runtime.py"],
+}
+
+
+def get_json(path: str, timeout: float = 5.0):
+    with urllib.request.urlopen(API_URL + path, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def wait_healthy(timeout: float) -> float:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            get_json("/health", timeout=1.0)
+            return time.monotonic()
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"API did not become healthy within {timeout:.0f}s")
+
+
+def _proc_kb(path: Path, field: str) -> int:
+    try:
+        for line in path.read_text().splitlines():
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def memory_mb(pids) -> dict:
+    """Resident and proportional set size summed over the processes."""
+    rss = sum(_proc_kb(Path(f"/proc/{pid}/status"), "VmRSS") for pid in pids)
+    pss = sum(_proc_kb(Path(f"/proc/{pid}/smaps_rollup"), "Pss") for pid in pids)
+    return {"rss_mb": rss / 1024, "pss_mb": pss / 1024}
+
+
+def sample_latency(duration: float, interval: float) -> list:
+    """Seconds between each new report's timestamp and its first appearance in /vessels."""
+    seen = set()
+    latencies = []
+    first_poll = True
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        try:
+            vessels = get_json("/vessels?limit=10000")
+        except OSError:
+            time.sleep(interval)
+            continue
+        now = time.time()
+        for vessel in vessels:
+            key = (vessel["vessel_id"], vessel["current_timestamp"])
+            if key in seen or not vessel["current_timestamp"]:
+                continue
+            seen.add(key)
+            if not first_poll:
+                latencies.append(now - datetime.fromisoformat(vessel["current_timestamp"]).timestamp())
+        first_poll = False
+        time.sleep(interval)
+    return latencies
+
+
+def stop(processes) -> None:
+    for process in processes:
+        process.send_signal(signal.SIGINT)
+    for process in processes:
+        try:
+            process.wait(timeout=20)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def run_mode(name: str, duration: float, interval: float, startup_timeout: float) -> dict:
+    started = time.monotonic()
+    processes = [
+        subprocess.Popen([sys.executable, script], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for script in MODES[name]
+    ]
+    try:
+        startup = wait_healthy(startup_timeout) - started
+        latencies = sample_latency(duration, interval)
+        memory = memory_mb([process.pid for process in processes])
+    finally:
+        stop(processes)
+
+    result = {"mode": name, "processes": len(processes), "startup_s": startup, **memory,
+              "latency_samples": len(latencies)}
+    if latencies:
+        values = np.array(latencies)
+        result.update({
+            "latency_p50_s": float(np.percentile(values, 50)),
+            "latency_p95_s": float(np.percentile(values, 95)),
+            "latency_max_s": float(values.max()),
+        })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--duration", type=float, default=120.0, help="Seconds of latency sampling per mode")
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    results = [run_mode(name, args.duration, args.poll_interval, args.startup_timeout) for name in args.modes]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
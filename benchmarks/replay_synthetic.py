@@ -0,0 +1,56 @@
+"""Publish synthetic AIS traffic to an MQTT broker in real time.
+
+Lets the services run without the live Digitraffic feed: start any broker
+with a websockets listener, point the MQTT client at it and replay a fleet.
+Reports carry current timestamps and are published at their delivery time,
+duplicates and late deliveries included.
+
+    NAVICAST_MQTT_BROKER=localhost NAVICAST_MQTT_PORT=8080 NAVICAST_MQTT_TLS=0 ./start_navicast.sh
+    python benchmarks/replay_synthetic.py --vessels 500 --duration 300 --port 8080
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import paho.mqtt.client as mqtt
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from synthetic_ais import SyntheticFleet  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vessels", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=300.0, help="Seconds of traffic to publish")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--transport", default="websockets", choices=["websockets", "tcp"])
+    args = parser.parse_args()
+
+    fleet = SyntheticFleet(args.vessels, seed=args.seed)
+    start = float(int(time.time()))
+    messages = fleet.metadata_messages(at=start) + fleet.location_messages(args.duration, start=start)
+
+    client = mqtt.Client(transport=args.transport, callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
+    client.connect(args.host, args.port, keepalive=60)
+    client.loop_start()
+    try:
+        for message in messages:
+            delay = message.delivered_at - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            client.publish(message.topic, message.payload, qos=0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.loop_stop()
+        client.disconnect()
+    print(f"Published {len(messages)} messages for {args.vessels} vessels", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""Deterministic synthetic Baltic AIS traffic in the Digitraffic vessels-v2 MQTT format.
+
+Moving vessels sail back and forth along a handful of shipping lanes, moored
+ones sit in port and report rarely. Location messages match the
+``vessels-v2/<mmsi>/location`` payloads, in delivery order, with a share
+delivered twice or late (out of order) as the live feed does. The same seed,
+vessel count and start time always give byte-identical messages.
+
+    from synthetic_ais import SyntheticFleet
+    fleet = SyntheticFleet(1000, seed=7)
+    for message in fleet.location_messages(duration_s=600):
+        mqtt_client.on_message(None, None, message)
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+# Outside the valid MID range, so synthetic vessels never collide with real ones
+MMSI_BASE = 990000000
+
+METERS_PER_DEG_LAT = 111195.0
+KNOTS_TO_MPS = 0.514444
+
+# Waypoints (lat, lon) of the main traffic lanes
+LANES = [
+    # Gulf of Finland, Hanko to the eastern gulf
+    [(59.75, 22.95), (59.92, 24.35), (59.98, 25.00), (60.10, 26.30), (60.05, 27.60)],
+    # Helsinki - Tallinn ferries
+    [(60.16, 24.96), (60.05, 24.90), (59.70, 24.80), (59.45, 24.77)],
+    # Stockholm - Åland - Turku approach - Helsinki
+    [(59.33, 18.20), (59.45, 19.20), (59.95, 19.95), (60.05, 21.00), (59.85, 22.50), (59.90, 23.80), (60.16, 24.96)],
+    # Fehmarn Belt - Bornholm - east of Gotland - Gulf of Finland entrance
+    [(54.60, 10.90), (54.70, 12.80), (55.25, 14.80), (56.20, 16.90), (57.50, 19.40), (58.70, 21.10), (59.60, 22.50)],
+    # Gdansk - Gotland
+    [(54.55, 18.70), (55.20, 18.60), (56.30, 19.00), (57.50, 19.40)],
+    # Gulf of Bothnia
+    [(60.30, 19.90), (61.20, 20.50), (62.50, 20.60), (63.50, 21.30), (64.90, 24.90)],
+]
+
+PORTS = [
+    (60.16, 24.96),  # Helsinki
+    (59.45, 24.77),  # Tallinn
+    (59.33, 18.10),  # Stockholm
+    (60.44, 22.22),  # Turku
+    (54.40, 18.67),  # Gdansk
+    (54.33, 10.15),  # Kiel
+]
+
+# Class A reporting: every few seconds under way, every three minutes at anchor
+MOVING_REPORT_SECONDS = 10.0
+MOORED_REPORT_SECONDS = 180.0
+
+NAV_STAT_UNDER_WAY = 0
+NAV_STAT_MOORED = 5
+
+SHIP_TYPES = (60, 70, 71, 80, 52, 30, 36)
+
+
+class AISMessage(NamedTuple):
+    """Quacks like a paho ``MQTTMessage`` for ``mqtt_client.on_message``."""
+    delivered_at: float
+    topic: str
+    payload: bytes
+
+
+class _Lane:
+    def __init__(self, waypoints):
+        points = np.asarray(waypoints, dtype=float)
+        self.lat, self.lon = points[:, 0], points[:, 1]
+        dy = np.diff(self.lat) * METERS_PER_DEG_LAT
+        dx = np.diff(self.lon) * METERS_PER_DEG_LAT * np.cos(np.radians((self.lat[:-1] + self.lat[1:]) / 2))
+        self.cumulative = np.concatenate([[0.0], np.cumsum(np.hypot(dx, dy))])
+        self.length = self.cumulative[-1]
+        self.bearing = np.degrees(np.arctan2(dx, dy)) % 360
+
+    def locate(self, distance: np.ndarray):
+        """Position and segment bearing at ``distance`` metres along the lane."""
+        segment = np.clip(np.searchsorted(self.cumulative, distance, side="right") - 1, 0, len(self.bearing) - 1)
+        return (np.interp(distance, self.cumulative, self.lat),
+                np.interp(distance, self.cumulative, self.lon),
+                self.bearing[segment])
+
+
+class SyntheticFleet:
+    """``vessels`` ships with fixed routes, speeds and reporting phases drawn from ``seed``."""
+
+    def __init__(
+        self,
+        vessels: int,
+        seed: int = 0,
+        moored_fraction: float = 0.25,
+        duplicate_rate: float = 0.02,
+        late_rate: float = 0.02,
+        mmsi_base: int = MMSI_BASE,
+    ):
+        self.vessels = vessels
+        self.seed = seed
+        self.duplicate_rate = duplicate_rate
+        self.late_rate = late_rate
+        self.lanes = [_Lane(waypoints) for waypoints in LANES]
+
+        rng = np.random.default_rng(seed)
+        self.mmsi = mmsi_base + np.arange(vessels)
+        self.moored = rng.random(vessels) < moored_fraction
+        lengths = np.array([lane.length for lane in self.lanes])
+        self.lane = rng.choice(len(self.lanes), size=vessels, p=lengths / lengths.sum())
+        self.direction = np.where(rng.random(vessels) < 0.5, 1.0, -1.0)
+        self.offset = rng.uniform(0, 1, vessels) * lengths[self.lane]
+        self.speed_knots = rng.gamma(9.0, 1.6, vessels).clip(6, 25)
+        # Sideways spread so vessels on one lane do not sail on a single line
+        self.spread_lat = rng.normal(0, 0.01, vessels)
+        self.spread_lon = rng.normal(0, 0.02, vessels)
+
+        port = np.asarray(PORTS)[rng.integers(len(PORTS), size=vessels)]
+        self.port_lat = port[:, 0] + rng.normal(0, 0.01, vessels)
+        self.port_lon = port[:, 1] + rng.normal(0, 0.02, vessels)
+        self.port_heading = rng.integers(0, 360, vessels)
+
+        self.interval = np.where(self.moored, MOORED_REPORT_SECONDS, MOVING_REPORT_SECONDS)
+        self.phase = rng.uniform(0, 1, vessels) * self.interval
+        self.ship_type = np.asarray(SHIP_TYPES)[rng.integers(len(SHIP_TYPES), size=vessels)]
+
+    def reports(self, duration_s: float, start: Optional[float] = None) -> dict:
+        """Every report in ``[start, start + duration_s)`` as columns, in report-time order.
+
+        ``start`` defaults to ``duration_s`` before now so the traffic is recent.
+        """
+        start = float(int(time.time() - duration_s)) if start is None else start
+        counts = np.ceil((duration_s - self.phase) / self.interval).clip(0).astype(np.int64)
+        vessel = np.repeat(np.arange(self.vessels), counts)
+        first = np.cumsum(counts) - counts
+        k = np.arange(len(vessel)) - np.repeat(first, counts)
+        elapsed = self.phase[vessel] + k * self.interval[vessel]
+
+        rng = np.random.default_rng([self.seed, int(start)])
+        n = len(vessel)
+        lat = np.empty(n)
+        lon = np.empty(n)
+        cog = np.empty(n)
+
+        moving = ~self.moored[vessel]
+        for index, lane in enumerate(self.lanes):
+            mask = moving & (self.lane[vessel] == index)
+            v = vessel[mask]
+            # Sail to the end of the lane and turn back
+            travelled = self.offset[v] + self.direction[v] * self.speed_knots[v] * KNOTS_TO_MPS * elapsed[mask]
+            folded = np.mod(travelled, 2 * lane.length)
+            distance = np.where(folded <= lane.length, folded, 2 * lane.length - folded)
+            forward = (folded <= lane.length) == (self.direction[v] > 0)
+            lat[mask], lon[mask], bearing = lane.locate(distance)
+            lat[mask] += self.spread_lat[v]
+            lon[mask] += self.spread_lon[v]
+            cog[mask] = np.where(forward, bearing, bearing + 180)
+
+        moored = ~moving
+        v = vessel[moored]
+        lat[moored] = self.port_lat[v] + rng.normal(0, 0.00005, len(v))
+        lon[moored] = self.port_lon[v] + rng.normal(0, 0.0001, len(v))
+        cog[moored] = rng.uniform(0, 360, len(v))
+
+        sog = np.where(moving, self.speed_knots[vessel] + rng.normal(0, 0.3, n), rng.uniform(0, 0.2, n))
+        cog = (cog + np.where(moving, rng.normal(0, 2.0, n), 0.0)) % 360
+        heading = np.where(moving, np.round(cog + rng.normal(0, 3.0, n)) % 360, self.port_heading[vessel])
+
+        order = np.argsort(elapsed, kind="stable")
+        return {
+            "vessel": vessel[order],
+            "mmsi": self.mmsi[vessel][order],
+            "time": start + elapsed[order],
+            "lat": lat[order],
+            "lon": lon[order],
+            "sog": sog[order].clip(0),
+            "cog": cog[order],
+            "heading": heading[order].astype(np.int64),
+            "nav_stat": np.where(moving, NAV_STAT_UNDER_WAY, NAV_STAT_MOORED)[order],
+        }
+
+    def location_messages(self, duration_s: float, start: Optional[float] = None) -> List[AISMessage]:
+        """Location messages in delivery order, including duplicates and late deliveries."""
+        columns = self.reports(duration_s, start)
+        n = len(columns["time"])
+        rng = np.random.default_rng([self.seed, n])
+
+        # Broker and network delay, plus a few reports held back for several intervals
+        delivered = columns["time"] + rng.uniform(0.5, 2.0, n)
+        late = rng.random(n) < self.late_rate
+        delivered[late] += rng.uniform(1, 3, late.sum()) * MOVING_REPORT_SECONDS
+
+        duplicated = np.flatnonzero(rng.random(n) < self.duplicate_rate)
+        rows = np.concatenate([np.arange(n), duplicated])
+        delivered = np.concatenate([delivered, delivered[duplicated] + rng.uniform(0, 2, len(duplicated))])
+        order = np.argsort(delivered, kind="stable")
+
+        messages = []
+        for row, at in zip(rows[order].tolist(), delivered[order].tolist()):
+            payload = {
+                "time": int(columns["time"][row]),
+                "sog": round(float(columns["sog"][row]), 1),
+                "cog": round(float(columns["cog"][row]), 1),
+                "navStat": int(columns["nav_stat"][row]),
+                "rot": 0,
+                "posAcc": True,
+                "raim": False,
+                "heading": int(columns["heading"][row]),
+                "lat": round(float(columns["lat"][row]), 6),
+                "lon": round(float(columns["lon"][row]), 6),
+            }
+            messages.append(AISMessage(
+                at, f"vessels-v2/{columns['mmsi'][row]}/location", json.dumps(payload).encode("utf-8")
+            ))
+        return messages
+
+    def metadata_messages(self, at: Optional[float] = None) -> List[AISMessage]:
+        """One ``vessels-v2/<mmsi>/metadata`` message per vessel."""
+        at = float(int(time.time())) if at is None else at
+        rng = np.random.default_rng([self.seed, 1])
+        length = rng.integers(20, 300, self.vessels)
+        beam = (length / rng.uniform(5, 8, self.vessels)).astype(int)
+        messages = []
+        for i in range(self.vessels):
+            payload = {
+                "timestamp": int(at * 1000),
+                "destination": "FIHEL" if self.moored[i] else "FIKTK",
+                "name": f"SYNTHETIC {i}",
+                "draught": int(rng.integers(20, 120)),
+                "eta": 0,
+                "posType": 1,
+                "refA": int(length[i] * 0.8),
+                "refB": int(length[i] - int(length[i] * 0.8)),
+                "refC": int(beam[i] // 2),
+                "refD": int(beam[i] - beam[i] // 2),
+                "callSign": f"SYN{i:04d}",
+                "imo": 9000000 + i,
+                "type": int(self.ship_type[i]),
+            }
+            messages.append(AISMessage(at, f"vessels-v2/{self.mmsi[i]}/metadata", json.dumps(payload).encode("utf-8")))
+        return messages
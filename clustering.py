@@ -0,0 +1,226 @@
+"""Server-side grid clustering of latest vessel positions for zoomed-out map views."""
+
+from __future__ import annotations
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from vessel_store import LatestVesselStore
+
+# Clusters are aggregated on an 8x8 grid per tile (~32px cells on 256px map tiles)
+CELLS_PER_TILE = 8
+MAX_CLUSTER_ZOOM = 16
+DEFAULT_MAX_CACHED_TILES = 4096
+
+TileKey = Tuple[int, int, int]  # (zoom, tile_row, tile_col)
+
+
+def tile_size_deg(zoom: int) -> float:
+    """Edge length in degrees of a lat/lon tile at the given zoom level."""
+    return 360.0 / (2 ** zoom)
+
+
+def cell_size_deg(zoom: int) -> float:
+    """Edge length in degrees of a cluster cell at the given zoom level."""
+    return tile_size_deg(zoom) / CELLS_PER_TILE
+
+
+def tiles_for_bbox(
+    zoom: int, lon_min: float, lat_min: float, lon_max: float, lat_max: float
+) -> List[TileKey]:
+    """List tiles overlapping the bounding box."""
+    size = tile_size_deg(zoom)
+    row_min, row_max = math.floor(lat_min / size), math.floor(lat_max / size)
+    col_min, col_max = math.floor(lon_min / size), math.floor(lon_max / size)
+    return [(zoom, row, col)
+            for row in range(row_min, row_max + 1)
+            for col in range(col_min, col_max + 1)]
+
+
+def compute_clusters(
+    lat: np.ndarray,
+    lon: np.ndarray,
+    sog: np.ndarray,
+    type_index: np.ndarray,
+    type_labels: Sequence[str],
+    cell_deg: float,
+) -> List[Dict[str, Any]]:
+    """Aggregate positions into grid cells in a single vectorized pass.
+
+    ``type_index`` holds, per vessel, an index into ``type_labels``; each cell
+    reports the most common label (ties go to the lower index).
+    """
+    if len(lat) == 0:
+        return []
+
+    cell_rows = np.floor(lat / cell_deg).astype(np.int64)
+    cell_cols = np.floor(lon / cell_deg).astype(np.int64)
+    cells, inverse, counts = np.unique(
+        np.stack([cell_rows, cell_cols], axis=1), axis=0, return_inverse=True, return_counts=True
+    )
+    inverse = inverse.reshape(-1)
+
+    centroid_lat = np.bincount(inverse, weights=lat) / counts
+    centroid_lon = np.bincount(inverse, weights=lon) / counts
+    mean_sog = np.bincount(inverse, weights=sog) / counts
+
+    n_types = len(type_labels)
+    type_counts = np.bincount(
+        inverse * n_types + type_index, minlength=len(cells) * n_types
+    ).reshape(len(cells), n_types)
+    dominant = type_counts.argmax(axis=1)
+
+    return [
+        {
+            "latitude": round(float(c_lat), 6),
+            "longitude": round(float(c_lon), 6),
+            "count": int(count),
+            "vessel_type": type_labels[type_idx],
+            "mean_sog": round(float(speed), 2),
+        }
+        for c_lat, c_lon, count, type_idx, speed
+        in zip(centroid_lat, centroid_lon, counts, dominant, mean_sog)
+    ]
+
+
+class ClusterTileCache:
+    """LRU cache of per-tile clusters, invalidated from the store's change log.
+
+    Each cached tile remembers its member vessels, so when a vessel moves both
+    the tile it left and the tile it entered are dropped; untouched tiles stay
+    cached across refreshes.
+
+    ``type_lookup`` maps AIS ship type codes to indices into ``type_labels``;
+    the last label is used for vessels with no known type.
+    """
+
+    def __init__(
+        self,
+        type_lookup: np.ndarray,
+        type_labels: Sequence[str],
+        max_tiles: int = DEFAULT_MAX_CACHED_TILES,
+    ):
+        self.type_lookup = type_lookup
+        self.type_labels = list(type_labels)
+        self.max_tiles = max_tiles
+        self.version = 0
+
+        self._lock = threading.Lock()
+        # Bumped whenever a sync or clear invalidates; a tile computed across a bump may be stale
+        self._generation = 0
+        self._tiles: "OrderedDict[TileKey, Tuple[List[Dict[str, Any]], np.ndarray]]" = OrderedDict()
+        self._member_tiles: Dict[int, Dict[int, TileKey]] = {}
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tiles.clear()
+            self._member_tiles.clear()
+            self._generation += 1
+
+    def sync(self, store: LatestVesselStore) -> int:
+        """Drop tiles affected by store changes since the last sync; returns tiles dropped."""
+        with store.lock:
+            changed_rows, removed_ids, version, complete = store.changes_since(self.version)
+            changed_ids = store.vessel_id[changed_rows]
+            changed_lat = store.latitude[changed_rows]
+            changed_lon = store.longitude[changed_rows]
+
+        with self._lock:
+            if complete and version == self.version:
+                return 0
+            self._generation += 1
+            if not complete:
+                dropped = len(self._tiles)
+                self._tiles.clear()
+                self._member_tiles.clear()
+                self.version = version
+                return dropped
+
+            stale = set()
+            for zoom, members in self._member_tiles.items():
+                new_rows = np.floor(np.floor(changed_lat / cell_size_deg(zoom)) / CELLS_PER_TILE)
+                new_cols = np.floor(np.floor(changed_lon / cell_size_deg(zoom)) / CELLS_PER_TILE)
+                stale.update((zoom, int(r), int(c)) for r, c in zip(new_rows, new_cols))
+                for vessel_id in changed_ids.tolist():
+                    if vessel_id in members:
+                        stale.add(members[vessel_id])
+                for vessel_id in removed_ids:
+                    if vessel_id in members:
+                        stale.add(members[vessel_id])
+
+            dropped = 0
+            for key in stale:
+                if self._drop(key):
+                    dropped += 1
+            self.version = version
+            return dropped
+
+    def get(self, store: LatestVesselStore, key: TileKey) -> List[Dict[str, Any]]:
+        """Return clusters for a tile, computing and caching them on a miss.
+
+        A tile computed while the cache was synced or cleared is returned but not
+        cached, since the invalidation may already have passed over it.
+        """
+        with self._lock:
+            entry = self._tiles.get(key)
+            if entry is not None:
+                self._tiles.move_to_end(key)
+                return entry[0]
+            generation = self._generation
+
+        zoom, tile_row, tile_col = key
+        size = tile_size_deg(zoom)
+        cell_deg = cell_size_deg(zoom)
+        with store.lock:
+            rows = store.rows_in_bbox(
+                tile_col * size, tile_row * size, (tile_col + 1) * size, (tile_row + 1) * size
+            )
+            lat = store.latitude[rows]
+            lon = store.longitude[rows]
+            sog = store.sog[rows]
+            ship_type = store.ship_type[rows]
+            vessel_ids = store.vessel_id[rows]
+
+        # Tile edges are inclusive in the index query; keep only vessels whose cell
+        # belongs to this tile so a vessel on a boundary is counted exactly once
+        in_tile = (
+            (np.floor(np.floor(lat / cell_deg) / CELLS_PER_TILE) == tile_row)
+            & (np.floor(np.floor(lon / cell_deg) / CELLS_PER_TILE) == tile_col)
+        )
+        lat, lon, sog, ship_type, vessel_ids = (
+            lat[in_tile], lon[in_tile], sog[in_tile], ship_type[in_tile], vessel_ids[in_tile]
+        )
+        known = (ship_type >= 0) & (ship_type < len(self.type_lookup))
+        type_index = np.where(
+            known, self.type_lookup[np.clip(ship_type, 0, len(self.type_lookup) - 1)], len(self.type_labels) - 1
+        )
+        clusters = compute_clusters(lat, lon, sog, type_index, self.type_labels, cell_deg)
+
+        with self._lock:
+            if self._generation != generation:
+                return clusters
+            self._drop(key)
+            self._tiles[key] = (clusters, vessel_ids)
+            members = self._member_tiles.setdefault(zoom, {})
+            for vessel_id in vessel_ids.tolist():
+                members[vessel_id] = key
+            while len(self._tiles) > self.max_tiles:
+                self._drop(next(iter(self._tiles)))
+        return clusters
+
+    def _drop(self, key: TileKey) -> bool:
+        entry = self._tiles.pop(key, None)
+        if entry is None:
+            return False
+        members = self._member_tiles.get(key[0], {})
+        for vessel_id in entry[1].tolist():
+            if members.get(vessel_id) == key:
+                del members[vessel_id]
+        return True
@@ -0,0 +1,209 @@
+"""Column-wise Arrow/Parquet encoding of vessel query results for bulk downloads."""
+
+from __future__ import annotations
+
+import io
+from typing import Callable, Dict, Iterable, Iterator, Mapping, Optional, Sequence
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from vessel_metadata import VesselMetadataCache
+
+# Columns selected from the latest-vessel query, in cursor order.
+# "current_timestamp" must be quoted or Postgres reads it as the SQL function.
+EXPORT_SELECT = """
+    vessel_id,
+    current_latitude,
+    current_longitude,
+    "current_timestamp",
+    COALESCE(sog, 0.0) AS sog,
+    COALESCE(cog, 0.0) AS cog,
+    heading,
+    COALESCE(pos_acc, false) AS pos_acc,
+    nav_stat,
+    predicted_latitude,
+    predicted_longitude,
+    prediction_for_timestamp,
+    prediction_made_at
+"""
+
+_TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+EXPORT_SCHEMA = pa.schema([
+    ("vessel_id", pa.int32()),
+    ("current_latitude", pa.float64()),
+    ("current_longitude", pa.float64()),
+    ("current_timestamp", _TIMESTAMP),
+    ("sog", pa.float64()),
+    ("cog", pa.float64()),
+    ("heading", pa.float64()),
+    ("pos_acc", pa.bool_()),
+    ("nav_stat", pa.int16()),
+    ("vessel_status", pa.dictionary(pa.int8(), pa.string())),
+    ("vessel_type", pa.dictionary(pa.int8(), pa.string())),
+    ("vessel_type_code", pa.int16()),
+    ("country", pa.string()),
+    ("name", pa.string()),
+    ("call_sign", pa.string()),
+    ("imo", pa.int32()),
+    ("destination", pa.string()),
+    ("draught", pa.float64()),
+    ("length", pa.float64()),
+    ("width", pa.float64()),
+    ("predicted_latitude", pa.float64()),
+    ("predicted_longitude", pa.float64()),
+    ("prediction_for_timestamp", _TIMESTAMP),
+    ("prediction_made_at", _TIMESTAMP),
+])
+
+
+def _labels(codes: np.ndarray, lookup: np.ndarray, labels: Sequence[str]) -> pa.DictionaryArray:
+    """Map integer codes (-1 for missing) through ``lookup``; the last label is the fallback."""
+    known = (codes >= 0) & (codes < len(lookup))
+    indices = np.where(known, lookup[np.clip(codes, 0, len(lookup) - 1)], len(labels) - 1)
+    return pa.DictionaryArray.from_arrays(pa.array(indices, type=pa.int8()), pa.array(labels))
+
+
+class VesselBatchBuilder:
+    """Turns cursor row chunks into enriched Arrow record batches without per-row dicts.
+
+    Lookup tables are built once; each chunk is transposed into columns and
+    enriched with vectorized indexing (vessel type, status, country) and the
+    same prediction bounds check as the JSON responses. Static data comes from
+    the ``VesselMetadataCache`` shared with the JSON endpoints.
+    """
+
+    def __init__(
+        self,
+        ship_type_lookup: np.ndarray,
+        ship_type_labels: Sequence[str],
+        nav_status_map: Mapping[int, str],
+        country_by_mid: Mapping[int, str],
+        prediction_bounds: Mapping[str, float],
+        metadata: VesselMetadataCache,
+    ):
+        self.ship_type_lookup = ship_type_lookup
+        self.ship_type_labels = list(ship_type_labels)
+
+        self.nav_status_labels = sorted(set(nav_status_map.values())) + ["Unknown"]
+        self.nav_status_lookup = np.array(
+            [self.nav_status_labels.index(nav_status_map.get(code, "Unknown")) for code in range(16)]
+        )
+
+        self.country_lookup = np.array([country_by_mid.get(mid) for mid in range(1000)], dtype=object)
+        self.bounds = prediction_bounds
+        self.metadata = metadata
+
+    def _countries(self, vessel_ids: np.ndarray) -> pa.Array:
+        # MID is the first three digits of the MMSI, whatever its length
+        digits = np.floor(np.log10(np.maximum(vessel_ids, 1))).astype(np.int64) + 1
+        mids = vessel_ids // np.power(10, np.maximum(digits - 3, 0))
+        valid = (vessel_ids > 0) & (mids < 1000)
+        countries = np.where(valid, self.country_lookup[np.where(valid, mids, 0)], None)
+        return pa.array(countries, type=pa.string())
+
+    def build(self, rows: Sequence[Sequence]) -> pa.RecordBatch:
+        (vessel_id, lat, lon, ts, sog, cog, heading, pos_acc, nav_stat,
+         pred_lat, pred_lon, pred_for, pred_made) = zip(*rows)
+
+        ids = np.array(vessel_id, dtype=np.int64)
+        nav_codes = np.array([-1 if v is None else v for v in nav_stat], dtype=np.int64)
+
+        infos = [self.metadata.get(v) for v in vessel_id]
+        (names, call_signs, imos, type_code, _, destinations,
+         draughts, lengths, widths, _) = zip(*infos)
+        type_codes = np.array([-1 if v is None else v for v in type_code], dtype=np.int64)
+
+        pred_lat_arr = np.array(pred_lat, dtype=float)
+        pred_lon_arr = np.array(pred_lon, dtype=float)
+        # Mirror is_valid_prediction: drop predictions outside the service area
+        with np.errstate(invalid="ignore"):
+            invalid = ~(
+                (pred_lat_arr >= self.bounds["lat_min"]) & (pred_lat_arr <= self.bounds["lat_max"])
+                & (pred_lon_arr >= self.bounds["lon_min"]) & (pred_lon_arr <= self.bounds["lon_max"])
+            )
+
+        invalid_mask = pa.array(invalid)
+
+        def prediction_column(values, arrow_type):
+            return pc.if_else(invalid_mask, pa.scalar(None, type=arrow_type), pa.array(values, type=arrow_type))
+
+        columns = [
+            pa.array(ids, type=pa.int32()),
+            pa.array(lat, type=pa.float64()),
+            pa.array(lon, type=pa.float64()),
+            pa.array(ts, type=_TIMESTAMP),
+            pa.array(sog, type=pa.float64()),
+            pa.array(cog, type=pa.float64()),
+            pa.array(heading, type=pa.float64()),
+            pa.array(pos_acc, type=pa.bool_()),
+            pa.array(nav_codes, type=pa.int16(), mask=nav_codes < 0),
+            _labels(nav_codes, self.nav_status_lookup, self.nav_status_labels),
+            _labels(type_codes, self.ship_type_lookup, self.ship_type_labels),
+            pa.array(type_codes, type=pa.int16(), mask=type_codes < 0),
+            self._countries(ids),
+            pa.array(names, type=pa.string()),
+            pa.array(call_signs, type=pa.string()),
+            pa.array(imos, type=pa.int32()),
+            pa.array(destinations, type=pa.string()),
+            pa.array(draughts, type=pa.float64()),
+            pa.array(lengths, type=pa.float64()),
+            pa.array(widths, type=pa.float64()),
+            prediction_column(pred_lat_arr, pa.float64()),
+            prediction_column(pred_lon_arr, pa.float64()),
+            prediction_column(pred_for, _TIMESTAMP),
+            prediction_column(pred_made, _TIMESTAMP),
+        ]
+        return pa.RecordBatch.from_arrays(columns, schema=EXPORT_SCHEMA)
+
+
+def iter_record_batches(
+    fetch_chunk: Callable[[], Sequence[Sequence]], builder: VesselBatchBuilder
+) -> Iterator[pa.RecordBatch]:
+    """Pull chunks until exhausted, yielding one record batch per chunk."""
+    while True:
+        rows = fetch_chunk()
+        if not rows:
+            return
+        yield builder.build(rows)
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+def stream_arrow_ipc(batches: Iterable[pa.RecordBatch]) -> Iterator[bytes]:
+    """Encode batches as an Arrow IPC stream, yielding bytes as each batch is written."""
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, EXPORT_SCHEMA) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+def stream_parquet(batches: Iterable[pa.RecordBatch], compression: Optional[str] = "zstd") -> Iterator[bytes]:
+    """Encode batches as a Parquet file, one row group per batch, yielding bytes incrementally."""
+    sink = io.BytesIO()
+    with pq.ParquetWriter(sink, EXPORT_SCHEMA, compression=compression) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+MEDIA_TYPES: Dict[str, str] = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+ENCODERS: Dict[str, Callable[[Iterable[pa.RecordBatch]], Iterator[bytes]]] = {
+    "arrow": stream_arrow_ipc,
+    "parquet": stream_parquet,
+}
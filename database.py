@@ -0,0 +1,99 @@
+"""Postgres connections for the services: one per unit of work, or borrowed from a shared pool.
+
+Standalone services open a fresh connection for each batch, cycle or request.
+The unified runtime calls ``init_pool`` once and every component then borrows
+from one ``ThreadedConnectionPool``; code written against ``connect`` and
+``release`` works unchanged in both modes.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Optional
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool
+
+from config import get_db_config
+from metrics import TimedConnection
+
+DB_CONFIG = get_db_config()
+
+_pool: Optional[ThreadedConnectionPool] = None
+# ThreadedConnectionPool raises when exhausted; borrowers wait for a slot instead
+_slots: Optional[threading.BoundedSemaphore] = None
+
+
+def init_pool(minconn: int, maxconn: int) -> None:
+    """Serve ``connect`` from a shared pool of at most ``maxconn`` connections."""
+    global _pool, _slots
+    _pool = ThreadedConnectionPool(minconn, maxconn, connection_factory=TimedConnection, **DB_CONFIG)
+    _slots = threading.BoundedSemaphore(maxconn)
+
+
+def close_pool() -> None:
+    """Close every pooled connection; later ``connect`` calls open fresh ones again."""
+    global _pool, _slots
+    if _pool is not None:
+        _pool.closeall()
+    _pool = None
+    _slots = None
+
+
+def connect(cursor_factory=None, connection_factory=None):
+    """Return a connection; hand it back with ``release`` rather than ``close``.
+
+    Pooled connections are always ``TimedConnection``s and ``cursor_factory``
+    becomes their default cursor class until released.
+    """
+    pool, slots = _pool, _slots
+    if pool is None:
+        kwargs = {}
+        if cursor_factory is not None:
+            kwargs["cursor_factory"] = cursor_factory
+        if connection_factory is not None:
+            kwargs["connection_factory"] = connection_factory
+        return psycopg2.connect(**DB_CONFIG, **kwargs)
+
+    slots.acquire()
+    try:
+        conn = pool.getconn()
+    except Exception:
+        slots.release()
+        raise
+    conn.cursor_factory = cursor_factory
+    conn.navicast_pool = (pool, slots)
+    return conn
+
+
+def release(conn) -> None:
+    """Return a pooled connection with its transaction rolled back and session settings reset, or close an unpooled one."""
+    owner = getattr(conn, "navicast_pool", None)
+    if owner is None:
+        conn.close()
+        return
+
+    pool, slots = owner
+    conn.navicast_pool = None
+    try:
+        if pool.closed:
+            conn.close()
+            return
+        broken = bool(conn.closed)
+        if not broken:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                # Session settings (e.g. the archiver's REPEATABLE READ) must not leak to the next borrower
+                if conn.autocommit or conn.isolation_level is not None \
+                        or conn.readonly is not None or conn.deferrable is not None:
+                    conn.set_session(
+                        isolation_level="DEFAULT", readonly="DEFAULT", deferrable="DEFAULT", autocommit=False
+                    )
+                conn.cursor_factory = None
+            except psycopg2.Error:
+                broken = True
+        pool.putconn(conn, close=broken)
+    finally:
+        slots.release()
@@ -0,0 +1,227 @@
+"""Fleet-wide close-encounter (CPA/TCPA) detection.
+
+Each vessel's swept path over the look-ahead horizon is boxed, padded by the
+CPA threshold and hashed into a uniform lat/lon grid. Only vessels sharing a
+cell become candidate pairs, and closest point of approach is then computed
+for all candidates at once with numpy.
+"""
+
+from __future__ import annotations
+
+from typing import Dict
+
+import numpy as np
+
+METERS_PER_DEG_LAT = 111195.0
+KNOTS_TO_MPS = 0.514444
+
+DEFAULT_CPA_THRESHOLD_M = 926.0  # 0.5 nautical miles
+DEFAULT_HORIZON_S = 1800.0  # 30 minutes, matching the prediction horizon
+DEFAULT_MIN_SOG_KNOTS = 0.5  # Pairs where neither vessel moves are not encounters
+DEFAULT_CELL_SIZE_M = 5000.0
+
+ENCOUNTER_FIELDS = ("vessel_id_1", "vessel_id_2", "distance_m", "cpa_m", "tcpa_s")
+
+
+def _empty_result() -> Dict[str, np.ndarray]:
+    return {
+        "vessel_id_1": np.empty(0, dtype=np.int64),
+        "vessel_id_2": np.empty(0, dtype=np.int64),
+        "distance_m": np.empty(0),
+        "cpa_m": np.empty(0),
+        "tcpa_s": np.empty(0),
+    }
+
+
+def velocity_mps(sog: np.ndarray, cog: np.ndarray) -> tuple:
+    """East/north velocity components in m/s from speed (knots) and course (degrees)."""
+    speed = sog * KNOTS_TO_MPS
+    course = np.radians(cog)
+    return speed * np.sin(course), speed * np.cos(course)
+
+
+def dead_reckon(
+    lat: np.ndarray, lon: np.ndarray, sog: np.ndarray, cog: np.ndarray, seconds: np.ndarray
+) -> tuple:
+    """Advance positions along their course for ``seconds`` (per vessel)."""
+    east, north = velocity_mps(sog, cog)
+    m_per_deg_lon = METERS_PER_DEG_LAT * np.maximum(np.cos(np.radians(lat)), 0.01)
+    return lat + north * seconds / METERS_PER_DEG_LAT, lon + east * seconds / m_per_deg_lon
+
+
+def candidate_pairs(
+    lat: np.ndarray,
+    lon: np.ndarray,
+    sog: np.ndarray,
+    cog: np.ndarray,
+    cpa_threshold_m: float,
+    horizon_s: float,
+    cell_size_m: float = DEFAULT_CELL_SIZE_M,
+) -> np.ndarray:
+    """Return unique ``(i, j)`` index pairs (i < j) whose swept boxes share a grid cell.
+
+    Any pair that can come within ``cpa_threshold_m`` during the horizon has
+    overlapping padded boxes, so it is always among the candidates.
+    """
+    n = len(lat)
+    if n < 2:
+        return np.empty((0, 2), dtype=np.int64)
+
+    east, north = velocity_mps(sog, cog)
+    m_per_deg_lon = METERS_PER_DEG_LAT * np.maximum(np.cos(np.radians(lat)), 0.01)
+
+    end_lat = lat + north * horizon_s / METERS_PER_DEG_LAT
+    end_lon = lon + east * horizon_s / m_per_deg_lon
+    # Half the threshold on each side, so two boxes overlap whenever the vessels
+    # can come within it. Longitude padding uses the highest latitude present.
+    pad_lat = 0.5 * cpa_threshold_m / METERS_PER_DEG_LAT
+    pad_lon = 0.5 * cpa_threshold_m / m_per_deg_lon.min()
+
+    cell_lat = cell_size_m / METERS_PER_DEG_LAT
+    cell_lon = cell_size_m / (METERS_PER_DEG_LAT * np.cos(np.radians(np.median(lat))))
+
+    row_lo = np.floor((np.minimum(lat, end_lat) - pad_lat) / cell_lat).astype(np.int64)
+    row_hi = np.floor((np.maximum(lat, end_lat) + pad_lat) / cell_lat).astype(np.int64)
+    col_lo = np.floor((np.minimum(lon, end_lon) - pad_lon) / cell_lon).astype(np.int64)
+    col_hi = np.floor((np.maximum(lon, end_lon) + pad_lon) / cell_lon).astype(np.int64)
+
+    # Expand every vessel into each cell its box covers
+    width = col_hi - col_lo + 1
+    counts = (row_hi - row_lo + 1) * width
+    owner = np.repeat(np.arange(n), counts)
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    rows = row_lo[owner] + local // width[owner]
+    cols = col_lo[owner] + local % width[owner]
+    keys = (rows << 32) + (cols & 0xFFFFFFFF)
+
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    owner = owner[order]
+
+    # Pair every entry with the later entries of its own cell
+    group_start = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    group_size = np.diff(np.r_[group_start, len(keys)])
+    position = np.arange(len(keys))
+    group_end = np.repeat(group_start + group_size, group_size)
+    partners = group_end - position - 1
+    if partners.sum() == 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    first = np.repeat(position, partners)
+    offset = np.arange(partners.sum()) - np.repeat(np.cumsum(partners) - partners, partners)
+    second = first + 1 + offset
+
+    a = owner[first]
+    b = owner[second]
+    pair_keys = np.unique(np.minimum(a, b) * n + np.maximum(a, b))
+    return np.stack([pair_keys // n, pair_keys % n], axis=1)
+
+
+def _pair_cpa(
+    i: np.ndarray,
+    j: np.ndarray,
+    lat: np.ndarray,
+    lon: np.ndarray,
+    east: np.ndarray,
+    north: np.ndarray,
+    horizon_s: float,
+) -> tuple:
+    """Current distance, CPA distance, clipped TCPA and raw TCPA for index pairs."""
+    # Relative motion in a local tangent plane centred on each pair
+    m_per_deg_lon = METERS_PER_DEG_LAT * np.cos(np.radians(0.5 * (lat[i] + lat[j])))
+    dx = (lon[j] - lon[i]) * m_per_deg_lon
+    dy = (lat[j] - lat[i]) * METERS_PER_DEG_LAT
+    wx = east[j] - east[i]
+    wy = north[j] - north[i]
+
+    speed_sq = wx * wx + wy * wy
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_star = np.where(speed_sq > 1e-9, -(dx * wx + dy * wy) / speed_sq, 0.0)
+    tcpa = np.clip(t_star, 0.0, horizon_s)
+    cpa = np.hypot(dx + wx * tcpa, dy + wy * tcpa)
+    return np.hypot(dx, dy), cpa, tcpa, t_star
+
+
+def _encounters_for_pairs(
+    i: np.ndarray,
+    j: np.ndarray,
+    vessel_id: np.ndarray,
+    lat: np.ndarray,
+    lon: np.ndarray,
+    sog: np.ndarray,
+    cog: np.ndarray,
+    cpa_threshold_m: float,
+    horizon_s: float,
+    min_sog_knots: float,
+) -> Dict[str, np.ndarray]:
+    moving = sog >= min_sog_knots
+    keep = moving[i] | moving[j]
+    i, j = i[keep], j[keep]
+
+    east, north = velocity_mps(sog, cog)
+    distance, cpa, tcpa, t_star = _pair_cpa(i, j, lat, lon, east, north, horizon_s)
+
+    # Converging within the horizon and passing closer than the threshold
+    hit = (t_star > 0) & (t_star <= horizon_s) & (cpa <= cpa_threshold_m)
+    order = np.argsort(tcpa[hit], kind="stable")
+    return {
+        "vessel_id_1": vessel_id[i[hit]][order],
+        "vessel_id_2": vessel_id[j[hit]][order],
+        "distance_m": distance[hit][order],
+        "cpa_m": cpa[hit][order],
+        "tcpa_s": tcpa[hit][order],
+    }
+
+
+def _as_arrays(vessel_id, lat, lon, sog, cog) -> tuple:
+    return (
+        np.asarray(vessel_id, dtype=np.int64),
+        np.asarray(lat, dtype=float),
+        np.asarray(lon, dtype=float),
+        np.nan_to_num(np.asarray(sog, dtype=float)),
+        np.nan_to_num(np.asarray(cog, dtype=float)),
+    )
+
+
+def find_close_encounters(
+    vessel_id: np.ndarray,
+    lat: np.ndarray,
+    lon: np.ndarray,
+    sog: np.ndarray,
+    cog: np.ndarray,
+    cpa_threshold_m: float = DEFAULT_CPA_THRESHOLD_M,
+    horizon_s: float = DEFAULT_HORIZON_S,
+    min_sog_knots: float = DEFAULT_MIN_SOG_KNOTS,
+    cell_size_m: float = DEFAULT_CELL_SIZE_M,
+) -> Dict[str, np.ndarray]:
+    """Find converging vessel pairs whose CPA within the horizon is below the threshold.
+
+    Positions should refer to a common instant. Returns column arrays keyed by
+    ``ENCOUNTER_FIELDS``, sorted by time to CPA.
+    """
+    vessel_id, lat, lon, sog, cog = _as_arrays(vessel_id, lat, lon, sog, cog)
+    pairs = candidate_pairs(lat, lon, sog, cog, cpa_threshold_m, horizon_s, cell_size_m)
+    if len(pairs) == 0:
+        return _empty_result()
+    return _encounters_for_pairs(
+        pairs[:, 0], pairs[:, 1], vessel_id, lat, lon, sog, cog,
+        cpa_threshold_m, horizon_s, min_sog_knots,
+    )
+
+
+def brute_force_encounters(
+    vessel_id: np.ndarray,
+    lat: np.ndarray,
+    lon: np.ndarray,
+    sog: np.ndarray,
+    cog: np.ndarray,
+    cpa_threshold_m: float = DEFAULT_CPA_THRESHOLD_M,
+    horizon_s: float = DEFAULT_HORIZON_S,
+    min_sog_knots: float = DEFAULT_MIN_SOG_KNOTS,
+) -> Dict[str, np.ndarray]:
+    """All-pairs reference implementation, for validating the grid pruning on small fleets."""
+    vessel_id, lat, lon, sog, cog = _as_arrays(vessel_id, lat, lon, sog, cog)
+    i, j = np.triu_indices(len(lat), k=1)
+    return _encounters_for_pairs(
+        i, j, vessel_id, lat, lon, sog, cog, cpa_threshold_m, horizon_s, min_sog_knots,
+    )
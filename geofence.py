@@ -0,0 +1,230 @@
+"""Geofence zones and enter/exit detection for incoming AIS reports.
+
+Zones are polygons loaded from a GeoJSON FeatureCollection and indexed in an
+STRtree. Each ingest batch is tested against the tree in one vectorized
+query; the monitor remembers which zones every vessel is in and reports only
+the transitions. Vessels silent for longer than the staleness window are
+forgotten, so a returning vessel is treated like a new one.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Sequence
+
+import numpy as np
+import shapely
+from psycopg2.extras import execute_values
+from shapely.geometry import mapping, shape
+from shapely.strtree import STRtree
+
+logger = logging.getLogger("navicast.geofence")
+
+GEOFENCE_PATH = Path(os.getenv("NAVICAST_GEOFENCES", "geofences.geojson"))
+
+ENTER = "enter"
+EXIT = "exit"
+
+# Vessels silent for longer than this are dropped from the monitor's state
+DEFAULT_MAX_GAP_SECONDS = 24 * 3600.0
+
+INSERT_EVENTS_QUERY = """
+INSERT INTO geofence_events
+    (vessel_id, zone_id, zone_name, event_type, event_time, latitude, longitude)
+VALUES %s
+"""
+
+# Last recorded transition per vessel and zone; "enter" means still inside. Older
+# events are skipped: their vessels would be evicted as stale straight away
+LATEST_EVENTS_QUERY = """
+SELECT DISTINCT ON (vessel_id, zone_id) vessel_id, zone_id, event_type, event_time
+FROM geofence_events
+WHERE event_time > NOW() - %s * INTERVAL '1 second'
+ORDER BY vessel_id, zone_id, event_time DESC
+"""
+
+
+@dataclass(frozen=True)
+class Zone:
+    zone_id: str
+    name: str
+    kind: str
+
+
+class GeofenceIndex:
+    """Polygon zones with an STRtree for batched point-in-polygon lookups."""
+
+    def __init__(self, zones: Sequence[Zone], geometries: Sequence[Any]):
+        self.zones = list(zones)
+        self.geometries = np.asarray(geometries, dtype=object)
+        shapely.prepare(self.geometries)
+        self.tree = STRtree(self.geometries)
+        self.position = {zone.zone_id: i for i, zone in enumerate(self.zones)}
+
+    @classmethod
+    def from_geojson(cls, path: Path = GEOFENCE_PATH) -> "GeofenceIndex":
+        """Load Polygon/MultiPolygon features; ``properties.id`` names the zone."""
+        collection = json.loads(Path(path).read_text(encoding="utf-8"))
+        zones: List[Zone] = []
+        geometries = []
+        for i, feature in enumerate(collection.get("features", [])):
+            geometry = shape(feature["geometry"])
+            properties = feature.get("properties") or {}
+            zone_id = str(properties.get("id", feature.get("id", i)))
+            if geometry.geom_type not in ("Polygon", "MultiPolygon"):
+                logger.warning(f"Skipping geofence {zone_id}: {geometry.geom_type} is not a polygon")
+                continue
+            if not geometry.is_valid:
+                geometry = shapely.make_valid(geometry)
+            zones.append(Zone(zone_id, str(properties.get("name", zone_id)), str(properties.get("kind", "zone"))))
+            geometries.append(geometry)
+
+        logger.info(f"Loaded {len(zones)} geofences from {path}")
+        return cls(zones, geometries)
+
+    def __len__(self) -> int:
+        return len(self.zones)
+
+    def query(self, lat: np.ndarray, lon: np.ndarray) -> tuple:
+        """Return ``(point_indices, zone_indices)`` for every point inside a zone."""
+        points = shapely.points(np.asarray(lon, dtype=float), np.asarray(lat, dtype=float))
+        point_idx, zone_idx = self.tree.query(points, predicate="within")
+        return point_idx, zone_idx
+
+    def to_geojson(self) -> Dict[str, Any]:
+        return {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "id": zone.zone_id,
+                    "properties": {"id": zone.zone_id, "name": zone.name, "kind": zone.kind},
+                    "geometry": mapping(geometry),
+                }
+                for zone, geometry in zip(self.zones, self.geometries)
+            ],
+        }
+
+
+@dataclass
+class GeofenceEvent:
+    vessel_id: int
+    zone: Zone
+    event_type: str
+    event_time: datetime
+    latitude: float
+    longitude: float
+
+    def as_row(self) -> tuple:
+        return (self.vessel_id, self.zone.zone_id, self.zone.name, self.event_type,
+                self.event_time, self.latitude, self.longitude)
+
+
+@dataclass
+class GeofenceUpdate:
+    """Transitions found in one batch plus the state to adopt once they are stored."""
+
+    events: List[GeofenceEvent] = field(default_factory=list)
+    inside: Dict[int, FrozenSet[int]] = field(default_factory=dict)
+    last_seen: Dict[int, float] = field(default_factory=dict)
+
+
+class GeofenceMonitor:
+    """Per-vessel inside/outside state that turns position reports into transitions.
+
+    ``evaluate`` does not change the state; call ``apply`` with its result after
+    the events have been committed, so a failed write does not lose transitions.
+    """
+
+    def __init__(self, index: GeofenceIndex, max_gap_seconds: float = DEFAULT_MAX_GAP_SECONDS):
+        self.index = index
+        self.max_gap_seconds = max_gap_seconds
+        self._inside: Dict[int, FrozenSet[int]] = {}
+        self._last_seen: Dict[int, float] = {}
+
+    def restore(self, conn) -> None:
+        """Rebuild inside state from the last stored event per vessel and zone within the staleness window."""
+        with conn.cursor() as cur:
+            cur.execute(LATEST_EVENTS_QUERY, (self.max_gap_seconds,))
+            rows = cur.fetchall()
+
+        inside: Dict[int, set] = {}
+        last_seen: Dict[int, float] = {}
+        for vessel_id, zone_id, event_type, event_time in rows:
+            position = self.index.position.get(zone_id)
+            if position is not None and event_type == ENTER:
+                inside.setdefault(vessel_id, set()).add(position)
+                # The last event is the newest report known for the vessel, and lets it be evicted
+                last_seen[vessel_id] = max(last_seen.get(vessel_id, 0.0), event_time.timestamp())
+        self._inside = {vessel_id: frozenset(zones) for vessel_id, zones in inside.items()}
+        self._last_seen = last_seen
+        logger.info(f"Restored geofence state: {len(self._inside)} vessels inside zones")
+
+    def evaluate(
+        self,
+        vessel_ids: Sequence[int],
+        lat: Sequence[float],
+        lon: Sequence[float],
+        timestamps: Sequence[datetime],
+    ) -> GeofenceUpdate:
+        """Find zone transitions for a batch of reports.
+
+        Reports are applied in time order; anything not newer than the last
+        report seen for that vessel (e.g. an MQTT redelivery) is ignored.
+        """
+        update = GeofenceUpdate()
+        if not vessel_ids or not len(self.index):
+            return update
+
+        point_idx, zone_idx = self.index.query(lat, lon)
+        membership: List[List[int]] = [[] for _ in vessel_ids]
+        for point, zone in zip(point_idx.tolist(), zone_idx.tolist()):
+            membership[point].append(zone)
+
+        epochs = [ts.timestamp() for ts in timestamps]
+        for k in sorted(range(len(vessel_ids)), key=epochs.__getitem__):
+            vessel_id = vessel_ids[k]
+            last_seen = update.last_seen.get(vessel_id, self._last_seen.get(vessel_id))
+            if last_seen is not None and epochs[k] <= last_seen:
+                continue
+
+            previous = update.inside.get(vessel_id, self._inside.get(vessel_id, frozenset()))
+            current = frozenset(membership[k])
+            for event_type, zones in ((EXIT, previous - current), (ENTER, current - previous)):
+                for zone in sorted(zones):
+                    update.events.append(GeofenceEvent(
+                        vessel_id, self.index.zones[zone], event_type, timestamps[k], float(lat[k]), float(lon[k])
+                    ))
+            update.inside[vessel_id] = current
+            update.last_seen[vessel_id] = epochs[k]
+        return update
+
+    def apply(self, update: GeofenceUpdate) -> None:
+        for vessel_id, zones in update.inside.items():
+            if zones:
+                self._inside[vessel_id] = zones
+            else:
+                self._inside.pop(vessel_id, None)
+        self._last_seen.update(update.last_seen)
+
+    def evict_older_than(self, cutoff: float) -> int:
+        """Drop vessels whose last report predates ``cutoff`` (epoch seconds).
+
+        A vessel evicted while inside a zone gets no exit event; its next report
+        inside a zone records a fresh enter.
+        """
+        stale = [vessel_id for vessel_id, seen in self._last_seen.items() if seen < cutoff]
+        for vessel_id in stale:
+            del self._last_seen[vessel_id]
+            self._inside.pop(vessel_id, None)
+        return len(stale)
+
+
+def write_events(cur, events: Sequence[GeofenceEvent]) -> None:
+    if events:
+        execute_values(cur, INSERT_EVENTS_QUERY, [event.as_row() for event in events])
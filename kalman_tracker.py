@@ -0,0 +1,259 @@
+"""Batched constant-velocity Kalman filter tracking every vessel at once.
+
+Each vessel's state is ``[east, north, v_east, v_north]`` in metres and m/s,
+in a local frame anchored near its recent position. A report measures both
+the position and, through SOG/COG, the velocity, so the filter stays linear
+and every update and prediction is a handful of stacked 4x4 matrix
+operations over all vessels in the batch. Compared with extrapolating the
+last report, the velocity estimate averages out SOG/COG noise over several
+reports and is checked against the reported positions.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+METERS_PER_DEG_LAT = 111195.0
+KNOTS_TO_MPS = 0.514444
+
+# Reports at or above these are "not available" in AIS
+SOG_UNAVAILABLE_KNOTS = 102.3
+COG_UNAVAILABLE_DEG = 360.0
+
+# Move a vessel's frame origin once it is this far away, keeping the flat-earth error small
+REANCHOR_DISTANCE_M = 20000.0
+
+DEFAULT_POSITION_SIGMA_M = 15.0
+DEFAULT_VELOCITY_SIGMA_MPS = 0.5
+DEFAULT_ACCELERATION_SIGMA_MPS2 = 0.01
+# Restart the track after a silence this long; the old velocity says little by then
+DEFAULT_MAX_GAP_SECONDS = 1800.0
+
+# Velocity variance for a vessel whose first report has no usable SOG/COG
+_UNKNOWN_VELOCITY_VARIANCE = 100.0
+_NO_MEASUREMENT_VARIANCE = 1e12
+
+
+class KalmanTracker:
+    """Structure-of-arrays filter state per MMSI, updated and queried in batches.
+
+    Reports older than a vessel's last update are ignored, so overlapping or
+    replayed batches are harmless.
+    """
+
+    def __init__(
+        self,
+        position_sigma_m: float = DEFAULT_POSITION_SIGMA_M,
+        velocity_sigma_mps: float = DEFAULT_VELOCITY_SIGMA_MPS,
+        acceleration_sigma_mps2: float = DEFAULT_ACCELERATION_SIGMA_MPS2,
+        max_gap_seconds: float = DEFAULT_MAX_GAP_SECONDS,
+        initial_capacity: int = 1024,
+    ):
+        self.position_variance = position_sigma_m ** 2
+        self.velocity_variance = velocity_sigma_mps ** 2
+        self.acceleration_variance = acceleration_sigma_mps2 ** 2
+        self.max_gap_seconds = max_gap_seconds
+        self.newest_timestamp: Optional[float] = None
+
+        self.lock = threading.Lock()
+        self._slots: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._size = 0
+        self._allocate(initial_capacity)
+
+    def _allocate(self, capacity: int) -> None:
+        self.vessel_id = np.zeros(capacity, dtype=np.int64)
+        self.state = np.zeros((capacity, 4))
+        self.covariance = np.zeros((capacity, 4, 4))
+        self.ref_lat = np.zeros(capacity)
+        self.ref_lon = np.zeros(capacity)
+        self.timestamp = np.full(capacity, -np.inf)
+
+    def _grow(self) -> None:
+        old = {name: getattr(self, name) for name in ("vessel_id", "state", "covariance", "ref_lat", "ref_lon", "timestamp")}
+        self._allocate(len(self.timestamp) * 2)
+        for name, values in old.items():
+            getattr(self, name)[:len(values)] = values
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _rows_for(self, vessel_ids: np.ndarray, create: bool) -> np.ndarray:
+        rows = np.empty(len(vessel_ids), dtype=np.int64)
+        for i, vessel_id in enumerate(vessel_ids.tolist()):
+            row = self._slots.get(vessel_id)
+            if row is None:
+                if not create:
+                    row = -1
+                else:
+                    if self._free:
+                        row = self._free.pop()
+                    else:
+                        if self._size == len(self.timestamp):
+                            self._grow()
+                        row = self._size
+                        self._size += 1
+                    self._slots[vessel_id] = row
+                    self.vessel_id[row] = vessel_id
+                    self.timestamp[row] = -np.inf
+            rows[i] = row
+        return rows
+
+    def update(
+        self,
+        vessel_ids: Sequence[int],
+        timestamps: Sequence[float],
+        lat: Sequence[float],
+        lon: Sequence[float],
+        sog: Sequence[float],
+        cog: Sequence[float],
+    ) -> int:
+        """Fold a batch of reports (epoch seconds, degrees, knots) into the tracks; returns reports used.
+
+        Several reports for one vessel are applied in time order, one round
+        per report, each round vectorized over all vessels it touches.
+        """
+        vessel_ids = np.asarray(vessel_ids, dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        sog = np.asarray(sog, dtype=float)
+        cog = np.asarray(cog, dtype=float)
+
+        valid = np.isfinite(timestamps) & np.isfinite(lat) & np.isfinite(lon)
+        order = np.flatnonzero(valid)
+        order = order[np.argsort(timestamps[order], kind="stable")]
+
+        used = 0
+        with self.lock:
+            while len(order):
+                # Earliest remaining report of each vessel
+                _, first = np.unique(vessel_ids[order], return_index=True)
+                batch = order[first]
+                order = np.delete(order, first)
+                used += self._update_round(
+                    vessel_ids[batch], timestamps[batch], lat[batch], lon[batch], sog[batch], cog[batch]
+                )
+            if used and len(timestamps[valid]):
+                newest = float(timestamps[valid].max())
+                if self.newest_timestamp is None or newest > self.newest_timestamp:
+                    self.newest_timestamp = newest
+        return used
+
+    def _update_round(self, vessel_ids, timestamps, lat, lon, sog, cog) -> int:
+        rows = self._rows_for(vessel_ids, create=True)
+        newer = timestamps > self.timestamp[rows]
+        rows, timestamps, lat, lon, sog, cog = (a[newer] for a in (rows, timestamps, lat, lon, sog, cog))
+        if not len(rows):
+            return 0
+
+        has_velocity = np.isfinite(sog) & np.isfinite(cog) & (sog >= 0) & (sog < SOG_UNAVAILABLE_KNOTS) \
+            & (cog >= 0) & (cog < COG_UNAVAILABLE_DEG)
+        speed = np.where(has_velocity, sog, 0.0) * KNOTS_TO_MPS
+        course = np.radians(np.where(has_velocity, cog, 0.0))
+        v_east = speed * np.sin(course)
+        v_north = speed * np.cos(course)
+
+        dt = timestamps - self.timestamp[rows]
+        start = ~np.isfinite(dt) | (dt > self.max_gap_seconds)
+        self._start_tracks(rows[start], lat[start], lon[start], v_east[start], v_north[start], has_velocity[start])
+
+        track = ~start
+        rows_t = rows[track]
+        if len(rows_t):
+            self._predict_in_place(rows_t, dt[track])
+            cos_ref = np.cos(np.radians(self.ref_lat[rows_t]))
+            z = np.column_stack([
+                (lon[track] - self.ref_lon[rows_t]) * METERS_PER_DEG_LAT * cos_ref,
+                (lat[track] - self.ref_lat[rows_t]) * METERS_PER_DEG_LAT,
+                v_east[track],
+                v_north[track],
+            ])
+            velocity_variance = np.where(has_velocity[track], self.velocity_variance, _NO_MEASUREMENT_VARIANCE)
+            noise = np.zeros((len(rows_t), 4, 4))
+            noise[:, 0, 0] = noise[:, 1, 1] = self.position_variance
+            noise[:, 2, 2] = noise[:, 3, 3] = velocity_variance
+
+            P = self.covariance[rows_t]
+            x = self.state[rows_t]
+            # Measurement matrix is the identity: S = P + R, K = P S^-1
+            gain = np.linalg.solve(P + noise, P).transpose(0, 2, 1)
+            x = x + np.einsum("nij,nj->ni", gain, z - x)
+            P = P - gain @ P
+            self.state[rows_t] = x
+            self.covariance[rows_t] = (P + P.transpose(0, 2, 1)) / 2
+            self._reanchor(rows_t)
+
+        self.timestamp[rows] = timestamps
+        return len(rows)
+
+    def _start_tracks(self, rows, lat, lon, v_east, v_north, has_velocity) -> None:
+        self.ref_lat[rows] = lat
+        self.ref_lon[rows] = lon
+        self.state[rows] = np.column_stack([np.zeros(len(rows)), np.zeros(len(rows)), v_east, v_north])
+        covariance = np.zeros((len(rows), 4, 4))
+        covariance[:, 0, 0] = covariance[:, 1, 1] = self.position_variance
+        covariance[:, 2, 2] = covariance[:, 3, 3] = np.where(
+            has_velocity, self.velocity_variance, _UNKNOWN_VELOCITY_VARIANCE
+        )
+        self.covariance[rows] = covariance
+
+    def _process_noise(self, dt: np.ndarray) -> np.ndarray:
+        """Discrete white-noise acceleration model, per vessel."""
+        q = self.acceleration_variance
+        noise = np.zeros((len(dt), 4, 4))
+        noise[:, 0, 0] = noise[:, 1, 1] = q * dt ** 3 / 3
+        noise[:, 0, 2] = noise[:, 2, 0] = noise[:, 1, 3] = noise[:, 3, 1] = q * dt ** 2 / 2
+        noise[:, 2, 2] = noise[:, 3, 3] = q * dt
+        return noise
+
+    def _predict_in_place(self, rows: np.ndarray, dt: np.ndarray) -> None:
+        transition = np.tile(np.eye(4), (len(rows), 1, 1))
+        transition[:, 0, 2] = transition[:, 1, 3] = dt
+        self.state[rows, :2] += self.state[rows, 2:] * dt[:, None]
+        P = self.covariance[rows]
+        self.covariance[rows] = transition @ P @ transition.transpose(0, 2, 1) + self._process_noise(dt)
+
+    def _reanchor(self, rows: np.ndarray) -> None:
+        far = np.hypot(self.state[rows, 0], self.state[rows, 1]) > REANCHOR_DISTANCE_M
+        if not far.any():
+            return
+        rows = rows[far]
+        lat, lon = self._to_latlon(rows, self.state[rows, 0], self.state[rows, 1])
+        self.ref_lat[rows] = lat
+        self.ref_lon[rows] = lon
+        self.state[rows, :2] = 0.0
+
+    def _to_latlon(self, rows, east, north) -> Tuple[np.ndarray, np.ndarray]:
+        lat = self.ref_lat[rows] + north / METERS_PER_DEG_LAT
+        lon = self.ref_lon[rows] + east / (METERS_PER_DEG_LAT * np.cos(np.radians(self.ref_lat[rows])))
+        return lat, lon
+
+    def predict(self, vessel_ids: Sequence[int], at) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions at ``at`` (epoch seconds, scalar or per vessel); NaN for untracked vessels."""
+        vessel_ids = np.asarray(vessel_ids, dtype=np.int64)
+        with self.lock:
+            rows = self._rows_for(vessel_ids, create=False)
+            known = rows >= 0
+            lat = np.full(len(rows), np.nan)
+            lon = np.full(len(rows), np.nan)
+            r = rows[known]
+            dt = (np.broadcast_to(np.asarray(at, dtype=float), rows.shape)[known]) - self.timestamp[r]
+            east = self.state[r, 0] + self.state[r, 2] * dt
+            north = self.state[r, 1] + self.state[r, 3] * dt
+            lat[known], lon[known] = self._to_latlon(r, east, north)
+        return lat, lon
+
+    def evict_older_than(self, cutoff: float) -> int:
+        """Drop vessels whose last report predates ``cutoff`` (epoch seconds)."""
+        with self.lock:
+            rows = np.flatnonzero(self.timestamp[:self._size] < cutoff)
+            rows = rows[np.isfinite(self.timestamp[rows])]
+            for row in rows.tolist():
+                del self._slots[int(self.vessel_id[row])]
+                self.timestamp[row] = -np.inf
+                self._free.append(row)
+            return len(rows)
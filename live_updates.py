@@ -0,0 +1,245 @@
+"""Push channel fanning out vessel position and prediction deltas to many clients."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from vessel_store import LatestVesselStore
+
+logger = logging.getLogger("navicast.live")
+
+# Field order of the compact arrays sent to clients
+POSITION_FIELDS = ["vessel_id", "latitude", "longitude", "sog", "cog", "heading", "timestamp"]
+PREDICTION_FIELDS = ["vessel_id", "predicted_latitude", "predicted_longitude", "prediction_for_timestamp"]
+
+DEFAULT_INTERVAL_SECONDS = 2.0
+DEFAULT_QUEUE_SIZE = 16
+
+BBox = Tuple[float, float, float, float]
+
+
+def _column(values: np.ndarray, digits: int) -> List[Optional[float]]:
+    """Round a float column and turn NaN into None for JSON output."""
+    rounded = np.round(values, digits)
+    return [None if np.isnan(v) else v for v in rounded.tolist()]
+
+
+def _in_bbox(bbox: Optional[BBox], lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    if bbox is None:
+        return np.ones(len(lat), dtype=bool)
+    lon_min, lat_min, lon_max, lat_max = bbox
+    return (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+
+
+class _Columns:
+    """Plain-array copy of store rows, taken under the store lock."""
+
+    def __init__(self, store: LatestVesselStore, rows: np.ndarray):
+        self.vessel_id = store.vessel_id[rows]
+        self.latitude = store.latitude[rows]
+        self.longitude = store.longitude[rows]
+        self.sog = store.sog[rows]
+        self.cog = store.cog[rows]
+        self.heading = store.heading[rows]
+        self.timestamp = store.timestamp[rows]
+        self.predicted_latitude = store.predicted_latitude[rows]
+        self.predicted_longitude = store.predicted_longitude[rows]
+        self.prediction_for = store.prediction_for[rows]
+
+    def select(self, mask: np.ndarray) -> "_Columns":
+        selected = object.__new__(_Columns)
+        for name, values in vars(self).items():
+            setattr(selected, name, values[mask])
+        return selected
+
+    def positions(self) -> List[List[Any]]:
+        return [list(row) for row in zip(
+            self.vessel_id.tolist(),
+            _column(self.latitude, 6),
+            _column(self.longitude, 6),
+            _column(self.sog, 1),
+            _column(self.cog, 1),
+            _column(self.heading, 1),
+            _column(self.timestamp, 0),
+        )]
+
+    def predictions(self) -> List[List[Any]]:
+        has_prediction = ~np.isnan(self.predicted_latitude)
+        picked = self.select(has_prediction)
+        return [list(row) for row in zip(
+            picked.vessel_id.tolist(),
+            _column(picked.predicted_latitude, 6),
+            _column(picked.predicted_longitude, 6),
+            _column(picked.prediction_for, 0),
+        )]
+
+
+class Subscriber:
+    """One connected client: its viewport filter, outgoing queue and visible vessels."""
+
+    def __init__(self, bbox: Optional[BBox], queue_size: int):
+        self.bbox = bbox
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=queue_size)
+        self.visible: Set[int] = set()
+        self.needs_snapshot = False
+
+
+class LiveUpdateBroadcaster:
+    """Refreshes the shared store once per interval and pushes deltas to subscribers.
+
+    The database is queried once per refresh regardless of how many clients are
+    connected. Changes that happen within an interval are coalesced, so each
+    vessel appears at most once per message. A client whose queue overflows is
+    sent a fresh snapshot instead of the deltas it missed.
+
+    The store is only read from worker threads: its lock can be held for a
+    while by a refresh, and must never stall the event loop serving the streams.
+    """
+
+    def __init__(
+        self,
+        store: LatestVesselStore,
+        refresh: Callable[[], None],
+        interval_seconds: float = DEFAULT_INTERVAL_SECONDS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ):
+        self.store = store
+        self.refresh = refresh
+        self.interval_seconds = interval_seconds
+        self.queue_size = queue_size
+        self.version = store.version
+        self._subscribers: Set[Subscriber] = set()
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    async def subscribe(self, bbox: Optional[BBox] = None) -> Subscriber:
+        """Register a client and queue its initial snapshot."""
+        subscriber = Subscriber(bbox, self.queue_size)
+        broadcast_version = self.version
+        subscriber.queue.put_nowait(await asyncio.to_thread(self._snapshot_message, subscriber))
+        if self.version != broadcast_version:
+            # A broadcast ran while the snapshot was built and its delta may be missing; resync
+            subscriber.needs_snapshot = True
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    async def run(self) -> None:
+        """Refresh and broadcast forever; idles without touching the database when nobody listens."""
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            if not self._subscribers:
+                self.version = self.store.version
+                continue
+            try:
+                await asyncio.to_thread(self.refresh)
+                await self.broadcast()
+            except Exception as e:
+                logger.error(f"Live update cycle failed: {e}")
+
+    async def broadcast(self) -> None:
+        """Send everything that changed in the store since the previous broadcast."""
+        moved, predicted, removed_ids, version, complete = await asyncio.to_thread(self._changes)
+        self.version = version
+
+        # Clients without a viewport filter all receive the same frame; encode it once
+        unfiltered: Optional[str] = None
+        for subscriber in list(self._subscribers):
+            if not complete or subscriber.needs_snapshot:
+                message = await asyncio.to_thread(self._snapshot_message, subscriber)
+            elif subscriber.bbox is None:
+                if unfiltered is None:
+                    unfiltered = self._unfiltered_delta(moved, predicted, removed_ids) or ""
+                message = unfiltered
+            else:
+                message = self._delta_message(subscriber, moved, predicted, removed_ids)
+            if not message:
+                continue
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Slow consumer: drop its backlog and resync it on the next cycle
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.needs_snapshot = True
+
+    def _changes(self) -> Tuple[_Columns, _Columns, List[int], int, bool]:
+        store = self.store
+        with store.lock:
+            changed_rows, removed_ids, version, complete = store.changes_since(self.version)
+            predicted_rows = store.predictions_since(self.version)
+            return _Columns(store, changed_rows), _Columns(store, predicted_rows), removed_ids, version, complete
+
+    def _snapshot_message(self, subscriber: Subscriber) -> str:
+        store = self.store
+        with store.lock:
+            columns = _Columns(store, store.active_rows())
+            version = store.version
+        if subscriber.bbox is not None:
+            columns = columns.select(_in_bbox(subscriber.bbox, columns.latitude, columns.longitude))
+            subscriber.visible = set(columns.vessel_id.tolist())
+        subscriber.needs_snapshot = False
+        return self._encode("snapshot", {
+            "version": version,
+            "position_fields": POSITION_FIELDS,
+            "prediction_fields": PREDICTION_FIELDS,
+            "positions": columns.positions(),
+            "predictions": columns.predictions(),
+        })
+
+    def _unfiltered_delta(
+        self, moved: _Columns, predicted: _Columns, removed_ids: List[int]
+    ) -> Optional[str]:
+        if not len(moved.vessel_id) and not len(predicted.vessel_id) and not removed_ids:
+            return None
+        return self._encode("delta", {
+            "version": self.version,
+            "positions": moved.positions(),
+            "predictions": predicted.predictions(),
+            "removed": removed_ids,
+        })
+
+    def _delta_message(
+        self,
+        subscriber: Subscriber,
+        moved: _Columns,
+        predicted: _Columns,
+        removed_ids: List[int],
+    ) -> Optional[str]:
+        in_view = _in_bbox(subscriber.bbox, moved.latitude, moved.longitude)
+        entered = moved.select(in_view)
+        entered_ids = entered.vessel_id.tolist()
+        left_ids = [vessel_id for vessel_id in moved.vessel_id[~in_view].tolist()
+                    if vessel_id in subscriber.visible]
+
+        gone = [vessel_id for vessel_id in removed_ids if vessel_id in subscriber.visible]
+        subscriber.visible.update(entered_ids)
+        subscriber.visible.difference_update(left_ids)
+        subscriber.visible.difference_update(gone)
+
+        visible_predictions = predicted.select(
+            np.fromiter((v in subscriber.visible for v in predicted.vessel_id.tolist()),
+                        dtype=bool, count=len(predicted.vessel_id))
+        )
+        if not entered_ids and not left_ids and not gone and not len(visible_predictions.vessel_id):
+            return None
+
+        return self._encode("delta", {
+            "version": self.version,
+            "positions": entered.positions(),
+            "predictions": visible_predictions.predictions(),
+            "removed": left_ids + gone,
+        })
+
+    @staticmethod
+    def _encode(event: str, payload: Dict[str, Any]) -> str:
+        """Format a Server-Sent Events frame."""
+        return f"event: {event}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
@@ -1,12 +1,17 @@
 import paho.mqtt.client as mqtt
 import json
-import psycopg2
 from datetime import datetime
+import os
 import time
 import uuid
 import logging
 from logging.handlers import RotatingFileHandler
-from config import ensure_log_dir, get_db_config
+from config import ensure_log_dir
+import database
+from archiver import archive_expired
+from geofence import GEOFENCE_PATH, GeofenceIndex, GeofenceMonitor, write_events
+from metrics import REGISTRY, start_http_server
+from vessel_metadata import parse_metadata_message, upsert_metadata
 
 # Create logs directory if it doesn't exist
 LOG_DIR = ensure_log_dir()
@@ -24,31 +29,72 @@ logger = logging.getLogger(__name__)
 
 # Constants
 BATCH_SIZE = 10
+METADATA_BATCH_SIZE = 50  # Static data changes rarely, so it is batched more coarsely
+METADATA_FLUSH_SECONDS = 30
 APP_NAME = 'Navicast/MQTT_Client_1.0'
 STREAM_DURATION = 3600 * 24  # 24 hours
+ARCHIVE_INTERVAL = 300  # Seconds between moving expired reports to the archive
+GEOFENCE_EVICT_INTERVAL = 300  # Seconds between dropping long-silent vessels from the geofence state
+METRICS_PORT = int(os.getenv("NAVICAST_MQTT_METRICS_PORT", "9101"))
+# Digitraffic by default; point these at a local broker to replay recorded or synthetic traffic
+MQTT_BROKER = os.getenv("NAVICAST_MQTT_BROKER", "meri.digitraffic.fi")
+MQTT_PORT = int(os.getenv("NAVICAST_MQTT_PORT", "443"))
+MQTT_TLS = os.getenv("NAVICAST_MQTT_TLS", "1") != "0"
 
-# Database configuration
-DB_CONFIG = get_db_config()
+# Metrics (label children are bound once so the hot path is a plain increment)
+MESSAGES_RECEIVED = REGISTRY.counter("navicast_ingest_messages_received_total", "AIS position messages added to a batch")
+MESSAGES_DROPPED = REGISTRY.counter("navicast_ingest_messages_dropped_total", "Messages not stored, by reason", ["reason"])
+DROPPED_INVALID_JSON = MESSAGES_DROPPED.labels(reason="invalid_json")
+DROPPED_NO_POSITION = MESSAGES_DROPPED.labels(reason="no_position")
+DROPPED_INVALID_MMSI = MESSAGES_DROPPED.labels(reason="invalid_mmsi")
+DROPPED_DUPLICATE = MESSAGES_DROPPED.labels(reason="duplicate")
+DROPPED_DB_ERROR = MESSAGES_DROPPED.labels(reason="db_error")
+DROPPED_ERROR = MESSAGES_DROPPED.labels(reason="error")
+RECORDS_INSERTED = REGISTRY.counter("navicast_ingest_records_inserted_total", "Position reports written to raw_ais_data")
+BATCH_SIZE_RECORDS = REGISTRY.histogram(
+    "navicast_ingest_batch_size", "Messages per stored batch", buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+BATCH_SECONDS = REGISTRY.histogram("navicast_ingest_batch_seconds", "Time to store one batch, connect to commit")
+COMMIT_SECONDS = REGISTRY.histogram("navicast_ingest_commit_seconds", "Time spent in the batch commit")
+INGEST_LAG_SECONDS = REGISTRY.histogram(
+    "navicast_ingest_lag_seconds", "AIS report timestamp to database commit",
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1800)
+)
+METADATA_RECEIVED = REGISTRY.counter("navicast_ingest_metadata_received_total", "Vessel metadata messages received")
+METADATA_UPSERTED = REGISTRY.counter("navicast_ingest_metadata_upserted_total", "Vessel metadata rows upserted")
+GEOFENCE_EVENTS = REGISTRY.counter("navicast_geofence_events_total", "Geofence transitions recorded", ["event_type"])
 
 # Global variables
 batch = []
+metadata_batch = []
+last_metadata_flush = time.time()
+geofence_monitor = None
+last_geofence_eviction = time.time()
+latest_store = None  # LatestVesselStore fed directly when running inside navicast_runtime
 
 def store_raw_data_batch(batch_data):
     """Store a batch of vessel data in the database"""
+    global last_geofence_eviction
     if not batch_data:
         return
         
     logger.info(f"Processing batch with {len(batch_data)} records")
+    BATCH_SIZE_RECORDS.observe(len(batch_data))
+    batch_start = time.perf_counter()
     
     conn = None
     cur = None
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = database.connect()
         cur = conn.cursor()
         
         inserted_count = 0
+        inserted = []
+        store_rows = []
+        report_times = []
         for vessel in batch_data:
             if "lat" not in vessel or "lon" not in vessel:
+                DROPPED_NO_POSITION.inc()
                 continue
                 
             # Extract and validate vessel data
@@ -104,22 +150,124 @@ def store_raw_data_batch(batch_data):
                     (vessel_id, latitude, longitude, timestamp_dt, raw_json)
                 )
                 inserted_count += 1
+                inserted.append((vessel_id, latitude, longitude, timestamp_dt))
+                store_rows.append((
+                    vessel_id, latitude, longitude, timestamp_dt, props.get("sog"),
+                    props.get("cog"), props.get("heading"), props.get("navStat"), None
+                ))
+                report_times.append(timestamp_ms / 1000.0)
+            else:
+                DROPPED_DUPLICATE.inc()
+
+        geofence_update = None
+        if geofence_monitor is not None and inserted:
+            # A geofence failure must not cost us the position reports
+            try:
+                vessel_ids, latitudes, longitudes, timestamps = map(list, zip(*inserted))
+                geofence_update = geofence_monitor.evaluate(vessel_ids, latitudes, longitudes, timestamps)
+            except Exception as e:
+                logger.warning(f"Geofence evaluation failed: {e}")
+            # Most batches have no transitions; only those pay for the extra round trips
+            if geofence_update is not None and geofence_update.events:
+                try:
+                    cur.execute("SAVEPOINT geofence")
+                    write_events(cur, geofence_update.events)
+                except Exception as e:
+                    logger.warning(f"Geofence event write failed: {e}")
+                    cur.execute("ROLLBACK TO SAVEPOINT geofence")
+                    geofence_update = None
         
-        # Clean up old records (older than 24 hours)
-        cur.execute("DELETE FROM raw_ais_data WHERE timestamp < NOW() - INTERVAL '24 hours'")
-        
+        commit_start = time.perf_counter()
         conn.commit()
-        logger.info(f"Inserted {inserted_count} new records, cleaned up old records")
+        committed_at = time.time()
+        COMMIT_SECONDS.observe(time.perf_counter() - commit_start)
+        BATCH_SECONDS.observe(time.perf_counter() - batch_start)
+        RECORDS_INSERTED.inc(inserted_count)
+        for report_time in report_times:
+            INGEST_LAG_SECONDS.observe(committed_at - report_time)
+        logger.info(f"Inserted {inserted_count} new records")
+
+        if latest_store is not None and store_rows:
+            latest_store.apply_rows(store_rows)
+
+        if geofence_update is not None:
+            geofence_monitor.apply(geofence_update)
+            for event in geofence_update.events:
+                GEOFENCE_EVENTS.labels(event_type=event.event_type).inc()
+                logger.info(f"Geofence: vessel {event.vessel_id} {event.event_type} {event.zone.name}")
+
+        # Evicted here, on the thread that evaluates batches, so it never races evaluate/apply
+        if geofence_monitor is not None and time.time() - last_geofence_eviction >= GEOFENCE_EVICT_INTERVAL:
+            evicted = geofence_monitor.evict_older_than(time.time() - geofence_monitor.max_gap_seconds)
+            last_geofence_eviction = time.time()
+            logger.info(f"Geofence: dropped {evicted} vessels silent for over {geofence_monitor.max_gap_seconds / 3600:.0f} hours")
         
     except Exception as e:
         logger.error(f"Database error: {e}")
+        DROPPED_DB_ERROR.inc(len(batch_data))
+        if conn:
+            conn.rollback()
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            database.release(conn)
+
+def store_metadata_batch(rows):
+    """Upsert a batch of vessel static data (name, type, dimensions, destination)"""
+    if not rows:
+        return
+
+    conn = None
+    cur = None
+    try:
+        conn = database.connect()
+        cur = conn.cursor()
+        upserted = upsert_metadata(cur, rows)
+        conn.commit()
+        METADATA_UPSERTED.inc(upserted)
+        logger.info(f"Upserted metadata for {upserted} vessels")
+    except Exception as e:
+        logger.error(f"Metadata database error: {e}")
         if conn:
             conn.rollback()
     finally:
         if cur:
             cur.close()
         if conn:
-            conn.close()
+            database.release(conn)
+
+def archive_old_data():
+    """Move whole UTC days older than 24 hours into the columnar archive"""
+    conn = None
+    try:
+        conn = database.connect()
+        archived = archive_expired(conn)
+        logger.info(f"Archive run complete: moved {archived} old records out of the database")
+    except Exception as e:
+        logger.error(f"Archive error: {e}")
+    finally:
+        if conn:
+            database.release(conn)
+
+def init_geofences():
+    """Load geofence zones and restore which vessels are currently inside them"""
+    global geofence_monitor
+    if not GEOFENCE_PATH.exists():
+        logger.info(f"No geofence file at {GEOFENCE_PATH}, zone alerts disabled")
+        return
+
+    conn = None
+    try:
+        monitor = GeofenceMonitor(GeofenceIndex.from_geojson(GEOFENCE_PATH))
+        conn = database.connect()
+        monitor.restore(conn)
+        geofence_monitor = monitor
+    except Exception as e:
+        logger.error(f"Failed to initialise geofences, zone alerts disabled: {e}")
+    finally:
+        if conn:
+            database.release(conn)
 
 def on_connect(client, userdata, flags, rc, properties=None):
     """Callback when connected to MQTT broker"""
@@ -128,14 +276,15 @@ def on_connect(client, userdata, flags, rc, properties=None):
         # Subscribe to vessel topics
         client.subscribe("vessels-v2/#", qos=1)
         client.subscribe("vessels-v2/+/location", qos=1)
+        client.subscribe("vessels-v2/+/metadata", qos=1)
         client.subscribe("vessels-v2/status", qos=1)
-        logger.info("Subscribed to vessel location topics")
+        logger.info("Subscribed to vessel location and metadata topics")
     else:
         logger.error(f"Failed to connect, return code {rc}")
 
 def on_message(client, userdata, message, properties=None):
     """Callback when message is received"""
-    global batch
+    global batch, metadata_batch, last_metadata_flush
     
     try:
         payload = message.payload.decode('utf-8')
@@ -144,6 +293,7 @@ def on_message(client, userdata, message, properties=None):
         try:
             data = json.loads(payload)
         except json.JSONDecodeError:
+            DROPPED_INVALID_JSON.inc()
             return
             
         # Extract vessel ID from topic
@@ -153,24 +303,39 @@ def on_message(client, userdata, message, properties=None):
             
             try:
                 mmsi_int = int(mmsi)
+                # Static and voyage data goes to vessel_metadata
+                if mmsi_int > 0 and isinstance(data, dict) and topic_parts[2:3] == ["metadata"]:
+                    metadata_batch.append(parse_metadata_message(mmsi_int, data))
+                    METADATA_RECEIVED.inc()
+                    if (len(metadata_batch) >= METADATA_BATCH_SIZE
+                            or time.time() - last_metadata_flush >= METADATA_FLUSH_SECONDS):
+                        store_metadata_batch(metadata_batch)
+                        metadata_batch = []
+                        last_metadata_flush = time.time()
                 # Only process valid MMSI numbers
-                if mmsi_int > 0 and isinstance(data, dict) and "lat" in data and "lon" in data:
+                elif mmsi_int > 0 and isinstance(data, dict) and "lat" in data and "lon" in data:
                     data["mmsi"] = mmsi
                     logger.info(f"Received vessel data for MMSI {mmsi}: lat={data['lat']}, lon={data['lon']}")
                     
                     # Add to batch
                     batch.append(data)
+                    MESSAGES_RECEIVED.inc()
                     
                     # Process batch when it reaches the threshold
                     if len(batch) >= BATCH_SIZE:
                         store_raw_data_batch(batch)
                         batch = []
+                elif mmsi_int <= 0:
+                    DROPPED_INVALID_MMSI.inc()
+                else:
+                    DROPPED_NO_POSITION.inc()
             except ValueError:
-                # Not a numeric MMSI
-                pass
+                # Not a numeric MMSI (e.g. the status topic)
+                DROPPED_INVALID_MMSI.inc()
 
     except Exception as e:
         logger.error(f"Error processing message: {e}")
+        DROPPED_ERROR.inc()
 
 def on_disconnect(client, userdata, rc, properties=None, reason=None):
     """Callback when disconnected from MQTT broker"""
@@ -182,53 +347,79 @@ def on_disconnect(client, userdata, rc, properties=None, reason=None):
     # Process any remaining batch items
     if batch:
         store_raw_data_batch(batch)
+    if metadata_batch:
+        store_metadata_batch(metadata_batch)
 
 def on_subscribe(client, userdata, mid, granted_qos, properties=None):
     """Callback when subscribed to a topic"""
     logger.info(f"Subscribed to topics with QoS: {granted_qos}")
 
+def create_client():
+    """Create the Digitraffic MQTT client and connect it; the caller starts its network loop"""
+    # Create MQTT client with unique ID
+    client_id = f"{APP_NAME}_{str(uuid.uuid4())[:8]}"
+    client = mqtt.Client(
+        client_id=client_id,
+        transport="websockets",
+        callback_api_version=mqtt.CallbackAPIVersion.VERSION2
+    )
+    
+    # Set TLS for secure connection
+    if MQTT_TLS:
+        client.tls_set()
+    
+    # Set callbacks
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.on_disconnect = on_disconnect
+    client.on_subscribe = on_subscribe
+    
+    # Configure reconnection
+    client.reconnect_delay_set(min_delay=1, max_delay=60)
+    
+    # Connect to the Digitraffic MQTT broker
+    logger.info(f"Connecting to {MQTT_BROKER}:{MQTT_PORT}...")
+    
+    client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
+    return client
+
+def flush_batches():
+    """Store whatever is left in the position and metadata batches"""
+    global batch, metadata_batch
+    
+    if batch:
+        logger.info(f"Processing remaining {len(batch)} items in batch")
+        store_raw_data_batch(batch)
+        batch = []
+    if metadata_batch:
+        store_metadata_batch(metadata_batch)
+        metadata_batch = []
+
 def main():
     """Main function to run the MQTT client"""
-    global batch
-    
+    client = None
     try:
         logger.info("Starting MQTT client for AIS data streaming")
+        start_http_server(METRICS_PORT)
+        logger.info(f"Serving metrics on port {METRICS_PORT}")
+        init_geofences()
         
-        # Create MQTT client with unique ID
-        client_id = f"{APP_NAME}_{str(uuid.uuid4())[:8]}"
-        client = mqtt.Client(
-            client_id=client_id,
-            transport="websockets",
-            callback_api_version=mqtt.CallbackAPIVersion.VERSION2
-        )
-        
-        # Set TLS for secure connection
-        client.tls_set()
-        
-        # Set callbacks
-        client.on_connect = on_connect
-        client.on_message = on_message
-        client.on_disconnect = on_disconnect
-        client.on_subscribe = on_subscribe
-        
-        # Configure reconnection
-        client.reconnect_delay_set(min_delay=1, max_delay=60)
-        
-        # Connect to Digitraffic MQTT broker
-        broker = "meri.digitraffic.fi"
-        port = 443
-        logger.info(f"Connecting to {broker}:{port}...")
-        
-        client.connect(broker, port, keepalive=60)
+        client = create_client()
         client.loop_start()
         
         # Run for specified duration
         logger.info(f"Starting the MQTT loop for {STREAM_DURATION/3600:.1f} hours")
         start_time = time.time()
+        last_archive_run = 0.0
         
         try:
             while time.time() - start_time < STREAM_DURATION:
                 time.sleep(1)
+
+                # Archive expired records off the MQTT network thread
+                if time.time() - last_archive_run >= ARCHIVE_INTERVAL:
+                    archive_old_data()
+                    last_archive_run = time.time()
                 
                 # Log status every 5 minutes
                 if int(time.time() - start_time) % 300 == 0:
@@ -238,17 +429,15 @@ def main():
             logger.info("Keyboard interrupt received")
         
         # Process any remaining items in batch
-        if batch:
-            logger.info(f"Processing remaining {len(batch)} items in batch")
-            store_raw_data_batch(batch)
-            batch = []
+        flush_batches()
 
     except Exception as e:
         logger.error(f"Error in main MQTT client: {e}")
     finally:
         logger.info("Stopping MQTT client")
-        client.loop_stop()
-        client.disconnect()
+        if client:
+            client.loop_stop()
+            client.disconnect()
 
 if __name__ == "__main__":
     main()
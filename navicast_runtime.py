@@ -0,0 +1,142 @@
+"""Run ingest, predictions and the API in one process around a single event loop.
+
+The default deployment runs mqtt_client.py, prediction_service.py and
+api_server.py as separate processes that meet only in Postgres. Here they
+share one connection pool and the API's LatestVesselStore: ingest pushes each
+committed batch into the store, and prediction cycles read positions from it
+and push their predictions back, so the API sees new data without waiting for
+its database poll. The MQTT network loop stays on paho's thread and prediction
+cycles run on a dedicated executor thread, keeping the event loop free for
+HTTP requests.
+
+    python navicast_runtime.py        (or ./start_navicast.sh --unified)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import RotatingFileHandler
+
+import uvicorn
+from fastapi.staticfiles import StaticFiles
+
+from config import ensure_log_dir
+
+# Configure logging before the service modules do it for their own log files
+LOG_DIR = ensure_log_dir()
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        RotatingFileHandler(str(LOG_DIR / 'navicast_runtime.log'), maxBytes=10485760, backupCount=5),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger("navicast.runtime")
+
+import api_server  # noqa: E402
+import database  # noqa: E402
+import mqtt_client  # noqa: E402
+import prediction_service  # noqa: E402
+
+API_PORT = int(os.getenv("NAVICAST_API_PORT", "8000"))
+POOL_MIN_CONNECTIONS = 2
+POOL_MAX_CONNECTIONS = int(os.getenv("NAVICAST_POOL_SIZE", "20"))
+
+# Ingest and predictions reach the store directly; the database poll only picks
+# up what they cannot push (ship types from metadata, writes by other processes)
+STORE_RESYNC_SECONDS = 30
+
+
+async def prediction_loop(executor: ThreadPoolExecutor) -> None:
+    """Run a prediction cycle every CYCLE_INTERVAL_SECONDS, off the event loop."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = time.monotonic()
+        await loop.run_in_executor(executor, prediction_service.make_predictions)
+        elapsed = time.monotonic() - started
+        await asyncio.sleep(max(0.0, prediction_service.CYCLE_INTERVAL_SECONDS - elapsed))
+
+
+async def evaluation_loop() -> None:
+    """Score matured predictions every EVALUATION_INTERVAL_SECONDS."""
+    while True:
+        await asyncio.sleep(prediction_service.EVALUATION_INTERVAL_SECONDS)
+        await asyncio.to_thread(prediction_service.evaluate_predictions)
+
+
+async def archive_loop() -> None:
+    """Move expired reports to the archive every ARCHIVE_INTERVAL seconds."""
+    while True:
+        await asyncio.to_thread(mqtt_client.archive_old_data)
+        await asyncio.sleep(mqtt_client.ARCHIVE_INTERVAL)
+
+
+def load_store() -> None:
+    """Fill the store from the database before ingest starts advancing its watermark."""
+    conn = None
+    try:
+        conn = database.connect()
+        api_server.vessel_store.refresh(conn)
+    finally:
+        if conn:
+            database.release(conn)
+
+
+async def run() -> None:
+    started = time.perf_counter()
+    database.init_pool(POOL_MIN_CONNECTIONS, POOL_MAX_CONNECTIONS)
+
+    store = api_server.vessel_store
+    api_server.VESSEL_STORE_REFRESH_SECONDS = STORE_RESYNC_SECONDS
+    await asyncio.to_thread(load_store)
+    logger.info(f"Loaded {len(store)} vessels into the shared store")
+
+    if prediction_service.PREDICTOR == "model":
+        prediction_service.model = await asyncio.to_thread(prediction_service.load_model)
+    prediction_service.latest_store = store
+    mqtt_client.latest_store = store
+    await asyncio.to_thread(mqtt_client.init_geofences)
+
+    api_server.app.mount("/", StaticFiles(directory="static", html=True), name="static")
+    server = uvicorn.Server(uvicorn.Config(api_server.app, host="0.0.0.0", port=API_PORT, log_config=None))
+
+    client = await asyncio.to_thread(mqtt_client.create_client)
+    client.loop_start()
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prediction")
+    tasks = [
+        asyncio.create_task(prediction_loop(executor)),
+        asyncio.create_task(evaluation_loop()),
+        asyncio.create_task(archive_loop()),
+    ]
+    logger.info(
+        f"NAVICAST unified runtime ready in {time.perf_counter() - started:.2f}s; "
+        f"API on port {API_PORT}, pool of up to {POOL_MAX_CONNECTIONS} connections"
+    )
+
+    try:
+        # Returns on SIGINT/SIGTERM, which uvicorn handles for the whole process
+        await server.serve()
+    finally:
+        logger.info("Stopping NAVICAST unified runtime")
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        client.loop_stop()
+        client.disconnect()
+        await asyncio.to_thread(mqtt_client.flush_batches)
+
+        executor.shutdown(wait=True)
+        database.close_pool()
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
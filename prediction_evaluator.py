@@ -0,0 +1,272 @@
+"""Score past predictions against where the vessels actually were.
+
+The prediction service appends every prediction to ``prediction_history``.
+Once a prediction's target time is more than ``MATCH_TOLERANCE`` in the past,
+it is matched to the vessel's report nearest that time with an as-of join and
+its haversine error is folded into ``prediction_accuracy``: hourly buckets per
+model and horizon holding counts, error sums and a fixed-bin error histogram,
+from which rolling mean, RMSE and percentiles are derived.
+
+Predictions are read in windows of ``CHUNK_SECONDS`` of target time, each
+committed together with the evaluation watermark, so memory depends on the
+window and not on the backlog, and no prediction is counted twice.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from archiver import HOT_RETENTION
+
+logger = logging.getLogger("navicast.evaluation")
+
+EARTH_RADIUS_M = 6371000.0
+
+# A report this close to the target time counts as the actual position
+MATCH_TOLERANCE = timedelta(seconds=120)
+CHUNK_SECONDS = 300
+# Evaluated history is kept this long, then deleted
+HISTORY_RETENTION = timedelta(days=7)
+WATERMARK_NAME = "prediction_accuracy"
+
+# Lower edges of the error histogram bins in metres; the last bin is open-ended
+ERROR_BIN_EDGES_M = np.array([0, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000], dtype=float)
+
+MATURED_PREDICTIONS_QUERY = """
+SELECT vessel_id, model, horizon_seconds, predicted_latitude, predicted_longitude, prediction_for_timestamp
+FROM prediction_history
+WHERE prediction_for_timestamp > %s AND prediction_for_timestamp <= %s
+ORDER BY prediction_for_timestamp
+"""
+
+ACTUAL_REPORTS_QUERY = """
+SELECT vessel_id, timestamp, latitude, longitude
+FROM raw_ais_data
+WHERE vessel_id = ANY(%s) AND timestamp BETWEEN %s AND %s
+ORDER BY timestamp
+"""
+
+UPSERT_ACCURACY = """
+INSERT INTO prediction_accuracy
+    (bucket_start, model, horizon_seconds, predictions, matched,
+     sum_error_m, sum_sq_error_m, max_error_m, error_histogram)
+VALUES %s
+ON CONFLICT (bucket_start, model, horizon_seconds) DO UPDATE SET
+    predictions = prediction_accuracy.predictions + EXCLUDED.predictions,
+    matched = prediction_accuracy.matched + EXCLUDED.matched,
+    sum_error_m = prediction_accuracy.sum_error_m + EXCLUDED.sum_error_m,
+    sum_sq_error_m = prediction_accuracy.sum_sq_error_m + EXCLUDED.sum_sq_error_m,
+    max_error_m = GREATEST(prediction_accuracy.max_error_m, EXCLUDED.max_error_m),
+    error_histogram = ARRAY(
+        SELECT previous + added
+        FROM unnest(prediction_accuracy.error_histogram, EXCLUDED.error_histogram) WITH ORDINALITY AS t(previous, added, i)
+        ORDER BY i
+    ),
+    updated_at = NOW()
+"""
+
+
+def haversine_m(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in metres, element-wise over arrays of degrees."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=float)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def match_actuals(predictions: pd.DataFrame, reports: pd.DataFrame, tolerance: timedelta = MATCH_TOLERANCE) -> pd.DataFrame:
+    """Attach each prediction's nearest report within ``tolerance`` and its error (NaN when unmatched).
+
+    Both frames must be sorted by time (``prediction_for_timestamp`` and ``timestamp``).
+    """
+    matched = pd.merge_asof(
+        predictions,
+        reports.rename(columns={"latitude": "actual_latitude", "longitude": "actual_longitude"}),
+        left_on="prediction_for_timestamp",
+        right_on="timestamp",
+        by="vessel_id",
+        direction="nearest",
+        tolerance=pd.Timedelta(tolerance),
+    )
+    matched["error_m"] = haversine_m(
+        matched["predicted_latitude"], matched["predicted_longitude"],
+        matched["actual_latitude"], matched["actual_longitude"],
+    )
+    return matched
+
+
+def aggregate_errors(matched: pd.DataFrame) -> List[tuple]:
+    """Per (bucket, model, horizon): counts, error sums, max and histogram, as upsert rows."""
+    if matched.empty:
+        return []
+    frame = matched[["prediction_for_timestamp", "model", "horizon_seconds", "error_m"]].copy()
+    frame["bucket_start"] = frame["prediction_for_timestamp"].dt.floor("h")
+    frame["is_matched"] = frame["error_m"].notna()
+    frame["error_sq"] = frame["error_m"] ** 2
+    bins = np.searchsorted(ERROR_BIN_EDGES_M, frame["error_m"].fillna(-1.0).to_numpy(), side="right") - 1
+    for b in range(len(ERROR_BIN_EDGES_M)):
+        frame[f"bin_{b}"] = bins == b
+
+    keys = ["bucket_start", "model", "horizon_seconds"]
+    bin_columns = [f"bin_{b}" for b in range(len(ERROR_BIN_EDGES_M))]
+    grouped = frame.groupby(keys, sort=False)
+    stats = grouped.agg(
+        predictions=("error_m", "size"),
+        matched=("is_matched", "sum"),
+        sum_error_m=("error_m", "sum"),
+        sum_sq_error_m=("error_sq", "sum"),
+        max_error_m=("error_m", "max"),
+    ).join(grouped[bin_columns].sum())
+
+    rows = []
+    for (bucket_start, model, horizon), row in stats.iterrows():
+        max_error = row["max_error_m"]
+        rows.append((
+            bucket_start.to_pydatetime(), model, int(horizon),
+            int(row["predictions"]), int(row["matched"]),
+            float(row["sum_error_m"]), float(row["sum_sq_error_m"]),
+            None if pd.isna(max_error) else float(max_error),
+            [int(row[column]) for column in bin_columns],
+        ))
+    return rows
+
+
+def _load_watermark(cur) -> Optional[datetime]:
+    cur.execute("SELECT evaluated_until FROM evaluation_watermarks WHERE name = %s", (WATERMARK_NAME,))
+    row = cur.fetchone()
+    if row:
+        return row[0]
+    cur.execute("SELECT MIN(prediction_for_timestamp) FROM prediction_history")
+    first = cur.fetchone()[0]
+    return first - timedelta(microseconds=1) if first else None
+
+
+def _to_frame(rows: Iterable[tuple], columns: List[str], time_column: str) -> pd.DataFrame:
+    frame = pd.DataFrame(list(rows), columns=columns)
+    # Same resolution on both sides of the as-of join, whatever pandas infers
+    frame[time_column] = pd.to_datetime(frame[time_column], utc=True).astype("datetime64[ns, UTC]")
+    frame["vessel_id"] = frame["vessel_id"].astype(np.int64)
+    return frame
+
+
+def evaluate_chunk(cur, start: datetime, end: datetime) -> Tuple[int, int]:
+    """Score predictions targeted in ``(start, end]`` and fold them into prediction_accuracy."""
+    cur.execute(MATURED_PREDICTIONS_QUERY, (start, end))
+    predictions = _to_frame(
+        cur.fetchall(),
+        ["vessel_id", "model", "horizon_seconds", "predicted_latitude", "predicted_longitude", "prediction_for_timestamp"],
+        "prediction_for_timestamp",
+    )
+    if predictions.empty:
+        return 0, 0
+
+    vessel_ids = predictions["vessel_id"].unique().tolist()
+    cur.execute(ACTUAL_REPORTS_QUERY, (vessel_ids, start - MATCH_TOLERANCE, end + MATCH_TOLERANCE))
+    reports = _to_frame(cur.fetchall(), ["vessel_id", "timestamp", "latitude", "longitude"], "timestamp")
+
+    matched = match_actuals(predictions, reports)
+    execute_values(cur, UPSERT_ACCURACY, aggregate_errors(matched))
+    return len(matched), int(matched["error_m"].notna().sum())
+
+
+def evaluate_matured(conn, now: Optional[datetime] = None, chunk_seconds: float = CHUNK_SECONDS) -> int:
+    """Evaluate every prediction that matured since the last run; returns predictions evaluated.
+
+    Each chunk commits with the watermark, so an interrupted run resumes where it stopped.
+    """
+    now = now or datetime.now(timezone.utc)
+    # Later reports may still arrive for targets within the tolerance
+    until = now - MATCH_TOLERANCE
+    evaluated = 0
+    matched = 0
+    with conn.cursor() as cur:
+        watermark = _load_watermark(cur)
+        if watermark is None:
+            return 0
+        # Reports older than this have left raw_ais_data, so those predictions cannot be matched
+        oldest = now - HOT_RETENTION + MATCH_TOLERANCE
+        if watermark < oldest:
+            logger.warning(f"Prediction evaluation is behind; skipping predictions targeted before {oldest.isoformat()}")
+            watermark = oldest
+
+        while watermark < until:
+            end = min(watermark + timedelta(seconds=chunk_seconds), until)
+            chunk_evaluated, chunk_matched = evaluate_chunk(cur, watermark, end)
+            cur.execute("""
+                INSERT INTO evaluation_watermarks (name, evaluated_until) VALUES (%s, %s)
+                ON CONFLICT (name) DO UPDATE SET evaluated_until = EXCLUDED.evaluated_until
+            """, (WATERMARK_NAME, end))
+            conn.commit()
+            evaluated += chunk_evaluated
+            matched += chunk_matched
+            watermark = end
+
+        cur.execute(
+            "DELETE FROM prediction_history WHERE prediction_for_timestamp < %s",
+            (watermark - HISTORY_RETENTION,),
+        )
+        conn.commit()
+
+    if evaluated:
+        logger.info(f"Evaluated {evaluated} predictions, {matched} matched to a report")
+    return evaluated
+
+
+def percentile_from_histogram(counts: np.ndarray, q: float, max_error_m: Optional[float] = None) -> Optional[float]:
+    """Approximate the ``q`` quantile (0-1) by interpolating within the histogram bin that holds it."""
+    counts = np.asarray(counts, dtype=float)
+    total = counts.sum()
+    if total <= 0:
+        return None
+    cumulative = np.cumsum(counts)
+    b = int(np.searchsorted(cumulative, q * total, side="left"))
+    lower = ERROR_BIN_EDGES_M[b]
+    upper = ERROR_BIN_EDGES_M[b + 1] if b + 1 < len(ERROR_BIN_EDGES_M) else np.inf
+    if max_error_m is not None:
+        # No error in the bin exceeds the largest one seen
+        upper = min(upper, max(lower, max_error_m))
+    elif not np.isfinite(upper):
+        upper = lower
+    below = cumulative[b] - counts[b]
+    fraction = (q * total - below) / counts[b] if counts[b] else 0.0
+    return float(lower + fraction * (upper - lower))
+
+
+def summarize_buckets(rows: Iterable[Mapping]) -> List[Dict]:
+    """Combine prediction_accuracy buckets into one rolling summary per model and horizon."""
+    totals: Dict[Tuple[str, int], Dict] = {}
+    for row in rows:
+        key = (row["model"], row["horizon_seconds"])
+        total = totals.setdefault(key, {
+            "predictions": 0, "matched": 0, "sum_error_m": 0.0, "sum_sq_error_m": 0.0,
+            "max_error_m": None, "histogram": np.zeros(len(ERROR_BIN_EDGES_M)),
+        })
+        total["predictions"] += row["predictions"]
+        total["matched"] += row["matched"]
+        total["sum_error_m"] += row["sum_error_m"]
+        total["sum_sq_error_m"] += row["sum_sq_error_m"]
+        if row["max_error_m"] is not None:
+            total["max_error_m"] = max(total["max_error_m"] or 0.0, row["max_error_m"])
+        total["histogram"] += np.asarray(row["error_histogram"], dtype=float)
+
+    summaries = []
+    for (model, horizon), total in sorted(totals.items()):
+        matched = total["matched"]
+        summaries.append({
+            "model": model,
+            "horizon_seconds": horizon,
+            "predictions": total["predictions"],
+            "matched": matched,
+            "match_rate": matched / total["predictions"] if total["predictions"] else None,
+            "mean_error_m": total["sum_error_m"] / matched if matched else None,
+            "rmse_m": float(np.sqrt(total["sum_sq_error_m"] / matched)) if matched else None,
+            "median_error_m": percentile_from_histogram(total["histogram"], 0.5, total["max_error_m"]),
+            "p90_error_m": percentile_from_histogram(total["histogram"], 0.9, total["max_error_m"]),
+            "max_error_m": total["max_error_m"],
+        })
+    return summaries
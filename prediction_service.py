@@ -1,6 +1,5 @@
 import pandas as pd
 import numpy as np
-import psycopg2
 import joblib
 import logging
 from logging.handlers import RotatingFileHandler
@@ -10,7 +9,13 @@ import os
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional, Any
-from config import ensure_log_dir, get_db_config
+from psycopg2.extras import execute_values
+from config import ensure_log_dir
+import database
+from encounters import DEFAULT_CPA_THRESHOLD_M, dead_reckon, find_close_encounters
+from kalman_tracker import KalmanTracker
+from metrics import REGISTRY, start_http_server
+from prediction_evaluator import evaluate_matured
 
 # Create logs directory if it doesn't exist
 LOG_DIR = ensure_log_dir()
@@ -29,9 +34,44 @@ logger = logging.getLogger(__name__)
 # Constants
 MODEL_PATH = Path(os.getenv("NAVICAST_MODEL_PATH", "vessel_prediction_model.pkl"))
 PREDICTION_INTERVAL = 1800  # 30 minutes in seconds
+CYCLE_INTERVAL_SECONDS = 300  # Time between prediction cycles
+RECENT_REPORT_SECONDS = 1800  # Only vessels reporting within this window get predictions
+ENCOUNTER_CPA_THRESHOLD_M = float(os.getenv("NAVICAST_CPA_THRESHOLD_M", DEFAULT_CPA_THRESHOLD_M))
+METRICS_PORT = int(os.getenv("NAVICAST_PREDICTION_METRICS_PORT", "9102"))
 
-# Database configuration
-DB_CONFIG = get_db_config()
+# "model" (joblib model), "kalman" (batched Kalman tracker) or "dead_reckoning";
+# the first two fall back to dead reckoning per vessel when they cannot predict
+PREDICTORS = ("model", "kalman", "dead_reckoning")
+PREDICTOR = os.getenv("NAVICAST_PREDICTOR", "model")
+TRACKER_OVERLAP_SECONDS = 60  # Re-read this much history so late-committed reports reach the tracker
+EVALUATION_INTERVAL_SECONDS = 300  # Time between scoring matured predictions against actual reports
+
+TRACKER_REPORTS_QUERY = """
+SELECT
+    vessel_id,
+    timestamp,
+    latitude,
+    longitude,
+    (raw_json -> 'properties' ->> 'sog')::float AS sog,
+    (raw_json -> 'properties' ->> 'cog')::float AS cog
+FROM raw_ais_data
+WHERE timestamp > %s
+ORDER BY timestamp
+"""
+
+# Metrics
+PHASES = ("query", "features", "inference", "write", "encounters")
+PHASE_SECONDS = REGISTRY.histogram("navicast_prediction_phase_seconds", "Time spent per prediction cycle phase", ["phase"])
+CYCLE_SECONDS = REGISTRY.histogram("navicast_prediction_cycle_seconds", "Duration of a full prediction cycle")
+CYCLES = REGISTRY.counter("navicast_prediction_cycles_total", "Prediction cycles by outcome", ["status"])
+PREDICTIONS = REGISTRY.counter("navicast_predictions_total", "Vessels processed by outcome", ["outcome"])
+VESSELS_PER_CYCLE = REGISTRY.gauge("navicast_prediction_vessels", "Vessels with recent reports in the last cycle")
+ENCOUNTERS_FOUND = REGISTRY.gauge("navicast_encounters", "Close encounters found in the last cycle")
+
+# Set in main(), or by navicast_runtime which also shares its LatestVesselStore
+model = None
+latest_store = None
+tracker = KalmanTracker()
 
 # Baltic Sea boundaries (for validation)
 LAT_MIN = 53
@@ -75,16 +115,103 @@ def calculate_position_prediction(lat, lon, sog, cog, time_diff):
     
     return delta_lat, delta_lon
 
+def update_encounters(conn, latest_data):
+    """Detect converging vessel pairs and replace the contents of the encounters table"""
+    rows = [row for row in latest_data if row[1] is not None and row[2] is not None]
+    if len(rows) < 2:
+        return 0
+
+    vessel_id, lat, lon, sog, cog, _heading, timestamps = zip(*rows)
+    lat = np.array(lat, dtype=float)
+    lon = np.array(lon, dtype=float)
+    sog = np.array(sog, dtype=float)
+    cog = np.array(cog, dtype=float)
+    # SOG 102.3 and COG 360 mean "not available"; treat those vessels as not moving
+    sog = np.where((sog >= 0) & (sog <= 50) & (cog >= 0) & (cog < 360), sog, 0.0)
+
+    # Bring every report forward to the newest one so pairs are compared at a common instant
+    reference_time = max(timestamps)
+    age = np.array([(reference_time - ts).total_seconds() for ts in timestamps])
+    lat, lon = dead_reckon(lat, lon, sog, cog, age)
+
+    found = find_close_encounters(
+        np.array(vessel_id), lat, lon, sog, cog,
+        cpa_threshold_m=ENCOUNTER_CPA_THRESHOLD_M,
+        horizon_s=PREDICTION_INTERVAL,
+    )
+    position = {vid: index for index, vid in enumerate(vessel_id)}
+    computed_at = datetime.now().astimezone()
+    values = []
+    for vid_1, vid_2, distance, cpa, tcpa in zip(
+        found["vessel_id_1"].tolist(), found["vessel_id_2"].tolist(),
+        found["distance_m"].tolist(), found["cpa_m"].tolist(), found["tcpa_s"].tolist()
+    ):
+        i, j = position[vid_1], position[vid_2]
+        values.append((
+            vid_1, vid_2,
+            float(lat[i]), float(lon[i]), float(lat[j]), float(lon[j]),
+            distance, cpa, tcpa,
+            reference_time + timedelta(seconds=tcpa),
+            computed_at,
+        ))
+
+    with conn.cursor() as cur:
+        # Readers see either the previous cycle's set or this one, never a mix
+        cur.execute("DELETE FROM encounters")
+        if values:
+            execute_values(cur, """
+                INSERT INTO encounters
+                    (vessel_id_1, vessel_id_2, latitude_1, longitude_1, latitude_2, longitude_2,
+                     distance_m, cpa_m, tcpa_seconds, cpa_timestamp, computed_at)
+                VALUES %s
+            """, values)
+    conn.commit()
+    return len(values)
+
+def latest_from_store(store, max_age_seconds=RECENT_REPORT_SECONDS):
+    """Latest report per recently seen vessel from an in-process store, shaped like the query rows"""
+    with store.lock:
+        rows = store.active_rows()
+        rows = rows[store.timestamp[rows] > time.time() - max_age_seconds]
+        columns = [
+            store.vessel_id[rows], store.latitude[rows], store.longitude[rows],
+            store.sog[rows], store.cog[rows], np.nan_to_num(store.heading[rows]), store.timestamp[rows],
+        ]
+    return [
+        (vessel_id, lat, lon, sog, cog, heading, datetime.fromtimestamp(ts))
+        for vessel_id, lat, lon, sog, cog, heading, ts in zip(*(column.tolist() for column in columns))
+    ]
+
+def fetch_tracker_reports(cur):
+    """Read the reports committed since the Kalman tracker's newest one"""
+    if tracker.newest_timestamp is None:
+        since = datetime.now() - timedelta(seconds=RECENT_REPORT_SECONDS)
+    else:
+        since = datetime.fromtimestamp(tracker.newest_timestamp - TRACKER_OVERLAP_SECONDS)
+    cur.execute(TRACKER_REPORTS_QUERY, (since,))
+    return cur.fetchall()
+
+def update_tracker(rows):
+    """Feed reports into the Kalman tracker and drop tracks that went silent"""
+    used = 0
+    if rows:
+        vessel_ids, timestamps, lat, lon, sog, cog = zip(*rows)
+        used = tracker.update(vessel_ids, [ts.timestamp() for ts in timestamps], lat, lon, sog, cog)
+    evicted = tracker.evict_older_than(time.time() - tracker.max_gap_seconds)
+    logger.info(f"Kalman tracker: {used} of {len(rows)} reports applied, {evicted} tracks dropped, {len(tracker)} tracked")
+    return used
+
 def make_predictions():
     """Retrieve latest vessel data and generate predictions"""
     logger.info("Starting prediction cycle...")
     start_time = time.time()
+    phase_seconds = dict.fromkeys(PHASES, 0.0)
     
     conn = None
     cur = None
     try:
         # Connect to database
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = database.connect()
         cur = conn.cursor()
 
         # Get the latest vessel data
@@ -101,20 +228,53 @@ def make_predictions():
         WHERE (vessel_id, timestamp) IN (
             SELECT vessel_id, MAX(timestamp)
             FROM raw_ais_data
-            WHERE timestamp > NOW() - INTERVAL '30 minutes'
+            WHERE timestamp > NOW() - %s * INTERVAL '1 second'
             GROUP BY vessel_id
         )
         """
-        cur.execute(query)
-        latest_data = cur.fetchall()
+        phase_start = time.perf_counter()
+        if latest_store is not None:
+            # Ingest keeps the shared store current, so no need to scan raw_ais_data
+            latest_data = latest_from_store(latest_store)
+        else:
+            cur.execute(query, (RECENT_REPORT_SECONDS,))
+            latest_data = cur.fetchall()
+        phase_seconds["query"] += time.perf_counter() - phase_start
+        VESSELS_PER_CYCLE.set(len(latest_data))
 
         if not latest_data:
             logger.info("No recent AIS data to process for predictions")
+            CYCLES.labels(status="empty").inc()
             return
 
         logger.info(f"Processing predictions for {len(latest_data)} vessels")
         predictions_count = 0
         skipped_count = 0
+        stored_predictions = []
+        history_rows = []
+        use_model = PREDICTOR == "model" and model is not None
+
+        # The tracker predicts every vessel in one batched call
+        tracked_positions = {}
+        if PREDICTOR == "kalman":
+            phase, phase_start = "query", time.perf_counter()
+            try:
+                tracker_rows = fetch_tracker_reports(cur)
+                phase_seconds["query"] += time.perf_counter() - phase_start
+                phase, phase_start = "inference", time.perf_counter()
+                update_tracker(tracker_rows)
+                vessel_ids = [row[0] for row in latest_data]
+                targets = [row[6].timestamp() + PREDICTION_INTERVAL for row in latest_data]
+                tracked_lat, tracked_lon = tracker.predict(vessel_ids, targets)
+                tracked_positions = {
+                    vessel_id: (lat, lon)
+                    for vessel_id, lat, lon in zip(vessel_ids, tracked_lat.tolist(), tracked_lon.tolist())
+                    if np.isfinite(lat)
+                }
+            except Exception as e:
+                logger.warning(f"Kalman tracker failed, using dead reckoning: {e}")
+                conn.rollback()
+            phase_seconds[phase] += time.perf_counter() - phase_start
 
         # Process each vessel
         for vessel_data in latest_data:
@@ -139,29 +299,41 @@ def make_predictions():
             
             # Prepare input data for the model
             try:
-                input_data = pd.DataFrame({
-                    'latitude': [float(lat)],
-                    'longitude': [float(lon)],
-                    'sog': [sog_val],
-                    'cog': [cog_val],
-                    'heading': [heading_val],
-                    'time_diff': [PREDICTION_INTERVAL]
-                })
+                if use_model:
+                    phase_start = time.perf_counter()
+                    input_data = pd.DataFrame({
+                        'latitude': [float(lat)],
+                        'longitude': [float(lon)],
+                        'sog': [sog_val],
+                        'cog': [cog_val],
+                        'heading': [heading_val],
+                        'time_diff': [PREDICTION_INTERVAL]
+                    })
+                    phase_seconds["features"] += time.perf_counter() - phase_start
                 
                 # Try to use the model for prediction
+                phase_start = time.perf_counter()
                 try:
-                    if model is not None:
+                    if vessel_id in tracked_positions:
+                        tracked_lat, tracked_lon = tracked_positions[vessel_id]
+                        delta_lat, delta_lon = tracked_lat - lat, tracked_lon - lon
+                        predictor = "kalman"
+                    elif use_model:
                         delta_lat, delta_lon = model.predict(input_data)[0]
+                        predictor = "model"
                         logger.debug(f"Model prediction for vessel {vessel_id}: delta_lat={delta_lat:.6f}, delta_lon={delta_lon:.6f}")
                     else:
-                        # Use dead reckoning if model is not available
+                        # Use dead reckoning if no other predictor is available
                         delta_lat, delta_lon = calculate_position_prediction(lat, lon, sog_val, cog_val, PREDICTION_INTERVAL)
+                        predictor = "dead_reckoning"
                         logger.debug(f"Dead reckoning for vessel {vessel_id}: delta_lat={delta_lat:.6f}, delta_lon={delta_lon:.6f}")
                 except Exception as e:
                     logger.warning(f"Model prediction failed for vessel {vessel_id}: {e}")
                     # Fallback to dead reckoning
                     delta_lat, delta_lon = calculate_position_prediction(lat, lon, sog_val, cog_val, PREDICTION_INTERVAL)
+                    predictor = "dead_reckoning"
                     logger.debug(f"Fallback prediction for vessel {vessel_id}: delta_lat={delta_lat:.6f}, delta_lon={delta_lon:.6f}")
+                phase_seconds["inference"] += time.perf_counter() - phase_start
 
                 # Calculate predicted position
                 predicted_lat = float(lat + delta_lat)
@@ -181,6 +353,7 @@ def make_predictions():
                 prediction_made = datetime.now()
 
                 # Store the prediction
+                phase_start = time.perf_counter()
                 cur.execute("""
                     INSERT INTO predictions 
                         (vessel_id, predicted_latitude, predicted_longitude, prediction_for_timestamp, prediction_made_at)
@@ -191,17 +364,40 @@ def make_predictions():
                         prediction_for_timestamp = EXCLUDED.prediction_for_timestamp,
                         prediction_made_at = EXCLUDED.prediction_made_at
                 """, (vessel_id, predicted_lat, predicted_lon, prediction_for, prediction_made))
+                phase_seconds["write"] += time.perf_counter() - phase_start
                 
                 predictions_count += 1
+                stored_predictions.append((vessel_id, predicted_lat, predicted_lon, prediction_for, prediction_made))
+                history_rows.append((
+                    vessel_id, predictor, PREDICTION_INTERVAL, predicted_lat, predicted_lon, prediction_for, prediction_made
+                ))
                 
             except Exception as e:
                 logger.error(f"Error processing prediction for vessel {vessel_id}: {e}")
                 if conn:
                     conn.rollback()
+                    stored_predictions.clear()
+                    history_rows.clear()
                 skipped_count += 1
 
+        # Keep each prediction for the accuracy evaluator, once per vessel, predictor and target time;
+        # predictions only holds the latest
+        phase_start = time.perf_counter()
+        if history_rows:
+            execute_values(cur, """
+                INSERT INTO prediction_history
+                    (vessel_id, model, horizon_seconds, predicted_latitude, predicted_longitude,
+                     prediction_for_timestamp, prediction_made_at)
+                VALUES %s
+                ON CONFLICT (vessel_id, model, prediction_for_timestamp) DO NOTHING
+            """, history_rows, page_size=1000)
+
         # Commit all changes
         conn.commit()
+        if latest_store is not None:
+            with latest_store.lock:
+                for prediction in stored_predictions:
+                    latest_store.upsert_prediction(*prediction)
         
         # Clean up old predictions
         try:
@@ -210,32 +406,76 @@ def make_predictions():
             logger.info("Cleaned up old predictions")
         except Exception as e:
             logger.warning(f"Failed to clean up old predictions: {e}")
+        phase_seconds["write"] += time.perf_counter() - phase_start
+
+        # Refresh close encounters from the same snapshot of latest positions
+        phase_start = time.perf_counter()
+        try:
+            encounter_count = update_encounters(conn, latest_data)
+            ENCOUNTERS_FOUND.set(encounter_count)
+            logger.info(f"Found {encounter_count} close encounters in {time.perf_counter() - phase_start:.3f}s")
+        except Exception as e:
+            logger.warning(f"Failed to update close encounters: {e}")
+            conn.rollback()
+        phase_seconds["encounters"] += time.perf_counter() - phase_start
             
         duration = time.time() - start_time
-        logger.info(f"Prediction cycle completed in {duration:.2f}s. Created {predictions_count} predictions, skipped {skipped_count} vessels.")
+        for phase, seconds in phase_seconds.items():
+            PHASE_SECONDS.labels(phase=phase).observe(seconds)
+        CYCLE_SECONDS.observe(duration)
+        CYCLES.labels(status="ok").inc()
+        PREDICTIONS.labels(outcome="created").inc(predictions_count)
+        PREDICTIONS.labels(outcome="skipped").inc(skipped_count)
+        logger.info(
+            f"Prediction cycle completed in {duration:.2f}s. Created {predictions_count} predictions, skipped {skipped_count} vessels. "
+            + ", ".join(f"{phase}={seconds:.3f}s" for phase, seconds in phase_seconds.items())
+        )
     
     except Exception as e:
         logger.error(f"Error in make_predictions: {e}")
+        CYCLES.labels(status="error").inc()
         if conn:
             conn.rollback()
     finally:
         if cur:
             cur.close()
         if conn:
-            conn.close()
+            database.release(conn)
+
+def evaluate_predictions():
+    """Score predictions whose target time has passed against the reports received since"""
+    conn = None
+    try:
+        conn = database.connect()
+        evaluate_matured(conn)
+    except Exception as e:
+        logger.error(f"Prediction evaluation error: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            database.release(conn)
 
 def main():
     """Main function to run the prediction service"""
     try:
         # Load the model at startup
         global model
-        model = load_model()
+        if PREDICTOR not in PREDICTORS:
+            logger.warning(f"Unknown NAVICAST_PREDICTOR {PREDICTOR!r}, using dead reckoning")
+        logger.info(f"Predictor: {PREDICTOR}")
+        if PREDICTOR == "model":
+            model = load_model()
+
+        start_http_server(METRICS_PORT)
+        logger.info(f"Serving metrics on port {METRICS_PORT}")
         
         # Make predictions immediately at startup
         make_predictions()
         
         # Schedule the periodic prediction task (every 5 minutes)
-        schedule.every(5).minutes.do(make_predictions)
+        schedule.every(CYCLE_INTERVAL_SECONDS).seconds.do(make_predictions)
+        schedule.every(EVALUATION_INTERVAL_SECONDS).seconds.do(evaluate_predictions)
         
         logger.info("Prediction service started. Making predictions every 5 minutes...")
         
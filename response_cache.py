@@ -0,0 +1,143 @@
+"""Pre-serialized, pre-compressed API responses with ETag revalidation."""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional encoding
+    brotli = None
+
+# Bodies smaller than this are cheaper to send as-is than to compress
+MIN_COMPRESS_BYTES = 1024
+DEFAULT_MAX_ENTRIES = 256
+
+
+def dumps_bytes(payload: Any) -> bytes:
+    """Encode a payload to JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def _compress(body: bytes, encoding: str) -> Optional[bytes]:
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return None
+
+
+class SerializedResponse:
+    """JSON body encoded once, with a content-hash ETag and lazily cached compressed variants."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self._variants: Dict[str, Optional[bytes]] = {}
+        self._lock = threading.Lock()
+
+    def variant(self, encoding: str) -> Optional[bytes]:
+        """Return the body compressed with ``encoding``, compressing at most once."""
+        with self._lock:
+            if encoding not in self._variants:
+                self._variants[encoding] = _compress(self.body, encoding)
+            return self._variants[encoding]
+
+
+class SnapshotCache:
+    """LRU of serialized responses keyed by request parameters and data version.
+
+    The version may be any hashable token (a counter, a timestamp, a tuple of
+    both) and is only compared for equality. An entry is rebuilt only when the
+    version it was built from changes, so every request between two refreshes
+    is served from the same bytes.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Hashable, SerializedResponse]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key: Hashable, version: Hashable, build: Callable[[], Any]) -> SerializedResponse:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        serialized = SerializedResponse(dumps_bytes(build()))
+        with self._lock:
+            self._entries[key] = (version, serialized)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return serialized
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(
+        tag == etag or (tag.startswith("W/") and tag[2:] == etag) for tag in candidates
+    )
+
+
+def _preferred_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(name.strip().lower())
+    if "br" in accepted and brotli is not None:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def serialized_response(
+    request: Request,
+    serialized: SerializedResponse,
+    media_type: str = "application/json",
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """Answer with 304 on an ETag match, otherwise the best pre-compressed variant."""
+    response_headers = {
+        "ETag": serialized.etag,
+        "Vary": "Accept-Encoding",
+        "Cache-Control": "no-cache",
+        **(headers or {}),
+    }
+    if _etag_matches(request.headers.get("if-none-match"), serialized.etag):
+        return Response(status_code=304, headers=response_headers)
+
+    body = serialized.body
+    encoding = _preferred_encoding(request.headers.get("accept-encoding"))
+    if encoding and len(body) >= MIN_COMPRESS_BYTES:
+        compressed = serialized.variant(encoding)
+        if compressed is not None:
+            body = compressed
+            response_headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=response_headers)
@@ -9,7 +9,13 @@
 \c ais_project;
 
 -- Drop tables if they exist (for clean setup)
+DROP TABLE IF EXISTS evaluation_watermarks;
+DROP TABLE IF EXISTS prediction_accuracy;
+DROP TABLE IF EXISTS prediction_history;
+DROP TABLE IF EXISTS geofence_events;
+DROP TABLE IF EXISTS encounters;
 DROP TABLE IF EXISTS predictions;
+DROP TABLE IF EXISTS vessel_metadata;
 DROP TABLE IF EXISTS raw_ais_data;
 
 -- Create raw AIS data table
@@ -33,12 +39,103 @@ CREATE TABLE predictions (
     CONSTRAINT unique_vessel_prediction UNIQUE (vessel_id, prediction_for_timestamp)
 );
 
+-- Create prediction history table (append-only, one row per prediction made)
+-- model is the predictor that produced the row: model, kalman or dead_reckoning
+-- A vessel that stops reporting is re-predicted for the same target time; only the first is kept
+CREATE TABLE prediction_history (
+    id BIGSERIAL PRIMARY KEY,
+    vessel_id INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    horizon_seconds INTEGER NOT NULL,
+    predicted_latitude DOUBLE PRECISION NOT NULL,
+    predicted_longitude DOUBLE PRECISION NOT NULL,
+    prediction_for_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    prediction_made_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    CONSTRAINT unique_history_prediction UNIQUE (vessel_id, model, prediction_for_timestamp)
+);
+
+-- Create prediction accuracy table (hourly error statistics per model and horizon)
+-- Errors are in metres; error_histogram counts errors per bin of
+-- prediction_evaluator.ERROR_BIN_EDGES_M
+CREATE TABLE prediction_accuracy (
+    bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    model TEXT NOT NULL,
+    horizon_seconds INTEGER NOT NULL,
+    predictions BIGINT NOT NULL,
+    matched BIGINT NOT NULL,
+    sum_error_m DOUBLE PRECISION NOT NULL,
+    sum_sq_error_m DOUBLE PRECISION NOT NULL,
+    max_error_m DOUBLE PRECISION,
+    error_histogram BIGINT[] NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (bucket_start, model, horizon_seconds)
+);
+
+-- Create evaluation watermarks table (how far the evaluator has scored predictions)
+CREATE TABLE evaluation_watermarks (
+    name TEXT PRIMARY KEY,
+    evaluated_until TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+-- Create vessel metadata table (static and voyage data from the metadata topic)
+CREATE TABLE vessel_metadata (
+    vessel_id INTEGER PRIMARY KEY,
+    name TEXT,
+    call_sign TEXT,
+    imo INTEGER,
+    ship_type SMALLINT,
+    destination TEXT,
+    draught DOUBLE PRECISION,  -- metres
+    length DOUBLE PRECISION,   -- metres, bow to stern
+    width DOUBLE PRECISION,    -- metres, port to starboard
+    metadata_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Create close encounters table (replaced every prediction cycle)
+-- Positions are dead-reckoned to the newest report of the cycle
+CREATE TABLE encounters (
+    vessel_id_1 INTEGER NOT NULL,
+    vessel_id_2 INTEGER NOT NULL,
+    latitude_1 DOUBLE PRECISION NOT NULL,
+    longitude_1 DOUBLE PRECISION NOT NULL,
+    latitude_2 DOUBLE PRECISION NOT NULL,
+    longitude_2 DOUBLE PRECISION NOT NULL,
+    distance_m DOUBLE PRECISION NOT NULL,
+    cpa_m DOUBLE PRECISION NOT NULL,
+    tcpa_seconds DOUBLE PRECISION NOT NULL,
+    cpa_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    computed_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (vessel_id_1, vessel_id_2)
+);
+
+-- Create geofence events table (zone enter/exit transitions detected at ingest)
+CREATE TABLE geofence_events (
+    id BIGSERIAL PRIMARY KEY,
+    vessel_id INTEGER NOT NULL,
+    zone_id TEXT NOT NULL,
+    zone_name TEXT NOT NULL,
+    event_type TEXT NOT NULL CHECK (event_type IN ('enter', 'exit')),
+    event_time TIMESTAMP WITH TIME ZONE NOT NULL,
+    latitude DOUBLE PRECISION NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
 -- Create indices for faster queries
 CREATE INDEX idx_raw_ais_data_timestamp ON raw_ais_data(timestamp);
 CREATE INDEX idx_raw_ais_data_vessel_id ON raw_ais_data(vessel_id);
 CREATE INDEX idx_predictions_timestamp ON predictions(prediction_for_timestamp);
+CREATE INDEX idx_prediction_history_for_timestamp ON prediction_history(prediction_for_timestamp);
+CREATE INDEX idx_vessel_metadata_updated_at ON vessel_metadata(updated_at);
+CREATE INDEX idx_encounters_vessel_id_2 ON encounters(vessel_id_2);
+CREATE INDEX idx_geofence_events_time ON geofence_events(event_time);
+CREATE INDEX idx_geofence_events_vessel_zone ON geofence_events(vessel_id, zone_id, event_time);
 
 -- Create a function to clean up old data (optional)
+-- Note: this permanently deletes history. The MQTT client instead runs
+-- archiver.archive_expired, which writes expired reports to Parquet files
+-- before removing them from raw_ais_data.
 CREATE OR REPLACE FUNCTION cleanup_old_data(days_to_keep INTEGER)
 RETURNS void AS $$
 DECLARE
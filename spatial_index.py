@@ -0,0 +1,96 @@
+"""Uniform grid spatial index over vessel positions."""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, Hashable, Iterator, List, Set, Tuple
+
+# ~28 km cells at Baltic latitudes; a port-sized viewport touches a handful of cells
+DEFAULT_CELL_SIZE_DEG = 0.25
+
+Cell = Tuple[int, int]
+
+
+class GridIndex:
+    """Buckets keys into fixed-size lat/lon cells for fast bounding-box lookups.
+
+    Each key lives in exactly one cell, so moving a vessel is a remove from its
+    old cell followed by an insert into the new one.
+    """
+
+    def __init__(self, cell_size_deg: float = DEFAULT_CELL_SIZE_DEG):
+        if cell_size_deg <= 0:
+            raise ValueError("cell_size_deg must be positive")
+        self.cell_size_deg = cell_size_deg
+        self._cells: Dict[Cell, Set[Hashable]] = {}
+        self._key_cells: Dict[Hashable, Cell] = {}
+
+    def __len__(self) -> int:
+        return len(self._key_cells)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._key_cells
+
+    def cell_of(self, lat: float, lon: float) -> Cell:
+        """Return the grid cell containing the given position."""
+        return (
+            math.floor(lat / self.cell_size_deg),
+            math.floor(lon / self.cell_size_deg),
+        )
+
+    def upsert(self, key: Hashable, lat: float, lon: float) -> None:
+        """Insert a key or move it to the cell for its new position."""
+        cell = self.cell_of(lat, lon)
+        old_cell = self._key_cells.get(key)
+        if old_cell == cell:
+            return
+        if old_cell is not None:
+            self._discard(key, old_cell)
+        self._cells.setdefault(cell, set()).add(key)
+        self._key_cells[key] = cell
+
+    def remove(self, key: Hashable) -> None:
+        """Remove a key from the index if present."""
+        cell = self._key_cells.pop(key, None)
+        if cell is not None:
+            self._discard(key, cell)
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._key_cells.clear()
+
+    def query(self, lat_min: float, lon_min: float, lat_max: float, lon_max: float) -> List[Hashable]:
+        """Return keys in every cell overlapping the box.
+
+        Results are candidates: keys near the box edges may lie just outside it,
+        so callers needing exact containment must filter on the real positions.
+        """
+        return [key for cell in self._overlapping_cells(lat_min, lon_min, lat_max, lon_max)
+                for key in self._cells[cell]]
+
+    def _overlapping_cells(
+        self, lat_min: float, lon_min: float, lat_max: float, lon_max: float
+    ) -> Iterator[Cell]:
+        row_min, col_min = self.cell_of(lat_min, lon_min)
+        row_max, col_max = self.cell_of(lat_max, lon_max)
+        span = (row_max - row_min + 1) * (col_max - col_min + 1)
+
+        # Large boxes cover mostly empty sea; walking occupied cells is cheaper
+        if span > len(self._cells):
+            for row, col in self._cells:
+                if row_min <= row <= row_max and col_min <= col <= col_max:
+                    yield row, col
+            return
+
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                if (row, col) in self._cells:
+                    yield row, col
+
+    def _discard(self, key: Hashable, cell: Cell) -> None:
+        members = self._cells.get(cell)
+        if members is None:
+            return
+        members.discard(key)
+        if not members:
+            del self._cells[cell]
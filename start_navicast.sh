@@ -8,9 +8,15 @@ YELLOW='\033[1;33m'
 BOLD='\033[1m'
 NC='\033[0m' # No Color
 
-# Debug flag
+# Flags
 DEBUG=false
-[[ "$1" == "--debug" ]] && DEBUG=true && echo -e "${BLUE}${BOLD}Debug mode enabled${NC}"
+UNIFIED=false
+for arg in "$@"; do
+    case "$arg" in
+        --debug) DEBUG=true && echo -e "${BLUE}${BOLD}Debug mode enabled${NC}" ;;
+        --unified) UNIFIED=true && echo -e "${BLUE}${BOLD}Unified mode: one process for ingest, predictions and API${NC}" ;;
+    esac
+done
 
 # Print banner
 echo -e "\n${BOLD}NAVICAST STARTUP${NC}\n"
@@ -61,7 +67,7 @@ start_service() {
 # Handle Ctrl+C gracefully
 cleanup() {
     echo -e "\n${YELLOW}${BOLD}Stopping NAVICAST services...${NC}"
-    pkill -f "mqtt_client.py|prediction_service.py|api_server.py"
+    pkill -f "mqtt_client.py|prediction_service.py|api_server.py|navicast_runtime.py"
     echo -e "${GREEN}${BOLD}All services stopped${NC}"
     exit 0
 }
@@ -70,20 +76,26 @@ trap cleanup SIGINT SIGTERM
 
 # Fire up the services
 echo -e "\n${BOLD}Starting services:${NC}"
-start_service "MQTT client" "mqtt_client.py" "mqtt_output.log" || { cleanup; exit 1; }
+if [[ "$UNIFIED" = true ]]; then
+    start_service "NAVICAST runtime" "navicast_runtime.py" "runtime_output.log" || { cleanup; exit 1; }
+    LOG_FILES="logs/runtime_output.log"
+else
+    start_service "MQTT client" "mqtt_client.py" "mqtt_output.log" || { cleanup; exit 1; }
 
-# Wait a bit for data to come in
-echo -e "${BLUE}Waiting for initial data ingestion...${NC}"
-sleep 5
+    # Wait a bit for data to come in
+    echo -e "${BLUE}Waiting for initial data ingestion...${NC}"
+    sleep 5
 
-# Start the rest of the services
-start_service "Prediction service" "prediction_service.py" "prediction_output.log" || { cleanup; exit 1; }
-start_service "API server" "api_server.py" "api_output.log" || { cleanup; exit 1; }
+    # Start the rest of the services
+    start_service "Prediction service" "prediction_service.py" "prediction_output.log" || { cleanup; exit 1; }
+    start_service "API server" "api_server.py" "api_output.log" || { cleanup; exit 1; }
+    LOG_FILES="logs/mqtt_output.log, logs/prediction_output.log, logs/api_output.log"
+fi
 
 # Show final status message
 echo -e "\n${BOLD}NAVICAST SYSTEM IS RUNNING${NC}"
 echo -e "${BOLD}Web interface:${NC} ${YELLOW}http://localhost:8000${NC}"
-echo -e "${BOLD}Log files:${NC} ${YELLOW}logs/mqtt_output.log, logs/prediction_output.log, logs/api_output.log${NC}"
+echo -e "${BOLD}Log files:${NC} ${YELLOW}${LOG_FILES}${NC}"
 echo -e "\n${BOLD}Press Ctrl+C to stop all services${NC}\n"
 
 # Keep the script running until Ctrl+C
@@ -0,0 +1,86 @@
+"""Vessel track downsampling and line simplification."""
+
+from __future__ import annotations
+
+from typing import List, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def bucket_track(timestamps: np.ndarray, bucket_seconds: float) -> np.ndarray:
+    """Return a mask keeping the last report in each time bucket.
+
+    ``timestamps`` are epoch seconds sorted ascending.
+    """
+    if len(timestamps) == 0 or bucket_seconds <= 0:
+        return np.ones(len(timestamps), dtype=bool)
+    buckets = np.floor(timestamps / bucket_seconds)
+    keep = np.empty(len(buckets), dtype=bool)
+    keep[:-1] = buckets[1:] != buckets[:-1]
+    keep[-1] = True
+    return keep
+
+
+def project_local(lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Project to local equirectangular metres around the track's mean latitude."""
+    cos_lat = np.cos(np.radians(np.mean(lat)))
+    x = EARTH_RADIUS_M * np.radians(lon) * cos_lat
+    y = EARTH_RADIUS_M * np.radians(lat)
+    return x, y
+
+
+def simplify_track(lat: np.ndarray, lon: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """Douglas-Peucker simplification; returns a mask of points to keep.
+
+    Distances are measured to the segment (not the infinite line), so every
+    dropped point lies within ``tolerance_m`` of the simplified track even when
+    the vessel doubles back. Each split scans its span with one vectorized pass.
+    """
+    n = len(lat)
+    keep = np.zeros(n, dtype=bool)
+    if n <= 2 or tolerance_m <= 0:
+        keep[:] = True
+        return keep
+    keep[0] = keep[-1] = True
+
+    x, y = project_local(lat, lon)
+    stack: List[Tuple[int, int]] = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        px = x[start + 1:end]
+        py = y[start + 1:end]
+        dx = x[end] - x[start]
+        dy = y[end] - y[start]
+        length_sq = dx * dx + dy * dy
+        if length_sq > 0:
+            t = np.clip(((px - x[start]) * dx + (py - y[start]) * dy) / length_sq, 0.0, 1.0)
+        else:
+            t = np.zeros(len(px))
+        distances = np.hypot(px - (x[start] + t * dx), py - (y[start] + t * dy))
+
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_m:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return keep
+
+
+def reduce_track(
+    timestamps: np.ndarray,
+    lat: np.ndarray,
+    lon: np.ndarray,
+    bucket_seconds: float = 0,
+    tolerance_m: float = 0,
+) -> np.ndarray:
+    """Apply time bucketing then simplification; returns indices of kept reports."""
+    indices = np.flatnonzero(bucket_track(timestamps, bucket_seconds))
+    kept = simplify_track(lat[indices], lon[indices], tolerance_m)
+    return indices[kept]
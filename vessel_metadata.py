@@ -0,0 +1,191 @@
+"""Vessel static data (name, type, dimensions, voyage) from AIS metadata messages.
+
+The MQTT client upserts ``vessels-v2/<mmsi>/metadata`` messages into the
+``vessel_metadata`` table. The API keeps a per-MMSI cache of that table plus
+the MID country, refreshed incrementally by ``updated_at``, so formatting a
+vessel row is a single dictionary lookup.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence
+
+import psycopg2.extensions
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger("navicast.metadata")
+
+# Re-read this much history on every refresh so late-committed upserts are not missed
+REFRESH_OVERLAP_SECONDS = 60
+
+# Keep the newest message per vessel; an older replay never overwrites newer data
+UPSERT_METADATA_QUERY = """
+INSERT INTO vessel_metadata
+    (vessel_id, name, call_sign, imo, ship_type, destination, draught, length, width, metadata_timestamp)
+VALUES %s
+ON CONFLICT (vessel_id) DO UPDATE SET
+    name = EXCLUDED.name,
+    call_sign = EXCLUDED.call_sign,
+    imo = EXCLUDED.imo,
+    ship_type = EXCLUDED.ship_type,
+    destination = EXCLUDED.destination,
+    draught = EXCLUDED.draught,
+    length = EXCLUDED.length,
+    width = EXCLUDED.width,
+    metadata_timestamp = EXCLUDED.metadata_timestamp,
+    updated_at = NOW()
+WHERE vessel_metadata.metadata_timestamp <= EXCLUDED.metadata_timestamp
+"""
+
+METADATA_QUERY = """
+SELECT vessel_id, name, call_sign, imo, ship_type, destination, draught, length, width, updated_at
+FROM vessel_metadata
+WHERE updated_at > %s
+"""
+
+
+def _text(value: Any) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    return value.strip() or None
+
+
+def parse_metadata_message(mmsi: int, data: Mapping[str, Any]) -> tuple:
+    """Turn a Digitraffic metadata payload into a ``vessel_metadata`` row.
+
+    Draught arrives in tenths of a metre; length and width are the sums of the
+    antenna reference distances, with zero meaning "not available".
+    """
+    ref_a, ref_b, ref_c, ref_d = (data.get(key) or 0 for key in ("refA", "refB", "refC", "refD"))
+    draught = data.get("draught")
+    timestamp_ms = data.get("timestamp") or int(time.time() * 1000)
+    return (
+        mmsi,
+        _text(data.get("name")),
+        _text(data.get("callSign")),
+        data.get("imo") or None,
+        data.get("type"),
+        _text(data.get("destination")),
+        draught / 10.0 if draught else None,
+        float(ref_a + ref_b) if ref_a + ref_b > 0 else None,
+        float(ref_c + ref_d) if ref_c + ref_d > 0 else None,
+        datetime.fromtimestamp(timestamp_ms / 1000.0, tz=timezone.utc),
+    )
+
+
+def upsert_metadata(cur, rows: Iterable[tuple]) -> int:
+    """Upsert parsed rows, keeping only the newest per vessel (one statement cannot touch a row twice)."""
+    newest: Dict[int, tuple] = {}
+    for row in rows:
+        current = newest.get(row[0])
+        if current is None or row[-1] >= current[-1]:
+            newest[row[0]] = row
+    if newest:
+        execute_values(cur, UPSERT_METADATA_QUERY, list(newest.values()))
+    return len(newest)
+
+
+class VesselInfo(NamedTuple):
+    name: Optional[str]
+    call_sign: Optional[str]
+    imo: Optional[int]
+    ship_type: Optional[int]
+    vessel_type: str
+    destination: Optional[str]
+    draught: Optional[float]
+    length: Optional[float]
+    width: Optional[float]
+    country: Optional[str]
+
+
+class VesselMetadataCache:
+    """Per-MMSI static data and country, built once per vessel and updated incrementally.
+
+    ``type_labels`` maps ship type codes 0-99 to labels; other codes are
+    ``unknown_label``. Vessels without metadata still get an entry (with their
+    country) on first lookup. ``version`` changes whenever a refresh brings in
+    new rows, so response caches can include it in their key.
+    """
+
+    def __init__(
+        self,
+        type_labels: Sequence[str],
+        country_by_mid: Mapping[int, str],
+        unknown_label: str = "Unknown",
+    ):
+        self.type_labels = list(type_labels)
+        self.unknown_label = unknown_label
+        self._country_by_mid: List[Optional[str]] = [country_by_mid.get(mid) for mid in range(1000)]
+        self._entries: Dict[int, VesselInfo] = {}
+        self._lock = threading.Lock()
+
+        self.version = 0
+        self.newest_update: Optional[datetime] = None
+        self.last_refresh: Optional[float] = None
+
+    def country(self, mmsi: int) -> Optional[str]:
+        """Country from the Maritime Identification Digits (the first three digits)."""
+        if not mmsi or mmsi <= 0:
+            return None
+        while mmsi >= 1000:
+            mmsi //= 10
+        return self._country_by_mid[mmsi]
+
+    def vessel_type(self, ship_type: Optional[int]) -> str:
+        if ship_type is None or not 0 <= ship_type < len(self.type_labels):
+            return self.unknown_label
+        return self.type_labels[ship_type]
+
+    def _build(self, mmsi: int, row: Optional[Sequence[Any]] = None) -> VesselInfo:
+        if row is None:
+            return VesselInfo(None, None, None, None, self.unknown_label, None, None, None, None, self.country(mmsi))
+        _, name, call_sign, imo, ship_type, destination, draught, length, width = row[:9]
+        return VesselInfo(
+            name, call_sign, imo, ship_type, self.vessel_type(ship_type),
+            destination, draught, length, width, self.country(mmsi),
+        )
+
+    def get(self, mmsi: int) -> VesselInfo:
+        info = self._entries.get(mmsi)
+        if info is None:
+            info = self._build(mmsi)
+            with self._lock:
+                info = self._entries.setdefault(mmsi, info)
+        return info
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_stale(self, max_age_seconds: float) -> bool:
+        return self.last_refresh is None or time.monotonic() - self.last_refresh >= max_age_seconds
+
+    def refresh(self, conn) -> int:
+        """Load rows updated since the last refresh; the first call loads the whole table."""
+        since = (
+            self.newest_update - timedelta(seconds=REFRESH_OVERLAP_SECONDS)
+            if self.newest_update is not None
+            else datetime(1970, 1, 1, tzinfo=timezone.utc)
+        )
+        with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+            cur.execute(METADATA_QUERY, (since,))
+            rows = cur.fetchall()
+
+        changed = 0
+        with self._lock:
+            for row in rows:
+                info = self._build(row[0], row)
+                if self._entries.get(row[0]) != info:
+                    self._entries[row[0]] = info
+                    changed += 1
+                if self.newest_update is None or row[-1] > self.newest_update:
+                    self.newest_update = row[-1]
+            if changed:
+                self.version += 1
+        self.last_refresh = time.monotonic()
+        if changed:
+            logger.info(f"Vessel metadata refresh: {changed} vessels updated ({len(self._entries)} cached)")
+        return changed
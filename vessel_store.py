@@ -0,0 +1,322 @@
+"""In-memory store of the latest known position and prediction for every tracked vessel."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import psycopg2.extensions
+
+from spatial_index import DEFAULT_CELL_SIZE_DEG, GridIndex
+
+logger = logging.getLogger("navicast.store")
+
+# Re-read this much history on every refresh so late-committed batches are not missed
+REFRESH_OVERLAP_SECONDS = 60
+
+# Mirrors the raw_ais_data retention enforced by the MQTT client
+DEFAULT_RETENTION = timedelta(hours=24)
+
+# Removals remembered for incremental consumers; older readers must resync fully
+REMOVAL_LOG_SIZE = 100000
+
+LATEST_STATE_QUERY = """
+SELECT DISTINCT ON (r.vessel_id)
+    r.vessel_id,
+    r.latitude,
+    r.longitude,
+    r.timestamp,
+    (r.raw_json -> 'properties' ->> 'sog')::float AS sog,
+    (r.raw_json -> 'properties' ->> 'cog')::float AS cog,
+    (r.raw_json -> 'properties' ->> 'heading')::float AS heading,
+    (r.raw_json -> 'properties' ->> 'navStat')::int AS nav_stat,
+    COALESCE(m.ship_type, (r.raw_json -> 'properties' ->> 'shipType')::int) AS ship_type
+FROM raw_ais_data r
+LEFT JOIN vessel_metadata m ON m.vessel_id = r.vessel_id
+WHERE r.timestamp > %s
+ORDER BY r.vessel_id, r.timestamp DESC
+"""
+
+LATEST_PREDICTION_QUERY = """
+SELECT
+    vessel_id,
+    predicted_latitude,
+    predicted_longitude,
+    prediction_for_timestamp,
+    prediction_made_at
+FROM predictions
+WHERE prediction_made_at > %s
+"""
+
+
+def _to_epoch(value: Any) -> float:
+    """Convert a datetime (naive values are treated as local time) to epoch seconds."""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+class LatestVesselStore:
+    """Structure-of-arrays snapshot of the newest report per vessel.
+
+    Rows are addressed through ``_slots`` (MMSI -> row) and kept in sync with a
+    :class:`GridIndex` so bounding-box lookups only touch vessels near the box.
+    Updates with a timestamp older than the stored one are ignored, so replays
+    and overlapping refreshes are harmless.
+
+    Every change bumps ``version`` and stamps the row with it, which lets
+    consumers such as tile caches ask for what changed since they last looked.
+    """
+
+    def __init__(
+        self,
+        cell_size_deg: float = DEFAULT_CELL_SIZE_DEG,
+        retention: timedelta = DEFAULT_RETENTION,
+        initial_capacity: int = 1024,
+    ):
+        self.retention = retention
+        self.index = GridIndex(cell_size_deg)
+        self.version = 0
+        self.newest_timestamp: Optional[float] = None
+        self.newest_prediction: Optional[float] = None
+        self.last_refresh: Optional[float] = None
+
+        self.lock = threading.RLock()
+        self._slots: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._size = 0
+        self._removed: Deque[Tuple[int, int]] = deque(maxlen=REMOVAL_LOG_SIZE)
+        self._removed_floor = 0
+        self._allocate(initial_capacity)
+
+    def _allocate(self, capacity: int) -> None:
+        self.vessel_id = np.zeros(capacity, dtype=np.int64)
+        self.latitude = np.full(capacity, np.nan)
+        self.longitude = np.full(capacity, np.nan)
+        self.timestamp = np.full(capacity, -np.inf)
+        self.sog = np.zeros(capacity)
+        self.cog = np.zeros(capacity)
+        self.heading = np.full(capacity, np.nan)
+        self.nav_stat = np.full(capacity, -1, dtype=np.int16)
+        self.ship_type = np.full(capacity, -1, dtype=np.int16)
+        self.row_version = np.zeros(capacity, dtype=np.int64)
+        self.predicted_latitude = np.full(capacity, np.nan)
+        self.predicted_longitude = np.full(capacity, np.nan)
+        self.prediction_for = np.full(capacity, np.nan)
+        self.prediction_made = np.full(capacity, -np.inf)
+        self.prediction_version = np.zeros(capacity, dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+
+    def _grow(self) -> None:
+        old = {name: getattr(self, name) for name in self._column_names()}
+        self._allocate(len(self.active) * 2)
+        for name, values in old.items():
+            getattr(self, name)[:len(values)] = values
+
+    @staticmethod
+    def _column_names() -> Sequence[str]:
+        return ("vessel_id", "latitude", "longitude", "timestamp", "sog", "cog",
+                "heading", "nav_stat", "ship_type", "row_version", "predicted_latitude",
+                "predicted_longitude", "prediction_for", "prediction_made", "prediction_version",
+                "active")
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def upsert(
+        self,
+        vessel_id: int,
+        latitude: float,
+        longitude: float,
+        timestamp: Any,
+        sog: Optional[float] = None,
+        cog: Optional[float] = None,
+        heading: Optional[float] = None,
+        nav_stat: Optional[int] = None,
+        ship_type: Optional[int] = None,
+    ) -> bool:
+        """Record a report; returns False when it is not newer than the stored one."""
+        if latitude is None or longitude is None:
+            return False
+        ts = _to_epoch(timestamp)
+        with self.lock:
+            row = self._slots.get(vessel_id)
+            if row is not None and ts <= self.timestamp[row]:
+                return False
+            if row is None:
+                row = self._claim_row(vessel_id)
+
+            self.latitude[row] = latitude
+            self.longitude[row] = longitude
+            self.timestamp[row] = ts
+            self.sog[row] = sog if sog is not None else 0.0
+            self.cog[row] = cog if cog is not None else 0.0
+            self.heading[row] = heading if heading is not None else np.nan
+            self.nav_stat[row] = nav_stat if nav_stat is not None else -1
+            # Static data rarely rides along with position reports; keep the last known type
+            if ship_type is not None:
+                self.ship_type[row] = ship_type
+            self.index.upsert(vessel_id, latitude, longitude)
+            self.version += 1
+            self.row_version[row] = self.version
+
+            if self.newest_timestamp is None or ts > self.newest_timestamp:
+                self.newest_timestamp = ts
+            return True
+
+    def apply_rows(self, rows: Iterable[Sequence[Any]]) -> int:
+        """Apply rows shaped like ``LATEST_STATE_QUERY`` output; returns rows changed."""
+        changed = 0
+        with self.lock:
+            for vessel_id, lat, lon, ts, sog, cog, heading, nav_stat, ship_type in rows:
+                if self.upsert(vessel_id, lat, lon, ts, sog, cog, heading, nav_stat, ship_type):
+                    changed += 1
+        return changed
+
+    def upsert_prediction(
+        self,
+        vessel_id: int,
+        predicted_latitude: float,
+        predicted_longitude: float,
+        prediction_for: Any,
+        prediction_made: Any,
+    ) -> bool:
+        """Attach a prediction to a tracked vessel; returns False if unknown or not newer."""
+        made_ts = _to_epoch(prediction_made)
+        with self.lock:
+            row = self._slots.get(vessel_id)
+            if row is None or made_ts <= self.prediction_made[row]:
+                return False
+            self.predicted_latitude[row] = predicted_latitude
+            self.predicted_longitude[row] = predicted_longitude
+            self.prediction_for[row] = _to_epoch(prediction_for)
+            self.prediction_made[row] = made_ts
+            self.version += 1
+            self.prediction_version[row] = self.version
+
+            if self.newest_prediction is None or made_ts > self.newest_prediction:
+                self.newest_prediction = made_ts
+            return True
+
+    def remove(self, vessel_id: int) -> None:
+        with self.lock:
+            row = self._slots.pop(vessel_id, None)
+            if row is None:
+                return
+            self.active[row] = False
+            self.timestamp[row] = -np.inf
+            self.ship_type[row] = -1
+            self.predicted_latitude[row] = np.nan
+            self.predicted_longitude[row] = np.nan
+            self.prediction_for[row] = np.nan
+            self.prediction_made[row] = -np.inf
+            self.index.remove(vessel_id)
+            self._free.append(row)
+
+            self.version += 1
+            if len(self._removed) == self._removed.maxlen:
+                self._removed_floor = self._removed[0][0]
+            self._removed.append((self.version, vessel_id))
+
+    def evict_older_than(self, cutoff: Any) -> int:
+        """Drop vessels whose latest report predates ``cutoff``."""
+        cutoff_ts = _to_epoch(cutoff)
+        with self.lock:
+            stale_rows = np.flatnonzero(self.active & (self.timestamp < cutoff_ts))
+            for vessel_id in self.vessel_id[stale_rows].tolist():
+                self.remove(vessel_id)
+            return len(stale_rows)
+
+    def _claim_row(self, vessel_id: int) -> int:
+        if self._free:
+            row = self._free.pop()
+        else:
+            if self._size == len(self.active):
+                self._grow()
+            row = self._size
+            self._size += 1
+        self._slots[vessel_id] = row
+        self.vessel_id[row] = vessel_id
+        self.active[row] = True
+        return row
+
+    def is_stale(self, max_age_seconds: float) -> bool:
+        """True when the store has never been refreshed or was refreshed too long ago."""
+        return self.last_refresh is None or time.monotonic() - self.last_refresh >= max_age_seconds
+
+    def covers(self, end_time: Optional[datetime]) -> bool:
+        """True when the latest stored reports are also the latest ones up to ``end_time``."""
+        if self.newest_timestamp is None or self.last_refresh is None:
+            return False
+        return end_time is None or _to_epoch(end_time) >= self.newest_timestamp
+
+    def _watermark(self, newest: Optional[float]) -> datetime:
+        if newest is None:
+            return datetime.now(timezone.utc) - self.retention
+        return datetime.fromtimestamp(newest - REFRESH_OVERLAP_SECONDS, tz=timezone.utc)
+
+    def refresh(self, conn) -> int:
+        """Pull reports and predictions newer than the current watermarks from the database."""
+        with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+            cur.execute(LATEST_STATE_QUERY, (self._watermark(self.newest_timestamp),))
+            rows = cur.fetchall()
+            changed = self.apply_rows(rows)
+
+            cur.execute(LATEST_PREDICTION_QUERY, (self._watermark(self.newest_prediction),))
+            predictions = cur.fetchall()
+            with self.lock:
+                predicted = sum(self.upsert_prediction(*prediction) for prediction in predictions)
+
+        evicted = self.evict_older_than(time.time() - self.retention.total_seconds())
+        self.last_refresh = time.monotonic()
+        logger.debug(
+            f"Vessel store refreshed: {changed} positions, {predicted} predictions, "
+            f"{evicted} evicted, {len(self)} tracked"
+        )
+        return changed
+
+    def query_bbox(self, lon_min: float, lat_min: float, lon_max: float, lat_max: float) -> np.ndarray:
+        """Return MMSIs whose latest position lies inside the box (edges inclusive)."""
+        with self.lock:
+            return self.vessel_id[self.rows_in_bbox(lon_min, lat_min, lon_max, lat_max)]
+
+    def rows_in_bbox(self, lon_min: float, lat_min: float, lon_max: float, lat_max: float) -> np.ndarray:
+        """Return row indices inside the box; only stable while ``lock`` is held."""
+        with self.lock:
+            candidates = self.index.query(lat_min, lon_min, lat_max, lon_max)
+            if not candidates:
+                return np.empty(0, dtype=np.int64)
+            rows = np.fromiter((self._slots[c] for c in candidates), dtype=np.int64, count=len(candidates))
+            lat = self.latitude[rows]
+            lon = self.longitude[rows]
+            inside = (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+            return rows[inside]
+
+    def changes_since(self, version: int) -> Tuple[np.ndarray, List[int], int, bool]:
+        """Describe what changed after ``version``.
+
+        Returns ``(changed_rows, removed_ids, current_version, complete)``. Row
+        indices are only stable while ``lock`` is held. ``complete`` is False when
+        removals older than the log were dropped and the caller must resync.
+        """
+        with self.lock:
+            changed_rows = np.flatnonzero(self.active & (self.row_version > version))
+            removed_ids = [vessel_id for removed_version, vessel_id in self._removed
+                           if removed_version > version]
+            complete = version >= self._removed_floor
+            return changed_rows, removed_ids, self.version, complete
+
+    def predictions_since(self, version: int) -> np.ndarray:
+        """Rows whose prediction changed after ``version``; only stable while ``lock`` is held."""
+        with self.lock:
+            return np.flatnonzero(self.active & (self.prediction_version > version))
+
+    def active_rows(self) -> np.ndarray:
+        """Rows of all tracked vessels; only stable while ``lock`` is held."""
+        with self.lock:
+            return np.flatnonzero(self.active)